@@ -0,0 +1,86 @@
+import re
+from typing import Iterable, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Заголовки частей и границы multipart поверх самого файла
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class BodyTooLargeError(Exception):
+    """Тело запроса превысило предел, заданный для пути"""
+
+
+class BodySizeLimitMiddleware:
+    """
+    Ограничение размера тела запроса по пути, пока тело еще читается.
+
+    FastAPI разбирает multipart целиком (с записью файлов во временные)
+    до вызова эндпоинта, поэтому проверка размера в эндпоинте срабатывает
+    уже после приема всех байт. Здесь запрос с Content-Length больше
+    предела получает 413 сразу, а без него (chunked) — как только
+    прочитанные байты превысят предел: чтение тела прерывается, ответ
+    приложения заменяется на 413
+    """
+
+    def __init__(self, app: ASGIApp, limits: Iterable[Tuple[str, int]]):
+        self.app = app
+        # (регулярное выражение пути, предел в байтах); применяется первое совпадение
+        self.limits = [(re.compile(pattern), max_size) for pattern, max_size in limits]
+
+    def limit_for(self, path: str) -> Optional[int]:
+        for pattern, max_size in self.limits:
+            if pattern.match(path):
+                return max_size
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        max_size = self.limit_for(scope["path"]) if scope["type"] == "http" else None
+        if max_size is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_size:
+            await _reject(max_size, scope, receive, send)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_size:
+                    exceeded = True
+                    raise BodyTooLargeError(f"Тело запроса превышает {max_size} байт")
+            return message
+
+        async def guarded_send(message: Message) -> None:
+            nonlocal response_started
+            # Ответ приложения на прерванное чтение (обычно 400) заменяется на 413
+            if exceeded and not response_started:
+                return
+            response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except BodyTooLargeError:
+            pass
+        if exceeded and not response_started:
+            await _reject(max_size, scope, receive, send)
+
+
+async def _reject(max_size: int, scope: Scope, receive: Receive, send: Send) -> None:
+    response = JSONResponse(
+        {"detail": f"Размер запроса превышает {max_size} байт"},
+        status_code=413,
+        headers={"connection": "close"},
+    )
+    await response(scope, receive, send)
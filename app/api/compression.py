@@ -0,0 +1,223 @@
+import gzip
+import zlib
+from typing import Dict, Iterable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # без пакета brotli ответы сжимаются только gzip
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def available_encodings() -> tuple:
+    """Кодировки заранее сжатой статики в порядке предпочтения сервера"""
+    return (("br",) if brotli is not None else ()) + ("gzip",)
+
+
+def stream_encodings() -> tuple:
+    """Кодировки потокового сжатия ответов API в порядке предпочтения сервера"""
+    return (
+        (("zstd",) if zstandard is not None else ())
+        + (("br",) if brotli is not None else ())
+        + ("gzip",)
+    )
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """Accept-Encoding в виде {кодировка: q}; некорректные q считаются нулевыми"""
+    accepted: Dict[str, float] = {}
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def choose_encoding(header: Optional[str], encodings: Iterable[str]) -> Optional[str]:
+    """
+    Кодировка ответа по Accept-Encoding клиента: из encodings (в порядке
+    предпочтения сервера) берется принятая с наибольшим q. None — без сжатия
+    """
+    accepted = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """Сжимает данные целиком; level None — максимальное сжатие (для сборки статики)"""
+    if encoding == "gzip":
+        # mtime=0: одинаковое содержимое дает одинаковые байты (стабильный ETag)
+        return gzip.compress(data, compresslevel=9 if level is None else level, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(data, quality=11 if level is None else level)
+    raise ValueError(f"Кодировка {encoding} не поддерживается")
+
+
+class StreamCompressor:
+    """
+    Потоковое сжатие тела ответа по частям.
+    compress() возвращает сжатые данные, которые можно отправить сразу:
+    после каждой части выполняется flush, поэтому клиент получает
+    событие или строку, не дожидаясь конца ответа
+    """
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        elif encoding == "br" and brotli is not None:
+            self._compressor = brotli.Compressor(quality=level)
+        elif encoding == "zstd" and zstandard is not None:
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        else:
+            raise ValueError(f"Кодировка {encoding} не поддерживается")
+
+    def compress(self, data: bytes, flush: bool = True) -> bytes:
+        if self.encoding == "gzip":
+            out = self._compressor.compress(data)
+            return out + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else out
+        if self.encoding == "br":
+            out = self._compressor.process(data)
+            return out + self._compressor.flush() if flush else out
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK) if flush else out
+
+    def finish(self) -> bytes:
+        if self.encoding == "gzip":
+            return self._compressor.flush(zlib.Z_FINISH)
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+# Ответы, которые не сжимаются: без тела, частичные и уже закодированные
+_SKIP_STATUSES = {204, 206, 304}
+
+
+class CompressionMiddleware:
+    """
+    Сжатие ответов API кодировкой, выбранной по Accept-Encoding (zstd, br, gzip).
+
+    Сжимаются только типы из content_types. Ответ из одной части меньше
+    minimum_size отдается как есть. Потоковые ответы (SSE) сжимаются по
+    частям, каждая часть сразу отправляется клиенту. Не трогаются ответы
+    с Content-Encoding (статика сжата заранее), вложения и ответы с
+    поддержкой Range (скачивание файлов: диапазоны считаются по исходным байтам)
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        levels: Dict[str, int],
+        minimum_size: int = 1024,
+        content_types: Iterable[str] = ("application/json",),
+    ):
+        self.app = app
+        self.levels = {encoding: levels[encoding] for encoding in stream_encodings() if encoding in levels}
+        self.minimum_size = minimum_size
+        self.content_types = frozenset(content_types)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"), self.levels)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponder(self, encoding, send)(scope, receive)
+
+    def compressible(self, message: Message) -> bool:
+        if message["status"] in _SKIP_STATUSES:
+            return False
+        headers = Headers(raw=message["headers"])
+        if "content-encoding" in headers or "content-disposition" in headers:
+            return False
+        if "accept-ranges" in headers or "content-range" in headers:
+            return False
+        if "no-transform" in headers.get("cache-control", ""):
+            return False
+        content_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+        return content_type in self.content_types
+
+
+class _CompressedResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[StreamCompressor] = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive) -> None:
+        await self.middleware.app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            if self.middleware.compressible(message):
+                # Заголовки отправляются вместе с первой частью тела:
+                # по ее размеру решается, сжимать ли ответ
+                self.start_message = message
+            else:
+                self.passthrough = True
+                await self.send(message)
+            return
+        if self.passthrough or message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressor is None:
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+            self.compressor = StreamCompressor(self.encoding, self.middleware.levels[self.encoding])
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            headers["content-encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag is not None and not etag.startswith("W/"):
+                # Сжатое представление не совпадает побайтно с исходным
+                headers["etag"] = f"W/{etag}"
+            if more_body:
+                del headers["content-length"]
+                await self.send(self.start_message)
+            else:
+                body = self.compressor.compress(body, flush=False) + self.compressor.finish()
+                headers["content-length"] = str(len(body))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+
+        if more_body:
+            data = self.compressor.compress(body)
+            if data:
+                await self.send({"type": "http.response.body", "body": data, "more_body": True})
+        else:
+            data = self.compressor.compress(body, flush=False) + self.compressor.finish()
+            await self.send({"type": "http.response.body", "body": data})
@@ -1,7 +1,9 @@
-from fastapi import APIRouter
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Request
+
+from app.api.static_assets import REVALIDATE, asset_response, static_bundle
 from app.tasks.router import router as tasks_router
 from app.files.router import router as files_router
+from app.events.router import router as events_router
 
 
 router = APIRouter()
@@ -9,9 +11,11 @@ router = APIRouter()
 
 # Маршрут для главной страницы
 @router.get("/")
-async def read_index():
-    return FileResponse("static/index.html")
+async def read_index(request: Request):
+    """index.html из памяти: ссылки на статику в нем ведут на хешированные имена"""
+    return asset_response(request, static_bundle.get("index.html"), REVALIDATE)
 
 
 router.include_router(tasks_router, prefix="/tasks", tags=["Tasks"])
 router.include_router(files_router, prefix="/files", tags=["Files"])
+router.include_router(events_router, prefix="/events", tags=["Events"])
@@ -0,0 +1,108 @@
+from typing import Iterator
+
+from fastapi import APIRouter
+from starlette.responses import Response
+
+from app.database import async_engine
+from app.events.broker import event_broker
+from app.jobs.queue import job_queue
+from app.logging_config import logging_stats
+from app.organisations.registry import organisation_engines
+from app.tasks.cache import task_cache
+from app.utils.metrics import Sample, metrics
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Метрики процесса в текстовом формате Prometheus"""
+    return Response(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+def _collect_state() -> Iterator[Sample]:
+    pool = async_engine.pool
+    yield (
+        "db_pool_connections",
+        "gauge",
+        "Соединения основного пула БД",
+        {
+            ("checked_out",): pool.checkedout(),
+            ("idle",): pool.checkedin(),
+            ("overflow",): max(pool.overflow(), 0),
+        },
+        ("state",),
+    )
+    yield (
+        "db_pool_size",
+        "gauge",
+        "Постоянный размер основного пула БД",
+        {(): pool.size()},
+        (),
+    )
+
+    cache = task_cache.stats()
+    for name, title in (("hits", "попадания"), ("misses", "промахи"), ("evictions", "вытеснения")):
+        yield (
+            f"task_cache_{name}_total",
+            "counter",
+            f"Кэш чтения задач: {title}",
+            {(): cache[name]},
+            (),
+        )
+    yield ("task_cache_entries", "gauge", "Записей в кэше чтения задач", {(): cache["entries"]}, ())
+
+    events = event_broker.stats()
+    yield ("events_subscribers", "gauge", "Подписчики потока событий", {(): events["subscribers"]}, ())
+    yield (
+        "events_dropped_subscribers_total",
+        "counter",
+        "Подписчики, отключенные из-за переполнения очереди",
+        {(): events["dropped"]},
+        (),
+    )
+    yield (
+        "events_pending_writes",
+        "gauge",
+        "События в очереди записи в БД",
+        {(): events["pending_writes"]},
+        (),
+    )
+
+    jobs = job_queue.stats()
+    yield ("jobs_running", "gauge", "Фоновые задачи, выполняемые процессом", {(): jobs["running"]}, ())
+    yield (
+        "jobs_finished_total",
+        "counter",
+        "Завершенные попытки фоновых задач",
+        {
+            ("done",): jobs["completed"],
+            ("retry",): jobs["retried"],
+            ("failed",): jobs["failed"],
+        },
+        ("result",),
+    )
+
+    logs = logging_stats()
+    if logs is not None:
+        yield (
+            "log_records_dropped_total",
+            "counter",
+            "Записи лога, отброшенные из-за переполнения очереди",
+            {(): logs["dropped"]},
+            (),
+        )
+        yield ("log_records_queued", "gauge", "Записи лога в очереди на вывод", {(): logs["queued"]}, ())
+
+    yield (
+        "organisation_engine_sessions",
+        "gauge",
+        "Активные сессии открытых пулов БД организаций",
+        {(code,): in_use for code, in_use in organisation_engines.stats().items()},
+        ("organisation",),
+    )
+
+
+metrics.collector(_collect_state)
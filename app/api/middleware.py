@@ -1,22 +1,132 @@
+import random
+import time
+
 from fastapi import Request
 from loguru import logger
 
+from app.config import settings
+from app.utils.metrics import RequestStats, metrics, request_stats
+
 
 async def logging_middleware(request: Request, call_next):
     """
-    Middleware для логирования каждого входящего запроса
+    Middleware для логирования запросов: одна запись после ответа.
+    Ошибки (4xx/5xx) и запросы дольше LOG_SLOW_REQUEST пишутся всегда,
+    остальные — с вероятностью LOG_REQUEST_SAMPLE_RATE
     """
-
     user_login = request.headers.get("x-user-login", "anonymous")
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        logger.bind(user=user_login, method=request.method, path=request.url.path).exception(
+            "Необработанная ошибка: {} {}", request.method, request.url.path
+        )
+        raise
+    elapsed = time.perf_counter() - started
+
+    if response.status_code >= 500:
+        level = "ERROR"
+    elif response.status_code >= 400 or elapsed >= settings.LOG_SLOW_REQUEST:
+        level = "WARNING"
+    elif random.random() < settings.LOG_REQUEST_SAMPLE_RATE:
+        level = "INFO"
+    else:
+        return response
 
-    logger.info(
-        f"Request: Пользователь '{user_login}' -> {request.method} {request.url.path} с IP {request.client.host}"
+    client_host = request.client.host if request.client else None
+    logger.bind(
+        user=user_login,
+        method=request.method,
+        path=request.url.path,
+        status=response.status_code,
+        duration_ms=round(elapsed * 1000, 1),
+        ip=client_host,
+    ).log(
+        level,
+        "'{}' -> {} {} | Статус: {} | {:.1f} мс | IP {}",
+        user_login,
+        request.method,
+        request.url.path,
+        response.status_code,
+        elapsed * 1000,
+        client_host,
     )
+    return response
 
-    response = await call_next(request)
 
-    logger.info(
-        f"Response: Для '{user_login}' -> {request.method} {request.url.path} | Статус: {response.status_code}"
-    )
+request_duration = metrics.histogram(
+    "http_request_duration_seconds",
+    "Время обработки запроса до отправки заголовков ответа",
+    ("method", "route", "status"),
+)
+request_db_queries = metrics.histogram(
+    "http_request_db_queries",
+    "Число SQL-запросов за один HTTP-запрос",
+    ("method", "route"),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+request_db_duration = metrics.histogram(
+    "http_request_db_duration_seconds",
+    "Суммарное время SQL-запросов за один HTTP-запрос",
+    ("method", "route"),
+)
+requests_in_flight = metrics.gauge(
+    "http_requests_in_flight", "Запросы, обрабатываемые в данный момент"
+)
+
+
+def route_label(request: Request) -> str:
+    """
+    Шаблон пути (/api/v1/tasks/{task_id}) вместо самого пути, чтобы не плодить серии.
+    Собирается из пути и path_params: у маршрутов вложенных роутеров своя часть пути
+    """
+    if request.scope.get("endpoint") is None:
+        return "unmatched"
+    # Смонтированное приложение (/static): путь внутри него в метку не входит
+    root_path = request.scope.get("root_path", "")
+    if root_path != request.scope.get("app_root_path", root_path):
+        return f"{root_path}/{{path}}"
+    segments = request.url.path.split("/")
+    for name, value in request.path_params.items():
+        value_segments = str(value).split("/")
+        # Значение ищем с конца: параметры стоят правее префиксов роутеров
+        for index in range(len(segments) - len(value_segments), 0, -1):
+            if segments[index : index + len(value_segments)] == value_segments:
+                segments[index : index + len(value_segments)] = [f"{{{name}}}"]
+                break
+    return "/".join(segments)
+
+
+async def metrics_middleware(request: Request, call_next):
+    """
+    Время обработки, число и время SQL-запросов по маршрутам.
+    Для потоковых ответов (файлы, SSE) время считается до отправки заголовков
+    """
+    if not settings.METRICS_ENABLED:
+        return await call_next(request)
+
+    stats = RequestStats()
+    token = request_stats.set(stats)
+    requests_in_flight.inc()
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        elapsed = time.perf_counter() - started
+        requests_in_flight.dec()
+        request_stats.reset(token)
+        route = route_label(request)
+        request_duration.observe(elapsed, (request.method, route, str(status_code)))
+        request_db_queries.observe(stats.queries, (request.method, route))
+        request_db_duration.observe(stats.db_time, (request.method, route))
 
+    if settings.SERVER_TIMING_ENABLED:
+        response.headers["server-timing"] = (
+            f"app;dur={elapsed * 1000:.1f}, "
+            f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries", '
+            f"pool;dur={stats.pool_wait * 1000:.1f}"
+        )
     return response
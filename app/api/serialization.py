@@ -0,0 +1,52 @@
+import enum
+import types
+from functools import lru_cache
+from typing import Any, Union, get_args, get_origin
+
+from pydantic import BaseModel, TypeAdapter
+from starlette.responses import Response
+from typing_extensions import TypedDict
+
+
+class RawJSONResponse(Response):
+    """Ответ с уже сериализованным JSON (bytes) — без повторного кодирования"""
+
+    media_type = "application/json"
+
+
+@lru_cache()
+def row_serializer(model: type[BaseModel]) -> TypeAdapter:
+    """
+    Сериализатор словарей со структурой схемы model прямо в JSON-байты.
+
+    Строится TypedDict с теми же полями, поэтому ответ совпадает с
+    model.model_dump_json(), но строки из БД не проходят валидацию и не
+    превращаются в экземпляры моделей. Лишние ключи словарей отбрасываются.
+    Используется маршрутами, которые явно отдают RawJSONResponse, при этом
+    response_model маршрута и схема OpenAPI остаются прежними
+    """
+    return TypeAdapter(_row_type(model))
+
+
+def _row_type(model: type[BaseModel]) -> type:
+    return TypedDict(
+        f"{model.__name__}Row",
+        {name: _plain_type(field.annotation) for name, field in model.model_fields.items()},
+    )
+
+
+def _plain_type(annotation: Any) -> Any:
+    if isinstance(annotation, type):
+        if issubclass(annotation, BaseModel):
+            return _row_type(annotation)
+        # Из БД приходит перечисление модели, а не схемы: пишем его строковое значение
+        if issubclass(annotation, enum.Enum) and issubclass(annotation, str):
+            return str
+        return annotation
+    origin = get_origin(annotation)
+    args = tuple(_plain_type(arg) for arg in get_args(annotation))
+    if origin in (Union, types.UnionType):
+        return Union[args]
+    if origin is list:
+        return list[args[0]]
+    return annotation
@@ -0,0 +1,175 @@
+import hashlib
+import mimetypes
+import posixpath
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Request, status
+from starlette.responses import Response
+
+from app.api.compression import available_encodings, choose_encoding, compress
+from app.api.conditional import is_not_modified, not_modified_response
+from app.config import settings
+
+router = APIRouter()
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Ссылки на другие файлы статики, которые переписываются на хешированные имена:
+# src/href в HTML, import в JS-модулях, url() в CSS
+_REFERENCE_RE = {
+    ".html": re.compile(r"""(?P<prefix>(?:src|href)=["'])(?P<ref>/static/[^"'?#]+)"""),
+    ".js": re.compile(
+        r"""(?P<prefix>(?:\bfrom\s*|\bimport\s*\(?\s*)["'])(?P<ref>\.{1,2}/[^"'?#]+)"""
+    ),
+    ".css": re.compile(r"""(?P<prefix>url\(\s*["']?)(?P<ref>(?:/static/|\.{1,2}/)[^"')?#]+)"""),
+}
+_COMPRESSIBLE = {".html", ".js", ".css", ".svg", ".json", ".txt", ".map"}
+
+
+@dataclass
+class Asset:
+    content: bytes
+    media_type: str
+    etag: str
+    # Имя с хешем содержимого (css/styles.1a2b3c4d5e.css); None — у index.html
+    hashed_path: Optional[str] = None
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+
+
+class StaticBundle:
+    """
+    Статика SPA, собранная в памяти при старте.
+
+    Каждый файл получает имя с хешем содержимого, ссылки между файлами
+    и в index.html переписываются на эти имена, текстовые файлы заранее
+    сжимаются (gzip, brotli). Хешированные имена отдаются с immutable:
+    браузер не перезапрашивает их, пока не изменится index.html, а он
+    отдается с ETag и проверяется при каждой загрузке
+    """
+
+    def __init__(self, directory: Path):
+        self._directory = directory
+        self._assets: Optional[Dict[str, Asset]] = None
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Optional[Asset]:
+        """Файл по пути относительно каталога статики: исходному или хешированному"""
+        return self.assets.get(path)
+
+    @property
+    def assets(self) -> Dict[str, Asset]:
+        if self._assets is None:
+            self.build()
+        return self._assets
+
+    def build(self) -> None:
+        with self._lock:
+            if self._assets is not None:
+                return
+            sources = {
+                path.relative_to(self._directory).as_posix(): path.read_bytes()
+                for path in sorted(self._directory.rglob("*"))
+                if path.is_file()
+            }
+            built: Dict[str, Asset] = {}
+            for path in sources:
+                self._build_asset(path, sources, built, ())
+            assets = dict(built)
+            assets.update({asset.hashed_path: asset for asset in built.values() if asset.hashed_path})
+            self._assets = assets
+
+    def _build_asset(
+        self, path: str, sources: Dict[str, bytes], built: Dict[str, Asset], stack: tuple
+    ) -> Asset:
+        """Собирает файл после всех файлов, на которые он ссылается: их хеши входят в его текст"""
+        if path in built:
+            return built[path]
+        if path in stack:
+            raise ValueError(f"Циклическая ссылка в статике: {' -> '.join(stack + (path,))}")
+
+        content = sources[path]
+        suffix = posixpath.splitext(path)[1]
+        pattern = _REFERENCE_RE.get(suffix)
+        if pattern is not None:
+            base = posixpath.dirname(path)
+
+            def rewrite(match: re.Match) -> str:
+                ref = match.group("ref")
+                target = _resolve(ref, base)
+                if target not in sources or target == path:
+                    return match.group(0)
+                hashed = self._build_asset(target, sources, built, stack + (path,)).hashed_path
+                new_ref = posixpath.join(posixpath.dirname(ref), posixpath.basename(hashed))
+                return match.group("prefix") + new_ref
+
+            content = pattern.sub(rewrite, content.decode("utf-8")).encode("utf-8")
+
+        digest = hashlib.sha256(content).hexdigest()
+        stem, _ = posixpath.splitext(path)
+        asset = Asset(
+            content=content,
+            media_type=_media_type(path),
+            etag=f'"{digest[:32]}"',
+            hashed_path=None if path == "index.html" else f"{stem}.{digest[:10]}{suffix}",
+        )
+        if suffix in _COMPRESSIBLE:
+            for encoding in available_encodings():
+                compressed = compress(content, encoding)
+                if len(compressed) < len(content):
+                    asset.encoded[encoding] = compressed
+        built[path] = asset
+        return asset
+
+
+def _resolve(ref: str, base: str) -> str:
+    if ref.startswith("/static/"):
+        return ref[len("/static/") :]
+    return posixpath.normpath(posixpath.join(base, ref))
+
+
+def _media_type(path: str) -> str:
+    media_type = {".js": "text/javascript"}.get(posixpath.splitext(path)[1])
+    media_type = media_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if media_type.startswith("text/") or media_type in ("application/json", "image/svg+xml"):
+        media_type += "; charset=utf-8"
+    return media_type
+
+
+def asset_response(request: Request, asset: Asset, cache_control: str) -> Response:
+    """
+    Ответ с файлом статики в кодировке, выбранной по Accept-Encoding.
+    У сжатых вариантов свой ETag: это разные представления файла
+    """
+    encoding = choose_encoding(request.headers.get("accept-encoding"), asset.encoded)
+    etag = asset.etag if encoding is None else f'{asset.etag[:-1]}-{encoding}"'
+    headers = {"etag": etag, "cache-control": cache_control}
+    if asset.encoded:
+        headers["vary"] = "Accept-Encoding"
+    if is_not_modified(request, etag):
+        return not_modified_response(headers)
+
+    if encoding is None:
+        return Response(asset.content, media_type=asset.media_type, headers=headers)
+    headers["content-encoding"] = encoding
+    return Response(asset.encoded[encoding], media_type=asset.media_type, headers=headers)
+
+
+static_bundle = StaticBundle(settings.STATIC_DIR)
+
+
+@router.get("/{path:path}", include_in_schema=False)
+async def get_static_file(path: str, request: Request):
+    """
+    Файл статики. Хешированные имена кэшируются навсегда, исходные
+    (на них могут ссылаться старые страницы) — с проверкой по ETag
+    """
+    asset = static_bundle.get(path)
+    if asset is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Файл не найден")
+    cache_control = IMMUTABLE if path == asset.hashed_path else REVALIDATE
+    return asset_response(request, asset, cache_control)
@@ -0,0 +1,120 @@
+"""
+Нагрузочный прогон API на синтетических данных.
+
+БД и каталог загрузок берутся из настроек приложения, поэтому для прогона
+укажите отдельную базу, например:
+
+    export SQLITE_DATABASE_URL=sqlite+aiosqlite:///./bench_100k.db
+    python -m app.benchmark seed --dataset 100k
+    python -m app.benchmark run --transport both --output bench.json
+    python -m app.benchmark run --baseline bench.json
+
+seed заполняет только пустую БД. run печатает пропускную способность и
+p50/p95/p99 по сценариям, сохраняет отчет (--output) и сравнивает его
+с baseline: код выхода 1, если p95 или rps ухудшились больше --tolerance
+"""
+import argparse
+import asyncio
+import platform
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from app.benchmark import report
+from app.benchmark.runner import SCENARIOS, dataset_size, run
+from app.benchmark.seed import DATASETS, seed
+from app.config import settings
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m app.benchmark")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="заполнить пустую БД синтетическими задачами")
+    seed_parser.add_argument("--dataset", choices=DATASETS, default="10k")
+    seed_parser.add_argument("--files-ratio", type=float, default=0.3, help="доля задач с файлом")
+
+    run_parser = commands.add_parser("run", help="прогнать сценарии и сравнить с baseline")
+    run_parser.add_argument("--transport", choices=("asgi", "uvicorn", "both"), default="asgi")
+    run_parser.add_argument(
+        "--scenarios", default=",".join(SCENARIOS), help=f"через запятую из: {', '.join(SCENARIOS)}"
+    )
+    run_parser.add_argument("--requests", type=int, default=500, help="запросов на сценарий")
+    run_parser.add_argument("--concurrency", type=int, default=10)
+    run_parser.add_argument("--workers", type=int, default=1, help="процессов uvicorn")
+    run_parser.add_argument(
+        "--app-log",
+        type=Path,
+        help="куда писать логи приложения; по умолчанию рядом с --output или во временном каталоге",
+    )
+    run_parser.add_argument("--output", type=Path, help="сохранить отчет в JSON")
+    run_parser.add_argument("--baseline", type=Path, help="отчет для сравнения")
+    run_parser.add_argument("--tolerance", type=float, default=0.15, help="допустимое ухудшение, доля")
+    return parser.parse_args()
+
+
+async def _run(args: argparse.Namespace) -> int:
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - SCENARIOS.keys()
+    if unknown:
+        print(f"Неизвестные сценарии: {', '.join(sorted(unknown))}")
+        return 2
+
+    app_log = _app_log_path(args)
+    print(f"Логи приложения: {app_log}")
+    transports = ("asgi", "uvicorn") if args.transport == "both" else (args.transport,)
+    results = {}
+    for transport in transports:
+        print(f"Прогон через {transport}:", flush=True)
+        results.update(
+            await run(transport, scenarios, args.requests, args.concurrency, args.workers, str(app_log))
+        )
+
+    current = {
+        "meta": {
+            "dataset": await dataset_size(),
+            "database": settings.DATABASE_BACKEND,
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "requests": args.requests,
+            "python": platform.python_version(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        },
+        "scenarios": results,
+    }
+    baseline = report.load(args.baseline) if args.baseline else None
+    print(report.format_table(current, baseline))
+    if args.output:
+        report.save(args.output, current)
+
+    if baseline is None:
+        return 0
+    for key, (expected, actual) in report.mismatched_meta(current, baseline).items():
+        print(f"Внимание: {key} в baseline {expected}, в прогоне {actual}")
+    regressions = report.compare(current, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"Регрессия: {regression}")
+    return 1 if regressions else 0
+
+
+def _app_log_path(args: argparse.Namespace) -> Path:
+    """Лог приложения не должен попадать в рабочий каталог (обычно — в репозиторий)"""
+    if args.app_log is not None:
+        return args.app_log
+    if args.output is not None:
+        return args.output.with_suffix(".app.log")
+    return Path(tempfile.gettempdir()) / "bench_app.log"
+
+
+def main() -> int:
+    args = _parse_args()
+    if args.command == "seed":
+        tasks = asyncio.run(seed(DATASETS[args.dataset], args.files_ratio))
+        print(f"Задач в БД: {tasks}")
+        return 0
+    return asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
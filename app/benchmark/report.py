@@ -0,0 +1,63 @@
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+def load(path: Path) -> dict:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save(path: Path, report: dict) -> None:
+    path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Регрессии относительно baseline: p95 выросла или пропускная способность
+    упала больше чем на tolerance (доля), либо появились ошибки
+    """
+    regressions = []
+    for name, current in report["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95_ms']} → {current['p95_ms']} мс")
+        if current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: {base['rps']} → {current['rps']} rps")
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{name}: ошибок {base['errors']} → {current['errors']}")
+    return regressions
+
+
+def mismatched_meta(report: dict, baseline: dict) -> Dict[str, tuple]:
+    """Параметры запуска, отличающиеся от baseline: сравнение с ним неточно"""
+    keys = ("dataset", "database", "concurrency", "workers")
+    return {
+        key: (baseline["meta"].get(key), report["meta"].get(key))
+        for key in keys
+        if baseline["meta"].get(key) != report["meta"].get(key)
+    }
+
+
+def format_table(report: dict, baseline: Optional[dict] = None) -> str:
+    header = f"{'сценарий':<20} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'ошибки':>7}"
+    if baseline is not None:
+        header += f" {'Δp95':>8} {'Δrps':>8}"
+    lines = [header]
+    for name, result in report["scenarios"].items():
+        line = (
+            f"{name:<20} {result['rps']:>9} {result['p50_ms']:>9} "
+            f"{result['p95_ms']:>9} {result['p99_ms']:>9} {result['errors']:>7}"
+        )
+        base = baseline["scenarios"].get(name) if baseline is not None else None
+        if base is not None:
+            line += f" {_delta(result['p95_ms'], base['p95_ms']):>8} {_delta(result['rps'], base['rps']):>8}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _delta(value: float, base: float) -> str:
+    if not base:
+        return "-"
+    return f"{(value - base) / base * 100:+.0f}%"
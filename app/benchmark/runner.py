@@ -0,0 +1,273 @@
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import AsyncExitStack, asynccontextmanager, redirect_stdout
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, Awaitable, Callable, Dict, List
+
+import httpx
+from sqlalchemy import func, select
+
+from app.benchmark.seed import PROJECTS, STATUSES, WORDS, organisations
+from app.database import async_session_maker
+from app.files.models import File
+from app.tasks.models import Task
+
+API = "/api/v1"
+_UPLOAD_SIZE = 16 * 1024
+
+
+@dataclass
+class Context:
+    """Диапазоны ID в БД, из которых сценарии выбирают случайные задачи и файлы"""
+
+    task_ids: range
+    file_ids: range
+    organisations: List[str]
+
+
+@dataclass
+class ScenarioResult:
+    requests: int
+    errors: int
+    rps: float
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+
+Scenario = Callable[[httpx.AsyncClient, Context, random.Random], Awaitable[httpx.Response]]
+
+
+async def _list(client: httpx.AsyncClient, ctx: Context, rng: random.Random) -> httpx.Response:
+    return await client.get(f"{API}/tasks/", params={"limit": 50})
+
+
+async def _filter(client: httpx.AsyncClient, ctx: Context, rng: random.Random) -> httpx.Response:
+    params = {
+        "limit": 50,
+        "organisation": rng.choice(ctx.organisations),
+        "status": rng.choice(STATUSES).value,
+    }
+    return await client.get(f"{API}/tasks/", params=params)
+
+
+async def _search(client: httpx.AsyncClient, ctx: Context, rng: random.Random) -> httpx.Response:
+    return await client.get(f"{API}/tasks/", params={"limit": 50, "title": rng.choice(WORDS)[:4]})
+
+
+async def _detail(client: httpx.AsyncClient, ctx: Context, rng: random.Random) -> httpx.Response:
+    return await client.get(f"{API}/tasks/{rng.choice(ctx.task_ids)}")
+
+
+async def _create(client: httpx.AsyncClient, ctx: Context, rng: random.Random) -> httpx.Response:
+    task = {
+        "title": f"Бенчмарк {rng.choice(WORDS)}",
+        "description": " ".join(rng.choices(WORDS, k=12)),
+        "project": rng.choice(PROJECTS),
+        "organisation": rng.choice(ctx.organisations),
+    }
+    return await client.post(f"{API}/tasks/", json=task)
+
+
+async def _status(client: httpx.AsyncClient, ctx: Context, rng: random.Random) -> httpx.Response:
+    return await client.patch(
+        f"{API}/tasks/{rng.choice(ctx.task_ids)}/status",
+        json={"status": rng.choice(STATUSES).value},
+    )
+
+
+async def _upload(client: httpx.AsyncClient, ctx: Context, rng: random.Random) -> httpx.Response:
+    content = rng.randbytes(_UPLOAD_SIZE)
+    return await client.post(
+        f"{API}/files/{rng.choice(ctx.task_ids)}",
+        files={"file": ("bench.bin", content, "application/octet-stream")},
+    )
+
+
+async def _download(client: httpx.AsyncClient, ctx: Context, rng: random.Random) -> httpx.Response:
+    return await client.get(f"{API}/files/{rng.choice(ctx.file_ids)}")
+
+
+# Порядок выполнения: пишущие сценарии идут после читающих
+SCENARIOS: Dict[str, Scenario] = {
+    "list": _list,
+    "filter": _filter,
+    "search": _search,
+    "detail": _detail,
+    "download": _download,
+    "create": _create,
+    "status": _status,
+    "upload": _upload,
+}
+
+
+async def load_context() -> Context:
+    async with async_session_maker() as session:
+        task_min, task_max = (
+            await session.execute(select(func.min(Task.id), func.max(Task.id)))
+        ).one()
+        file_min, file_max = (
+            await session.execute(select(func.min(File.id), func.max(File.id)))
+        ).one()
+    if task_max is None:
+        raise RuntimeError("В БД нет задач: сначала выполните python -m app.benchmark seed")
+    return Context(
+        task_ids=range(task_min, task_max + 1),
+        file_ids=range(file_min, file_max + 1) if file_max is not None else range(0),
+        organisations=organisations(),
+    )
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    ctx: Context,
+    requests: int,
+    concurrency: int,
+    warmup: int = 10,
+    seed: int = 0,
+) -> ScenarioResult:
+    """
+    Выполняет requests запросов сценария в concurrency параллельных потоков
+    (замкнутый цикл: следующий запрос потока — после ответа на предыдущий).
+    Ответы со статусом 4xx/5xx и сетевые ошибки считаются ошибками
+    """
+    rng = random.Random(seed)
+    for _ in range(warmup):
+        await scenario(client, ctx, rng)
+
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker(worker_seed: int) -> None:
+        nonlocal errors
+        worker_rng = random.Random(worker_seed)
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                response = await scenario(client, ctx, worker_rng)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(seed * 1000 + index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return ScenarioResult(
+        requests=len(latencies),
+        errors=errors,
+        rps=round(len(latencies) / elapsed, 1),
+        mean_ms=round(statistics.fmean(latencies) * 1000, 2),
+        p50_ms=round(percentiles[49] * 1000, 2),
+        p95_ms=round(percentiles[94] * 1000, 2),
+        p99_ms=round(percentiles[98] * 1000, 2),
+    )
+
+
+@asynccontextmanager
+async def asgi_client(app_log: str) -> AsyncIterator[httpx.AsyncClient]:
+    """
+    Клиент, вызывающий main:app в этом же процессе (без сети).
+    Жизненный цикл приложения запускается вручную: ASGITransport его не вызывает.
+    Логгер приложения пишет в sys.stdout на момент настройки, поэтому на время
+    запуска stdout подменяется файлом app_log
+    """
+    from main import app
+
+    async with AsyncExitStack() as stack:
+        log = stack.enter_context(open(app_log, "a"))
+        with redirect_stdout(log):
+            await stack.enter_async_context(app.router.lifespan_context(app))
+        transport = httpx.ASGITransport(app=app)
+        yield await stack.enter_async_context(
+            httpx.AsyncClient(transport=transport, base_url="http://bench")
+        )
+
+
+@asynccontextmanager
+async def uvicorn_client(
+    app_log: str, concurrency: int, workers: int = 1
+) -> AsyncIterator[httpx.AsyncClient]:
+    """Клиент к main:app, запущенному локальным uvicorn в отдельном процессе"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ]
+    with open(app_log, "a") as log:
+        server = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, env=os.environ.copy())
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60
+        ) as client:
+            await _wait_ready(client, server)
+            yield client
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+async def _wait_ready(client: httpx.AsyncClient, server: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"uvicorn завершился с кодом {server.returncode}")
+        try:
+            await client.get(f"{API}/tasks/cache/stats")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn не запустился за отведенное время")
+
+
+async def run(
+    transport: str,
+    scenarios: List[str],
+    requests: int,
+    concurrency: int,
+    workers: int = 1,
+    app_log: str = os.devnull,
+) -> Dict[str, dict]:
+    """Результаты сценариев: {"<transport>/<сценарий>": ScenarioResult в виде dict}"""
+    ctx = await load_context()
+    if transport == "asgi":
+        client_context = asgi_client(app_log)
+    else:
+        client_context = uvicorn_client(app_log, concurrency, workers)
+
+    results: Dict[str, dict] = {}
+    async with client_context as client:
+        for index, name in enumerate(scenarios):
+            if name == "download" and not ctx.file_ids:
+                continue
+            result = await run_scenario(
+                client, SCENARIOS[name], ctx, requests, concurrency, seed=index + 1
+            )
+            results[f"{transport}/{name}"] = asdict(result)
+            print(f"  {transport}/{name}: {result.rps} rps, p95 {result.p95_ms} мс", flush=True)
+    return results
+
+
+async def dataset_size() -> int:
+    async with async_session_maker() as session:
+        return (await session.execute(select(func.count(Task.id)))).scalar_one()
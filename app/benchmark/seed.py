@@ -0,0 +1,108 @@
+import hashlib
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import func, insert, select
+
+from app.config import settings
+from app.database import Base, async_engine, async_session_maker
+from app.events.models import TaskEvent  # noqa: F401 — таблица для create_all
+from app.files.models import File, FileBlob
+from app.files.utils import blob_path
+from app.jobs.models import Job  # noqa: F401 — таблица для create_all
+from app.tasks import search  # noqa: F401 — FTS-индексы вешаются на create_all
+from app.tasks.counters import TaskCounterRepository
+from app.tasks.models import Status, Task
+
+DATASETS: Dict[str, int] = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+# Слова заголовков и описаний: по ним сценарий поиска строит запросы
+WORDS = (
+    "отчет", "договор", "сервер", "ошибка", "принтер", "доступ", "обновление",
+    "пациент", "запись", "лаборатория", "справка", "рецепт", "расписание", "выгрузка",
+)
+PROJECTS = ("issue", "question", "feature")
+STATUSES = tuple(Status)
+
+# Содержимое, на которое ссылаются все синтетические файлы (одна запись FileBlob)
+_BLOB_SIZE = 64 * 1024
+_BATCH_SIZE = 10_000
+
+
+def organisations() -> List[str]:
+    """Организации задач — названия из ORGANISATION_MAP, как их пишет клиент"""
+    return list(settings.ORGANISATION_MAP.values()) or ["Организация"]
+
+
+async def seed(tasks: int, files_ratio: float = 0.3, seed: int = 0) -> int:
+    """
+    Заполняет пустую БД синтетическими задачами за последний год и файлами
+    к доле files_ratio задач, затем пересчитывает счетчики статистики.
+    Возвращает число задач в БД; непустую БД не трогает
+    """
+    async with async_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    rng = random.Random(seed)
+    names = organisations()
+    now = datetime.now().replace(microsecond=0)
+
+    async with async_session_maker() as session:
+        existing = (await session.execute(select(func.count(Task.id)))).scalar_one()
+        if existing:
+            return existing
+
+        content = rng.randbytes(_BLOB_SIZE)
+        checksum = hashlib.sha256(content).hexdigest()
+        filepath = blob_path(checksum)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        filepath.write_bytes(content)
+
+        files = 0
+        for start in range(0, tasks, _BATCH_SIZE):
+            rows = []
+            for _ in range(min(_BATCH_SIZE, tasks - start)):
+                created_at = now - timedelta(seconds=rng.randrange(365 * 24 * 3600))
+                words = rng.sample(WORDS, 3)
+                rows.append(
+                    {
+                        "title": f"{words[0].capitalize()} {words[1]} №{start + len(rows) + 1}",
+                        "description": " ".join(rng.choices(WORDS, k=12)),
+                        "project": rng.choice(PROJECTS),
+                        "organisation": rng.choice(names),
+                        "status": rng.choice(STATUSES),
+                        "created_at": created_at,
+                        "updated_at": created_at,
+                    }
+                )
+            result = await session.execute(insert(Task).returning(Task.id), rows)
+            task_ids = result.scalars().all()
+
+            file_rows = [
+                {
+                    "task_id": task_id,
+                    "filename": f"{rng.choice(WORDS)}.bin",
+                    "filepath": str(filepath),
+                    "mimetype": "application/octet-stream",
+                    "size": _BLOB_SIZE,
+                    "checksum": checksum,
+                }
+                for task_id in task_ids
+                if rng.random() < files_ratio
+            ]
+            if file_rows:
+                await session.execute(insert(File), file_rows)
+                files += len(file_rows)
+            await session.commit()
+
+        if files:
+            await session.execute(
+                insert(FileBlob).values(
+                    checksum=checksum, filepath=str(filepath), size=_BLOB_SIZE, ref_count=files
+                )
+            )
+            await session.commit()
+
+        await TaskCounterRepository(session).rebuild()
+    return tasks
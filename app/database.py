@@ -1,5 +1,6 @@
 from typing import AsyncGenerator
-from sqlalchemy import Integer, DateTime, func
+from sqlalchemy import Integer, DateTime, event, func
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.ext.asyncio import (
     async_sessionmaker,
     create_async_engine,
@@ -8,8 +9,54 @@ from sqlalchemy.ext.asyncio import (
 )
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, declared_attr
 from app.config import settings
+from app.utils.metrics import TimedAsyncQueuePool
 
-async_engine = create_async_engine(url=settings.SQLITE_DATABASE_URL)
+# SQLite хранит server_default CURRENT_TIMESTAMP без микросекунд,
+# поэтому параметры пишем в том же формате — иначе сравнение строк
+# в keyset-пагинации (created_at = :value) никогда не совпадет
+TimestampType = DateTime().with_variant(
+    sqlite.DATETIME(
+        storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"
+    ),
+    "sqlite",
+)
+
+
+
+def _engine_options() -> dict:
+    options = {
+        "echo": settings.DB_ECHO,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "poolclass": TimedAsyncQueuePool,
+    }
+    if settings.DATABASE_BACKEND == "postgresql" and settings.DB_STATEMENT_TIMEOUT_MS:
+        options["connect_args"] = {
+            "server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+        }
+    return options
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """
+    WAL позволяет читать параллельно с записью, а busy_timeout заставляет
+    писателей ждать блокировку вместо мгновенного "database is locked"
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.close()
+
+
+async_engine = create_async_engine(url=settings.DATABASE_URL, **_engine_options())
+
+if async_engine.dialect.name == "sqlite":
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
 
 async_session_maker = async_sessionmaker(async_engine, expire_on_commit=False)
 
@@ -33,9 +80,9 @@ class Base(AsyncAttrs, DeclarativeBase):
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    created_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
+    created_at: Mapped[DateTime] = mapped_column(TimestampType, server_default=func.now())
     updated_at: Mapped[DateTime] = mapped_column(
-        DateTime, server_default=func.now(), onupdate=func.now()
+        TimestampType, server_default=func.now(), onupdate=func.now()
     )
 
     @declared_attr.directive
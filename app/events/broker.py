@@ -0,0 +1,210 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+from uuid import uuid4
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.database import async_session_maker
+from app.events.repository import EventRepository
+from app.events.schemas import EventType, TaskEventPublic
+from app.tasks.cache import task_cache
+
+# Сколько событий записывается одним INSERT и читается за один опрос
+_BATCH_SIZE = 500
+# Предел отслеживаемых пропусков: скачок ID больше этого (откат большой пачки) не ждем
+_MAX_GAPS = _BATCH_SIZE * 10
+
+
+class Subscriber:
+    """Подписка одного клиента. None в очереди означает, что подписка снята"""
+
+    def __init__(self, organisations: Optional[Iterable[str]], queue_size: int):
+        self.organisations = set(organisations) if organisations else None
+        self.queue: "asyncio.Queue[Optional[TaskEventPublic]]" = asyncio.Queue(queue_size)
+        self.dropped = False
+
+    def matches(self, event: TaskEventPublic) -> bool:
+        return self.organisations is None or event.organisation in self.organisations
+
+
+class EventBroker:
+    """
+    Издатель-подписчик событий задач внутри процесса.
+
+    Роутеры публикуют события без ожидания: фоновая задача пачками пишет их
+    в таблицу taskevent и раздает локальным подписчикам, а другая фоновая
+    задача опрашивает таблицу и раздает события, опубликованные другими
+    процессами. Подписчик, не успевающий разбирать очередь, отключается,
+    чтобы не копить события в памяти.
+
+    ID событий выделяются при вставке, а видны другим после коммита: в
+    PostgreSQL событие с меньшим ID может стать видимым позже большего.
+    Опрос запоминает пропущенные ID ниже прочитанного максимума и
+    перечитывает их gap_grace секунд, пока не найдет; такие события
+    доходят до подписчиков после событий с большим ID
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        db_fanout: bool = settings.EVENTS_DB_FANOUT,
+        poll_interval: float = settings.EVENTS_POLL_INTERVAL,
+        queue_size: int = settings.EVENTS_QUEUE_SIZE,
+        retention: float = settings.EVENTS_RETENTION,
+        gap_grace: float = settings.EVENTS_GAP_GRACE,
+    ):
+        self._session_maker = session_maker
+        self._db_fanout = db_fanout
+        self._poll_interval = poll_interval
+        self._queue_size = queue_size
+        self._retention = retention
+        self._gap_grace = gap_grace
+        self._origin = uuid4().hex
+        self._subscribers: set[Subscriber] = set()
+        self._outbox: "asyncio.Queue[TaskEventPublic]" = asyncio.Queue(_BATCH_SIZE * 20)
+        self._workers: List[asyncio.Task] = []
+        self._last_id: Optional[int] = None
+        # Пропущенные ID ниже _last_id -> время (monotonic), до которого их ждем
+        self._gaps: Dict[int, float] = {}
+        self._dropped = 0
+
+    def subscribe(self, organisations: Optional[Iterable[str]] = None) -> Subscriber:
+        """Подписка на события; organisations — фильтр по Task.organisation"""
+        subscriber = Subscriber(organisations, self._queue_size)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def publish(
+        self,
+        event_type: EventType,
+        task_id: int,
+        organisation: Optional[str],
+        data: Optional[dict] = None,
+    ) -> None:
+        event = TaskEventPublic(
+            type=event_type, task_id=task_id, organisation=organisation, data=data
+        )
+        if not self._db_fanout or not self._workers:
+            self._deliver([event])
+            return
+        try:
+            self._outbox.put_nowait(event)
+        except asyncio.QueueFull:
+            # БД не успевает — другие процессы событие не увидят, но локальные подписчики получат
+            logger.warning("Очередь записи событий переполнена, событие не сохранено в БД")
+            self._deliver([event])
+
+    def _deliver(self, events: List[TaskEventPublic]) -> None:
+        for subscriber in list(self._subscribers):
+            for event in events:
+                if not subscriber.matches(event):
+                    continue
+                try:
+                    subscriber.queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    self._drop(subscriber)
+                    break
+
+    def _drop(self, subscriber: Subscriber) -> None:
+        """Отключает медленного подписчика: очищает его очередь и кладет маркер конца"""
+        self._subscribers.discard(subscriber)
+        subscriber.dropped = True
+        self._dropped += 1
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+        logger.warning("Подписчик событий отключен: очередь переполнена")
+
+    async def _write_forever(self) -> None:
+        while True:
+            batch = [await self._outbox.get()]
+            while not self._outbox.empty() and len(batch) < _BATCH_SIZE:
+                batch.append(self._outbox.get_nowait())
+            try:
+                async with self._session_maker() as session:
+                    event_ids = await EventRepository(session).create_many(batch, self._origin)
+                for event, event_id in zip(batch, event_ids):
+                    event.id = event_id
+            except Exception as e:
+                logger.error(f"Failed to store task events: {str(e)}")
+            self._deliver(batch)
+
+    async def _poll_forever(self) -> None:
+        last_prune = 0.0
+        while True:
+            event_ids: List[int] = []
+            try:
+                async with self._session_maker() as session:
+                    repo = EventRepository(session)
+                    if self._last_id is None:
+                        self._last_id = await repo.last_id()
+                    event_ids, events = await repo.list_after(
+                        self._last_id, self._origin, _BATCH_SIZE, list(self._gaps)
+                    )
+                    self._track_gaps(event_ids)
+                    if events:
+                        # Задачи изменены другими процессами: кэш чтения этого процесса устарел
+                        task_cache.invalidate_tasks({event.task_id for event in events})
+                        self._deliver(events)
+                    if time.monotonic() - last_prune > self._retention / 10:
+                        last_prune = time.monotonic()
+                        moment = datetime.now(timezone.utc) - timedelta(seconds=self._retention)
+                        await repo.delete_older_than(moment.replace(tzinfo=None))
+            except Exception as e:
+                logger.error(f"Failed to poll task events: {str(e)}")
+            if len(event_ids) < _BATCH_SIZE:
+                await asyncio.sleep(self._poll_interval)
+
+    def _track_gaps(self, event_ids: List[int]) -> None:
+        """Сдвигает _last_id к прочитанному максимуму и запоминает ID, которых не было"""
+        now = time.monotonic()
+        for event_id in event_ids:
+            self._gaps.pop(event_id, None)
+        self._gaps = {event_id: until for event_id, until in self._gaps.items() if until > now}
+        if not event_ids or event_ids[-1] <= self._last_id:
+            return
+        seen = set(event_ids)
+        for event_id in range(self._last_id + 1, event_ids[-1]):
+            if len(self._gaps) >= _MAX_GAPS:
+                break
+            if event_id not in seen:
+                self._gaps[event_id] = now + self._gap_grace
+        self._last_id = event_ids[-1]
+
+    def start(self) -> None:
+        if self._db_fanout and not self._workers:
+            self._workers = [
+                asyncio.create_task(self._write_forever()),
+                asyncio.create_task(self._poll_forever()),
+            ]
+
+    async def close(self) -> None:
+        workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        # Завершаем открытые потоки, иначе остановка сервера ждет их отключения
+        for subscriber in list(self._subscribers):
+            self.unsubscribe(subscriber)
+            while not subscriber.queue.empty():
+                subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(None)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "dropped": self._dropped,
+            "pending_writes": self._outbox.qsize(),
+            "last_id": self._last_id,
+            "gaps": len(self._gaps),
+        }
+
+
+event_broker = EventBroker(async_session_maker)
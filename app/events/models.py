@@ -0,0 +1,23 @@
+from typing import Optional
+
+from sqlalchemy import Index, Integer, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base
+
+
+class TaskEvent(Base):
+    """
+    Журнал событий задач и файлов. Через него события доходят
+    до подписчиков в других процессах (воркерах uvicorn)
+    """
+
+    type: Mapped[str] = mapped_column(Text)
+    # Без внешнего ключа: событие об удалении переживает саму задачу
+    task_id: Mapped[int] = mapped_column(Integer)
+    organisation: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    payload: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON
+    origin: Mapped[str] = mapped_column(Text)  # процесс, опубликовавший событие
+
+    # Очистка журнала старше срока хранения
+    __table_args__ = (Index("ix_taskevent_created_at", "created_at"),)
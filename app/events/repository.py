@@ -0,0 +1,73 @@
+import json
+from datetime import datetime
+from typing import Collection, List, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.events.models import TaskEvent
+from app.events.schemas import TaskEventPublic
+
+
+class EventRepository:
+    def __init__(self, session: AsyncSession):
+        self._session: AsyncSession = session
+
+    async def create_many(self, events: List[TaskEventPublic], origin: str) -> List[int]:
+        """Записывает события одним INSERT и возвращает их ID в порядке входа"""
+        stmt = insert(TaskEvent).returning(TaskEvent.id)
+        result = await self._session.scalars(
+            stmt,
+            [
+                {
+                    "type": event.type,
+                    "task_id": event.task_id,
+                    "organisation": event.organisation,
+                    "payload": json.dumps(event.data, ensure_ascii=False)
+                    if event.data is not None
+                    else None,
+                    "origin": origin,
+                }
+                for event in events
+            ],
+        )
+        event_ids = sorted(result.all())
+        await self._session.commit()
+        return event_ids
+
+    async def last_id(self) -> int:
+        result = await self._session.execute(select(func.max(TaskEvent.id)))
+        return result.scalar() or 0
+
+    async def list_after(
+        self, last_id: int, exclude_origin: str, limit: int, missing_ids: Collection[int] = ()
+    ) -> Tuple[List[int], List[TaskEventPublic]]:
+        """
+        События после last_id и пропущенные ранее missing_ids. Возвращает ID
+        всех прочитанных строк, включая события этого процесса, и события,
+        опубликованные другими процессами
+        """
+        stmt = select(TaskEvent).where(TaskEvent.id > last_id).order_by(TaskEvent.id).limit(limit)
+        rows = list((await self._session.scalars(stmt)).all())
+        if missing_ids:
+            # Отдельным запросом: с OR SQLite не использует первичный ключ
+            found = await self._session.scalars(
+                select(TaskEvent).where(TaskEvent.id.in_(missing_ids)).order_by(TaskEvent.id)
+            )
+            rows = [*found.all(), *rows]
+        events = [
+            TaskEventPublic(
+                id=row.id,
+                type=row.type,
+                task_id=row.task_id,
+                organisation=row.organisation,
+                data=json.loads(row.payload) if row.payload is not None else None,
+            )
+            for row in rows
+            if row.origin != exclude_origin
+        ]
+        return [row.id for row in rows], events
+
+    async def delete_older_than(self, moment: datetime) -> None:
+        await self._session.execute(delete(TaskEvent).where(TaskEvent.created_at < moment))
+        await self._session.commit()
@@ -0,0 +1,62 @@
+import asyncio
+from typing import AsyncIterator, List, Optional
+
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+
+from app.config import settings
+from app.events.broker import Subscriber, event_broker
+
+router = APIRouter()
+
+
+@router.get("/")
+async def stream_events(
+    organisation: Optional[List[str]] = Query(
+        None, description="Фильтр по организации (название или код), можно несколько"
+    ),
+):
+    """
+    Поток событий задач и файлов (Server-Sent Events).
+    Раз в EVENTS_HEARTBEAT секунд без событий отправляется комментарий-пинг.
+    Если клиент не успевает читать поток, сервер присылает событие dropped
+    и закрывает соединение — клиенту нужно перечитать данные и переподключиться
+    """
+    organisations = (
+        {settings.ORGANISATION_MAP.get(value, value) for value in organisation}
+        if organisation
+        else None
+    )
+    subscriber = event_broker.subscribe(organisations)
+    return StreamingResponse(
+        _event_stream(subscriber),
+        media_type="text/event-stream",
+        headers={"cache-control": "no-cache", "x-accel-buffering": "no"},
+    )
+
+
+@router.get("/stats")
+async def get_events_stats():
+    """Счетчики подписчиков и очереди событий"""
+    return event_broker.stats()
+
+
+async def _event_stream(subscriber: Subscriber) -> AsyncIterator[str]:
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    subscriber.queue.get(), settings.EVENTS_HEARTBEAT
+                )
+            except TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if event is None:
+                if subscriber.dropped:
+                    yield "event: dropped\ndata: {}\n\n"
+                return
+            event_id = f"id: {event.id}\n" if event.id is not None else ""
+            yield f"{event_id}event: {event.type}\ndata: {event.model_dump_json()}\n\n"
+    finally:
+        event_broker.unsubscribe(subscriber)
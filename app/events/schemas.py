@@ -0,0 +1,22 @@
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field
+
+EventType = Literal[
+    "task.created",
+    "task.updated",
+    "task.status_changed",
+    "task.deleted",
+    "file.attached",
+    "file.processed",
+]
+
+
+class TaskEventPublic(BaseModel):
+    id: Optional[int] = Field(None, description="Позиция события в журнале")
+    type: EventType
+    task_id: int
+    organisation: Optional[str] = None
+    data: Optional[dict] = Field(
+        None, description="Состояние задачи или прикрепленные файлы, если они известны"
+    )
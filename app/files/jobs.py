@@ -0,0 +1,72 @@
+from app.config import settings
+from app.database import async_session_maker
+from app.events.broker import event_broker
+from app.files.processing import analyse_file
+from app.files.repository import PROCESS_FILE_JOB, FileRepository
+from app.files.schemas import FilePublic
+from app.files.utils import thumbnail_path
+from app.jobs.queue import PermanentJobError, job_queue
+from app.tasks.cache import task_cache
+from app.tasks.repository import TaskRepository
+
+
+async def process_file(payload: dict) -> None:
+    """
+    Обработка загруженного файла: MIME по содержимому (вместо присланного
+    клиентом), SHA-256 (если не посчитан при загрузке), миниатюра
+    изображения, проверка на вирусы
+    """
+    async with async_session_maker() as session:
+        file_record = await FileRepository(session).get_by_id(payload["file_id"])
+    if file_record is None:
+        return  # файл удален, пока задача ждала очереди
+
+    try:
+        result = await job_queue.run_cpu(
+            analyse_file,
+            file_record.filepath,
+            file_record.filename,
+            str(thumbnail_path(file_record.filepath)),
+            settings.FILE_THUMBNAIL_SIZE,
+            settings.FILE_SCAN_COMMAND,
+            settings.FILE_SCAN_TIMEOUT,
+            file_record.checksum,
+        )
+    except FileNotFoundError:
+        async with async_session_maker() as session:
+            if await FileRepository(session).get_by_id(file_record.id) is None:
+                return  # файл удален во время обработки
+        raise PermanentJobError("Содержимое файла отсутствует на диске")
+
+    await _save_result(
+        file_record.id,
+        {
+            "mimetype": result["mimetype"] or file_record.mimetype,
+            "checksum": result["checksum"],
+            "size": result["size"],
+            "has_thumbnail": result["thumbnail"],
+            "processing_status": "infected" if result["infected"] else "ready",
+        },
+    )
+
+
+async def mark_failed(payload: dict, error: str) -> None:
+    await _save_result(payload["file_id"], {"processing_status": "failed"})
+
+
+async def _save_result(file_id: int, values: dict) -> None:
+    async with async_session_maker() as session:
+        updated_file = await FileRepository(session).update_processing(file_id, values)
+        if updated_file is None:
+            return
+        organisation = await TaskRepository(session).get_organisation(updated_file.task_id)
+    task_cache.invalidate_task(updated_file.task_id)
+    event_broker.publish(
+        "file.processed",
+        updated_file.task_id,
+        organisation,
+        {"files": [FilePublic.model_validate(updated_file).model_dump(mode="json")]},
+    )
+
+
+job_queue.register(PROCESS_FILE_JOB, process_file, on_failure=mark_failed)
@@ -1,6 +1,6 @@
 from typing import Optional
 
-from sqlalchemy import ForeignKey, Text
+from sqlalchemy import ForeignKey, Text, false
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -11,7 +11,21 @@ class File(Base):
     filepath: Mapped[str] = mapped_column(Text)
     mimetype: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     size: Mapped[Optional[int]] = mapped_column(nullable=True, default=0)
+    checksum: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # sha256, hex
+    # Фоновая обработка: pending, ready, infected, failed; None — файл загружен до нее
+    processing_status: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    has_thumbnail: Mapped[bool] = mapped_column(default=False, server_default=false())
 
-    task_id: Mapped[int] = mapped_column(ForeignKey("task.id"))
+    # Индекс для загрузки файлов задач (selectinload) и удаления вместе с задачей
+    task_id: Mapped[int] = mapped_column(ForeignKey("task.id"), index=True)
 
     task: Mapped["Task"] = relationship("Task", back_populates="files")
+
+
+class FileBlob(Base):
+    """Общее содержимое файлов в контентно-адресуемом хранилище"""
+
+    checksum: Mapped[str] = mapped_column(Text, unique=True)  # sha256, hex
+    filepath: Mapped[str] = mapped_column(Text, index=True)  # release() ищет по пути
+    size: Mapped[int] = mapped_column(default=0)
+    ref_count: Mapped[int] = mapped_column(default=0)
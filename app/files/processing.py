@@ -0,0 +1,162 @@
+"""
+CPU-этапы обработки загруженного файла. Выполняются в пуле процессов
+фоновых задач, поэтому модуль не импортирует настройки и БД приложения:
+все параметры передаются аргументами
+"""
+
+import hashlib
+import mimetypes
+import os
+import shlex
+import subprocess
+import uuid
+from typing import Optional
+
+try:
+    from PIL import Image
+except ImportError:  # без Pillow миниатюры не создаются
+    Image = None
+
+_CHUNK_SIZE = 1024 * 1024
+_SNIFF_SIZE = 8192
+
+# Сигнатуры в начале файла
+_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+    (b"%PDF-", "application/pdf"),
+    (b"PK\x03\x04", "application/zip"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/x-ole-storage"),
+    (b"\x1f\x8b", "application/gzip"),
+    (b"7z\xbc\xaf\x27\x1c", "application/x-7z-compressed"),
+    (b"Rar!\x1a\x07", "application/vnd.rar"),
+    (b"{\\rtf", "application/rtf"),
+    (b"OggS", "audio/ogg"),
+    (b"fLaC", "audio/flac"),
+    (b"ID3", "audio/mpeg"),
+    (b"\x1aE\xdf\xa3", "video/webm"),
+)
+# Контейнеры, конкретный тип которых виден только по расширению (docx, xlsx, odt, doc, xls)
+_CONTAINERS = {"application/zip", "application/x-ole-storage"}
+_TEXT_TYPES = {"application/json", "application/xml", "application/javascript", "image/svg+xml"}
+
+# Тестовая сигнатура антивирусов; по стандарту файл с ней не длиннее 128 байт
+EICAR = rb"X5O!P%@AP[4\PZX54(P^)7CC)7}$EICAR-STANDARD-ANTIVIRUS-TEST-FILE!$H+H*"
+
+
+def sniff_mimetype(head: bytes, filename: str) -> Optional[str]:
+    """MIME по содержимому начала файла; None — тип не распознан"""
+    guessed = mimetypes.guess_type(filename)[0]
+    for signature, mimetype in _SIGNATURES:
+        if head.startswith(signature):
+            if mimetype in _CONTAINERS and guessed and guessed.startswith("application/"):
+                return guessed
+            return mimetype
+    if head[:4] == b"RIFF" and head[8:12] in (b"WEBP", b"WAVE", b"AVI "):
+        return {b"WEBP": "image/webp", b"WAVE": "audio/wav", b"AVI ": "video/x-msvideo"}[head[8:12]]
+    if head[4:8] == b"ftyp":
+        return "image/heic" if head[8:12] in (b"heic", b"heix", b"mif1") else "video/mp4"
+    if _is_text(head):
+        if guessed and (guessed.startswith("text/") or guessed in _TEXT_TYPES):
+            return guessed
+        return "text/plain"
+    return None
+
+
+def _is_text(head: bytes) -> bool:
+    if b"\x00" in head:
+        return False
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # Многобайтный символ, обрезанный на границе прочитанного блока
+        return e.start >= len(head) - 3 and len(head) == _SNIFF_SIZE
+    return True
+
+
+def file_checksum(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def make_thumbnail(path: str, thumbnail_path: str, size: int) -> bool:
+    """
+    Пишет миниатюру PNG. False — Pillow не установлен или файл не читается как
+    изображение. Миниатюра общего содержимого создается один раз
+    """
+    if Image is None:
+        return False
+    if os.path.exists(thumbnail_path):
+        return True
+    tmp_path = f"{thumbnail_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with Image.open(path) as image:
+            image.thumbnail((size, size))
+            if image.mode not in ("RGB", "RGBA", "L", "LA"):
+                image = image.convert("RGBA")
+            image.save(tmp_path, "PNG")
+        os.replace(tmp_path, thumbnail_path)
+    except Exception:
+        # Поврежденное или неподдерживаемое изображение — файл остается без миниатюры
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        return False
+    return True
+
+
+def scan_file(path: str, head: bytes, command: Optional[str], timeout: float) -> bool:
+    """
+    True — файл заражен. Без внешней команды проверяется только
+    тестовая сигнатура EICAR. Ошибка команды (код кроме 0 и 1)
+    бросает RuntimeError, и задача уходит на повтор
+    """
+    if EICAR in head[:128]:
+        return True
+    if not command:
+        return False
+    args = [arg.replace("{path}", path) for arg in shlex.split(command)]
+    result = subprocess.run(args, capture_output=True, timeout=timeout)
+    if result.returncode not in (0, 1):
+        output = (result.stderr or result.stdout).decode("utf-8", "replace").strip()
+        raise RuntimeError(f"Проверка файла завершилась с кодом {result.returncode}: {output}")
+    return result.returncode == 1
+
+
+def analyse_file(
+    path: str,
+    filename: str,
+    thumbnail_path: str,
+    thumbnail_size: int,
+    scan_command: Optional[str],
+    scan_timeout: float,
+    checksum: Optional[str] = None,
+) -> dict:
+    """
+    Все этапы обработки файла за один вызов в процессе пула.
+    Известная контрольная сумма (посчитана при загрузке) не пересчитывается
+    """
+    with open(path, "rb") as file:
+        head = file.read(_SNIFF_SIZE)
+    mimetype = sniff_mimetype(head, filename)
+    infected = scan_file(path, head, scan_command, scan_timeout)
+    thumbnail = (
+        not infected
+        and mimetype is not None
+        and mimetype.startswith("image/")
+        and mimetype != "image/svg+xml"
+        and make_thumbnail(path, thumbnail_path, thumbnail_size)
+    )
+    return {
+        "mimetype": mimetype,
+        "checksum": checksum or file_checksum(path),
+        "size": os.path.getsize(path),
+        "infected": infected,
+        "thumbnail": thumbnail,
+    }
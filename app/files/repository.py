@@ -1,21 +1,62 @@
-from typing import List, Optional
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
 
-from sqlalchemy import delete, insert, select
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.files.models import File
+from app.files.models import File, FileBlob
+from app.files.schemas import FilePublic
+from app.jobs.queue import utcnow
+from app.jobs.repository import JobRepository
+from app.tasks.models import Task
+
+# Фоновая обработка файла после загрузки (app/files/jobs.py)
+PROCESS_FILE_JOB = "file.process"
 
 
 class FileRepository:
     def __init__(self, session: AsyncSession):
         self._session: AsyncSession = session
 
-    async def create(self, file_data_dict: dict) -> int:
-        """Создает новый файл в БД и возвращает его ID"""
-        stmt = insert(File).values(**file_data_dict).returning(File.id)
-        result = await self._session.execute(stmt)
+    async def create(self, file_data_dict: dict) -> File:
+        """Создает новый файл в БД одним INSERT ... RETURNING и возвращает его"""
+        stmt = insert(File).values(**file_data_dict).returning(File)
+        result = await self._session.scalars(stmt)
+        created_file = result.one()
+        await self._touch_tasks({created_file.task_id})
+        await self._enqueue_processing([created_file])
         await self._session.commit()
-        return result.scalar()
+        return created_file
+
+    async def create_many(self, file_data_dicts: List[dict]) -> List[File]:
+        """Создает несколько файлов одним пакетным INSERT ... RETURNING"""
+        stmt = insert(File).values(file_data_dicts).returning(File)
+        result = await self._session.scalars(stmt)
+        created_files = sorted(result.all(), key=lambda file: file.id)
+        await self._touch_tasks({file.task_id for file in created_files})
+        await self._enqueue_processing(created_files)
+        await self._session.commit()
+        return created_files
+
+    async def _enqueue_processing(self, files: List[File]) -> None:
+        """Файлы со статусом pending получают задачу обработки в той же транзакции"""
+        await JobRepository(self._session).enqueue_many(
+            PROCESS_FILE_JOB,
+            [{"file_id": file.id} for file in files if file.processing_status == "pending"],
+            utcnow(),
+        )
+
+    async def update_processing(self, file_id: int, values: dict) -> Optional[File]:
+        """Записывает результат фоновой обработки; None — файл уже удален"""
+        stmt = update(File).where(File.id == file_id).values(**values).returning(File)
+        result = await self._session.scalars(stmt)
+        updated_file = result.one_or_none()
+        if updated_file is None:
+            return None
+        await self._touch_tasks({updated_file.task_id})
+        await self._session.commit()
+        return updated_file
 
     async def get_by_id(self, file_id: int) -> Optional[File]:
         """Получает файл по ID"""
@@ -29,9 +70,130 @@ class FileRepository:
         result = await self._session.execute(stmt)
         return list(result.scalars().all())
 
-    async def delete_by_id(self, file_id: int) -> bool:
-        """Удаляет файл по ID"""
-        stmt = delete(File).where(File.id == file_id)
-        operation_result = await self._session.execute(stmt)
+    async def get_rows_by_task_ids(self, task_ids: List[int]) -> Dict[int, List[dict]]:
+        """Файлы задач словарями с полями FilePublic, сгруппированные по ID задачи"""
+        columns = [getattr(File, name) for name in FilePublic.model_fields]
+        stmt = (
+            select(File.task_id, *columns)
+            .where(File.task_id.in_(task_ids))
+            .order_by(File.id)
+        )
+        result = await self._session.execute(stmt)
+        files: Dict[int, List[dict]] = {}
+        for row in result.mappings():
+            files.setdefault(row["task_id"], []).append(dict(row))
+        return files
+
+    async def delete_by_id(self, file_id: int) -> Optional[List[str]]:
+        """
+        Удаляет файл по ID.
+        Возвращает пути освобожденного содержимого, которое можно удалить с диска,
+        или None, если файл не найден
+        """
+        stmt = delete(File).where(File.id == file_id).returning(File.filepath, File.task_id)
+        result = await self._session.execute(stmt)
+        row = result.one_or_none()
+        if row is None:
+            return None
+        await self._touch_tasks({row.task_id})
+        released = await BlobRepository(self._session).release([row.filepath])
         await self._session.commit()
-        return operation_result.rowcount > 0
+        return released
+
+    async def _touch_tasks(self, task_ids: set) -> None:
+        """Файлы — часть задачи: их изменение меняет версию и updated_at задачи"""
+        await self._session.execute(
+            update(Task).where(Task.id.in_(task_ids)).values(version=Task.version + 1)
+        )
+
+    async def delete_by_task_ids(self, task_ids: List[int]) -> List[str]:
+        """
+        Удаляет записи файлов задач без коммита.
+        Возвращает пути освобожденного содержимого
+        """
+        stmt = delete(File).where(File.task_id.in_(task_ids)).returning(File.filepath)
+        result = await self._session.execute(stmt)
+        return await BlobRepository(self._session).release(result.scalars().all())
+
+
+class BlobRepository:
+    """Учет ссылок на общее содержимое файлов. Методы не коммитят сессию"""
+
+    def __init__(self, session: AsyncSession):
+        self._session: AsyncSession = session
+
+    async def get_filepaths(self, checksums: List[str]) -> Dict[str, str]:
+        """Возвращает пути уже сохраненного содержимого: {checksum: filepath}"""
+        stmt = select(FileBlob.checksum, FileBlob.filepath).where(
+            FileBlob.checksum.in_(set(checksums))
+        )
+        result = await self._session.execute(stmt)
+        return {checksum: filepath for checksum, filepath in result.all()}
+
+    async def acquire_many(self, blobs: List[Tuple[str, str, int]]) -> Dict[str, Tuple[str, bool]]:
+        """
+        Создает записи содержимого или увеличивает счетчики ссылок одним запросом.
+        blobs — список (checksum, filepath, size), одинаковые хеши допускаются;
+        filepath используется только для новых записей.
+        Возвращает {checksum: (filepath, создана ли запись этим вызовом)}. Строка
+        остается заблокированной до конца транзакции, поэтому существующее
+        содержимое не освободится, пока ссылка не зафиксирована
+        """
+        if not blobs:
+            return {}
+        counts = Counter(checksum for checksum, _, _ in blobs)
+        rows = {
+            checksum: {
+                "checksum": checksum,
+                "filepath": filepath,
+                "size": size,
+                "ref_count": counts[checksum],
+            }
+            for checksum, filepath, size in blobs
+        }
+
+        dialect_insert = {
+            "sqlite": sqlite.insert,
+            "postgresql": postgresql.insert,
+        }[self._session.bind.dialect.name]
+        stmt = dialect_insert(FileBlob).values(list(rows.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[FileBlob.checksum],
+            set_={"ref_count": FileBlob.ref_count + stmt.excluded.ref_count},
+        ).returning(FileBlob.checksum, FileBlob.filepath, FileBlob.ref_count)
+        result = await self._session.execute(stmt)
+        return {
+            checksum: (filepath, ref_count == counts[checksum])
+            for checksum, filepath, ref_count in result.all()
+        }
+
+    async def release(self, filepaths: List[str]) -> List[str]:
+        """
+        Уменьшает счетчики ссылок для указанных путей.
+        Возвращает пути содержимого, на которое больше никто не ссылается.
+        Путь без записи содержимого (загрузка без дедупликации) принадлежит
+        единственному файлу и освобождается сразу
+        """
+        if not filepaths:
+            return []
+
+        blob_paths = set()
+        for filepath, count in Counter(filepaths).items():
+            result = await self._session.execute(
+                update(FileBlob)
+                .where(FileBlob.filepath == filepath)
+                .values(ref_count=FileBlob.ref_count - count)
+                .returning(FileBlob.filepath)
+            )
+            blob_paths.update(result.scalars().all())
+
+        released = [filepath for filepath in set(filepaths) if filepath not in blob_paths]
+        if blob_paths:
+            stmt = (
+                delete(FileBlob)
+                .where(FileBlob.filepath.in_(blob_paths), FileBlob.ref_count <= 0)
+                .returning(FileBlob.filepath)
+            )
+            result = await self._session.execute(stmt)
+            released.extend(result.scalars().all())
+        return released
@@ -1,13 +1,34 @@
-from fastapi import Depends, UploadFile, APIRouter, HTTPException, File, status
+import asyncio
+from pathlib import Path
+from typing import Awaitable, Dict, List, Tuple, TypeVar
+
+from fastapi import Depends, UploadFile, APIRouter, HTTPException, File, Request, status
 from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.conditional import http_date, is_not_modified, not_modified_response
+from app.config import settings
 from app.database import get_session
+from app.events.broker import event_broker
+from app.files import jobs  # noqa: F401 — регистрирует обработчик задач file.process
+from app.jobs.queue import job_queue
+from app.tasks.cache import task_cache
 from app.tasks.repository import TaskRepository
 from app.files.schemas import FilePublic, FileCreate
-from app.files.utils import save_upload_file
-from app.files.repository import FileRepository
+from app.files.utils import (
+    FileTooLargeError,
+    SavedFile,
+    file_etag,
+    move_blob,
+    new_blob_path,
+    remove_files,
+    save_upload_file,
+    spool_upload_file,
+    thumbnail_path,
+)
+from app.files.repository import BlobRepository, FileRepository
 
+T = TypeVar("T")
 
 router = APIRouter()
 
@@ -22,8 +43,38 @@ async def upload_file_to_task(
     session: AsyncSession = Depends(get_session),
     file: UploadFile = File(..., description="Файл для загрузки"),
 ):
-    """Загружает файл и прикрепляет его к задаче"""
-    if not file or not file.filename:
+    """
+    Загружает файл и прикрепляет его к задаче.
+    Ответ отправляется, как только содержимое записано на диск; MIME по
+    содержимому, миниатюра и проверка на вирусы выполняются фоновой задачей
+    (processing_status в ответе и событие file.processed по завершении)
+    """
+    created_files = await _attach_files(task_id, [file], session)
+    return created_files[0]
+
+
+@router.post(
+    "/{task_id}/batch",
+    response_model=List[FilePublic],
+    status_code=status.HTTP_201_CREATED,
+)
+async def upload_files_to_task(
+    task_id: int,
+    session: AsyncSession = Depends(get_session),
+    files: List[UploadFile] = File(..., description="Файлы для загрузки"),
+):
+    """
+    Загружает несколько файлов за один запрос.
+    Файлы пишутся на диск параллельно (не больше UPLOAD_IO_CONCURRENCY одновременно),
+    записи в БД создаются одним INSERT
+    """
+    return await _attach_files(task_id, files, session)
+
+
+async def _attach_files(
+    task_id: int, files: List[UploadFile], session: AsyncSession
+) -> List[FilePublic]:
+    if not files or any(not file or not file.filename for file in files):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Файл не был получен или имя файла пустое",
@@ -32,59 +83,169 @@ async def upload_file_to_task(
     task_repo = TaskRepository(session)
     file_repo = FileRepository(session)
 
-    task = await task_repo.get_by_id(task_id)
-    if not task:
+    organisation = await task_repo.get_organisation(task_id)
+    if organisation is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Задача не найдена"
         )
 
-    file_size = 0
-    if hasattr(file, "size") and file.size:
-        file_size = file.size
-    else:
-        contents = await file.read()
-        file_size = len(contents)
-        await file.seek(0)
+    # Тело запроса уже ограничено BodySizeLimitMiddleware (UPLOAD_MAX_SIZE на файл с
+    # запасом на multipart, UPLOAD_MAX_REQUEST_SIZE на пакет); здесь — точный предел
+    # для каждого файла пакета
+    if any(file.size is not None and file.size > settings.UPLOAD_MAX_SIZE for file in files):
+        raise HTTPException(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            detail=f"Размер файла превышает {settings.UPLOAD_MAX_SIZE} байт",
+        )
 
     try:
-        saved_filepath = await save_upload_file(file)
+        saved_files, written = await _store_files(files, session)
+    except FileTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка сохранения файла: {str(e)}",
         )
 
-    file_data_for_db = FileCreate(
-        filename=file.filename or "unknown",
-        mimetype=file.content_type or "application/octet-stream",
-        filepath=str(saved_filepath),
-        size=file_size,
-    )
-
-    try:
+    file_data_dicts = []
+    for file, saved_file in zip(files, saved_files):
+        file_data_for_db = FileCreate(
+            filename=file.filename or "unknown",
+            mimetype=file.content_type or "application/octet-stream",
+            filepath=str(saved_file.path),
+            size=saved_file.size,
+            checksum=saved_file.checksum,
+            processing_status="pending" if job_queue.enabled else None,
+        )
         file_data_dict = file_data_for_db.model_dump()
         file_data_dict["task_id"] = task_id
-        file_id = await file_repo.create(file_data_dict)
-        created_file = await file_repo.get_by_id(file_id)
-        if not created_file:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Не удалось создать запись файла",
-            )
-        return created_file
+        file_data_dicts.append(file_data_dict)
+
+    try:
+        created_files = await file_repo.create_many(file_data_dicts)
     except Exception as e:
+        # Ссылки на содержимое откатываются вместе с записями: новые файлы никому не нужны
+        remove_files(str(path) for path in written)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка создания записи файла: {str(e)}",
         )
 
+    task_cache.invalidate_task(task_id)
+    job_queue.notify()
+    if len(created_files) != len(file_data_dicts):
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Не удалось создать запись файла",
+        )
+    event_broker.publish(
+        "file.attached",
+        task_id,
+        organisation,
+        {
+            "files": [
+                FilePublic.model_validate(file).model_dump(mode="json")
+                for file in created_files
+            ]
+        },
+    )
+    return created_files
+
+
+async def _gather_bounded(coroutines: List[Awaitable[T]]) -> List[T]:
+    """
+    Выполняет дисковые операции параллельно, не больше UPLOAD_IO_CONCURRENCY
+    одновременно. При первой ошибке отменяет остальные и пробрасывает ее
+    """
+    semaphore = asyncio.Semaphore(settings.UPLOAD_IO_CONCURRENCY)
+
+    async def bounded(coroutine: Awaitable[T]) -> T:
+        async with semaphore:
+            return await coroutine
+
+    try:
+        async with asyncio.TaskGroup() as group:
+            tasks = [group.create_task(bounded(coroutine)) for coroutine in coroutines]
+    except ExceptionGroup as group_error:
+        raise group_error.exceptions[0]
+    return [task.result() for task in tasks]
+
+
+async def _store_files(
+    files: List[UploadFile], session: AsyncSession
+) -> Tuple[List[SavedFile], List[Path]]:
+    """
+    Сохраняет файлы на диск. Возвращает их и пути, записанные этим запросом:
+    если записи файлов не будут созданы, эти пути нужно удалить.
+
+    В контентно-адресуемом режиме каждый файл за один проход пишется во
+    временный файл и хешируется. Затем ссылки на содержимое берутся в
+    транзакции, которая создаст записи файлов: новое содержимое переносится
+    на место, а для уже известного временный файл удаляется
+    """
+    if not settings.UPLOAD_DEDUPLICATE:
+        saved_files: List[SavedFile] = []
+
+        async def save(file: UploadFile) -> SavedFile:
+            saved_file = await save_upload_file(file)
+            saved_files.append(saved_file)
+            return saved_file
+
+        try:
+            stored = await _gather_bounded([save(file) for file in files])
+        except BaseException:
+            # Часть файлов могла успеть записаться — записей в БД для них не будет
+            remove_files(str(saved_file.path) for saved_file in saved_files)
+            raise
+        return stored, [saved_file.path for saved_file in stored]
+
+    spooled: List[SavedFile] = []
+    written: List[Path] = []
+
+    async def spool(file: UploadFile) -> SavedFile:
+        spooled_file = await spool_upload_file(file)
+        spooled.append(spooled_file)
+        return spooled_file
+
+    try:
+        tmp_files = await _gather_bounded([spool(file) for file in files])
+        blobs = await BlobRepository(session).acquire_many(
+            [(tmp.checksum, str(new_blob_path(tmp.checksum)), tmp.size) for tmp in tmp_files]
+        )
+        sources: Dict[str, Path] = {tmp.checksum: tmp.path for tmp in tmp_files}
+        for checksum, (filepath, created) in blobs.items():
+            # Содержимое известной записи могло пропасть с диска — восстанавливаем его
+            if created or not Path(filepath).exists():
+                move_blob(sources[checksum], Path(filepath))
+                if created:
+                    written.append(Path(filepath))
+    except BaseException:
+        remove_files(str(path) for path in written)
+        raise
+    finally:
+        # Временные файлы, не перенесенные в хранилище
+        remove_files(str(spooled_file.path) for spooled_file in spooled)
+
+    saved_files = [
+        SavedFile(Path(blobs[tmp.checksum][0]), tmp.size, tmp.checksum) for tmp in tmp_files
+    ]
+    return saved_files, written
+
 
 @router.get("/{file_id}")
 async def download_file(
     file_id: int,
+    request: Request,
     session: AsyncSession = Depends(get_session),
 ):
-    """Скачивает файл по его ID"""
+    """
+    Скачивает файл по его ID.
+    Поддерживает Range (206, в т.ч. несколько диапазонов) и условные запросы:
+    304 определяется по записи в БД, без обращения к диску
+    """
     file_repo = FileRepository(session)
 
     file_record = await file_repo.get_by_id(file_id)
@@ -93,8 +254,49 @@ async def download_file(
             status_code=status.HTTP_404_NOT_FOUND, detail="Файл не найден"
         )
 
+    cache_headers = {
+        "etag": file_etag(file_record),
+        "last-modified": http_date(file_record.updated_at),
+        "cache-control": "private, no-cache",
+    }
+    if file_record.processing_status == "infected":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Файл заблокирован: проверка обнаружила вредоносное содержимое",
+        )
+    if is_not_modified(request, cache_headers["etag"], file_record.updated_at):
+        return not_modified_response(cache_headers)
+
+    # Range и If-Range обрабатывает FileResponse, используя переданные ETag/Last-Modified
     return FileResponse(
         path=file_record.filepath,
         filename=file_record.filename,
         media_type=file_record.mimetype or "application/octet-stream",
+        headers=cache_headers,
+    )
+
+
+@router.get("/{file_id}/thumbnail")
+async def download_thumbnail(
+    file_id: int,
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+):
+    """Миниатюра изображения (PNG), созданная фоновой обработкой файла"""
+    file_record = await FileRepository(session).get_by_id(file_id)
+    if not file_record or not file_record.has_thumbnail:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Миниатюра не найдена"
+        )
+
+    cache_headers = {
+        "etag": f'{file_etag(file_record)[:-1]}-thumb"',
+        "cache-control": "private, no-cache",
+    }
+    if is_not_modified(request, cache_headers["etag"]):
+        return not_modified_response(cache_headers)
+    return FileResponse(
+        path=thumbnail_path(file_record.filepath),
+        media_type="image/png",
+        headers=cache_headers,
     )
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import BaseModel, Field, ConfigDict
 
@@ -8,11 +8,16 @@ class FileBase(BaseModel):
     mimetype: str = Field(..., description="(image/jpeg', 'application/pdf')")
 
 
+FileProcessingStatus = Literal["pending", "ready", "infected", "failed"]
+
+
 class FileCreate(BaseModel):
     filename: str = Field(..., description="Имя файла")
     mimetype: Optional[str] = Field(None, description="MIME тип файла")
     filepath: str = Field(..., description="Путь к файлу на сервере")
     size: Optional[int] = Field(None, description="Размер файла в байтах")
+    checksum: Optional[str] = Field(None, description="SHA-256 содержимого (hex)")
+    processing_status: Optional[FileProcessingStatus] = None
 
 
 class FilePublic(BaseModel):
@@ -20,5 +25,12 @@ class FilePublic(BaseModel):
     filename: str
     mimetype: Optional[str] = None
     size: Optional[int] = None
+    checksum: Optional[str] = None
+    processing_status: Optional[FileProcessingStatus] = Field(
+        None,
+        description="Фоновая обработка (MIME, хеш, миниатюра, проверка): "
+        "pending — в очереди, ready — готово, infected — файл заблокирован, failed — ошибка",
+    )
+    has_thumbnail: bool = False
 
     model_config = ConfigDict(from_attributes=True)
@@ -1,5 +1,9 @@
+import asyncio
+import hashlib
+import os
 import uuid
 from pathlib import Path
+from typing import Iterable, NamedTuple
 
 import aiofiles
 from fastapi import UploadFile
@@ -7,21 +11,112 @@ from fastapi import UploadFile
 from app.config import settings
 
 UPLOAD_DIR = Path(settings.UPLOAD_DIR)
+BLOB_DIR = UPLOAD_DIR / "blobs"
 
 
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+BLOB_DIR.mkdir(parents=True, exist_ok=True)
+
+
+class FileTooLargeError(Exception):
+    """Загружаемый файл превышает UPLOAD_MAX_SIZE"""
+
+
+class SavedFile(NamedTuple):
+    path: Path
+    size: int
+    checksum: str
 
 
 def clean_filename(filename: str) -> str:
     return "".join(c for c in filename if c.isalnum() or c in (" ", ".", "_")).rstrip()
 
 
-async def save_upload_file(upload_file: UploadFile) -> Path:
+async def save_upload_file(
+    upload_file: UploadFile, max_size: int = settings.UPLOAD_MAX_SIZE
+) -> SavedFile:
+    """
+    Потоково пишет файл на диск блоками UPLOAD_CHUNK_SIZE,
+    за тот же проход считая размер и SHA-256.
+    При превышении max_size удаляет частично записанный файл и бросает FileTooLargeError
+    """
     filename = f"{uuid.uuid4().hex}_{clean_filename(upload_file.filename)}"
+    return await _write_upload(upload_file, UPLOAD_DIR / filename, max_size)
+
+
+async def spool_upload_file(
+    upload_file: UploadFile, max_size: int = settings.UPLOAD_MAX_SIZE
+) -> SavedFile:
+    """
+    Пишет файл во временный файл хранилища, считая размер и SHA-256 за тот же
+    проход. Дальше его переносит на место move_blob либо удаляет вызывающий код
+    """
+    return await _write_upload(upload_file, BLOB_DIR / f"{uuid.uuid4().hex}.tmp", max_size)
+
+
+async def _write_upload(upload_file: UploadFile, file_location: Path, max_size: int) -> SavedFile:
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(file_location, "wb") as buffer:
+            while chunk := await upload_file.read(settings.UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_size:
+                    raise FileTooLargeError(
+                        f"Размер файла превышает {max_size} байт"
+                    )
+                digest.update(chunk)
+                await buffer.write(chunk)
+            await _sync(buffer)
+    except BaseException:
+        file_location.unlink(missing_ok=True)
+        raise
+
+    return SavedFile(file_location.resolve(), size, digest.hexdigest())
+
+
+async def _sync(buffer) -> None:
+    """Дожидается записи на диск: после ответа клиенту файл переживет сбой питания"""
+    if settings.UPLOAD_FSYNC:
+        await buffer.flush()
+        await asyncio.to_thread(os.fsync, buffer.fileno())
+
+
+def blob_path(checksum: str) -> Path:
+    return (BLOB_DIR / checksum[:2] / checksum).resolve()
+
+
+def new_blob_path(checksum: str) -> Path:
+    """
+    Путь для новой записи содержимого. Уникальный, а не просто по хешу:
+    запрос, освободивший последнюю ссылку, удаляет свой файл уже после
+    коммита и не должен задеть содержимое, заново загруженное в это время
+    """
+    return blob_path(checksum).with_name(f"{checksum}.{uuid.uuid4().hex[:8]}")
+
+
+def move_blob(tmp_location: Path, file_location: Path) -> None:
+    """Атомарно переносит временный файл: читатели не видят недописанное содержимое"""
+    file_location.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp_location, file_location)
+
+
+def thumbnail_path(filepath: str) -> Path:
+    """Миниатюра лежит рядом с содержимым и удаляется вместе с ним"""
+    return Path(f"{filepath}.thumb.png")
+
 
-    file_location = UPLOAD_DIR / filename
+def remove_files(filepaths: Iterable[str]) -> None:
+    for filepath in filepaths:
+        Path(filepath).unlink(missing_ok=True)
+        thumbnail_path(filepath).unlink(missing_ok=True)
 
-    async with aiofiles.open(file_location, "wb") as buffer:
-        await buffer.write(await upload_file.read())
 
-    return file_location.resolve()
+def file_etag(file_record) -> str:
+    """
+    Сильный ETag по данным записи файла, без обращения к диску:
+    SHA-256 содержимого, а для старых записей без хеша — размер и время изменения
+    """
+    if file_record.checksum:
+        return f'"{file_record.checksum}"'
+    return f'"{file_record.id}-{file_record.size}-{int(file_record.updated_at.timestamp())}"'
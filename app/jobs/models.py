@@ -0,0 +1,27 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Index, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.database import Base, TimestampType
+
+
+class Job(Base):
+    """
+    Фоновая задача. Создается в той же транзакции, что и данные, которые
+    она обрабатывает: закоммиченная запись не теряется при падении процесса
+    """
+
+    kind: Mapped[str] = mapped_column(Text)
+    payload: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON
+    # pending -> running -> done | failed; при повторе снова pending
+    status: Mapped[str] = mapped_column(Text, default="pending")
+    attempts: Mapped[int] = mapped_column(default=0)
+    run_after: Mapped[datetime] = mapped_column(TimestampType)  # UTC
+    locked_by: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    locked_at: Mapped[Optional[datetime]] = mapped_column(TimestampType, nullable=True)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    # Выбор следующей задачи: status = 'pending' AND run_after <= now ORDER BY run_after
+    __table_args__ = (Index("ix_job_status_run_after", "status", "run_after"),)
@@ -0,0 +1,310 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import socket
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Optional, Set, TypeVar
+from uuid import uuid4
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.config import settings
+from app.database import async_session_maker
+from app.jobs.models import Job
+from app.jobs.repository import JobRepository
+from app.utils.metrics import metrics
+
+T = TypeVar("T")
+
+job_duration = metrics.histogram(
+    "job_duration_seconds", "Время выполнения фоновой задачи", ("kind", "result")
+)
+
+
+class PermanentJobError(Exception):
+    """Ошибка, которую повтор не исправит: задача сразу завершается со статусом failed"""
+
+
+@dataclass
+class JobHandler:
+    run: Callable[[dict], Awaitable[None]]
+    # Вызывается, когда попытки закончились: обработчик отмечает ошибку в своих данных
+    on_failure: Optional[Callable[[dict, str], Awaitable[None]]] = None
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class JobQueue:
+    """
+    Очередь фоновых задач в БД с пулом воркеров в процессе приложения.
+
+    Задачи ставятся в транзакции, которая создает обрабатываемые данные, и
+    разбираются воркерами всех процессов: каждый забирает задачу атомарным
+    UPDATE. Ошибка ведет к повтору с экспоненциальной задержкой, после
+    max_attempts попыток задача получает статус failed. CPU-этапы
+    обработчики выполняют через run_cpu в пуле процессов, чтобы не
+    занимать event loop. Обработчики должны быть идемпотентны: задача
+    упавшего процесса выполняется заново после lock_timeout
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        enabled: bool = settings.JOBS_ENABLED,
+        concurrency: int = settings.JOBS_CONCURRENCY,
+        process_workers: int = settings.JOBS_PROCESS_WORKERS,
+        poll_interval: float = settings.JOBS_POLL_INTERVAL,
+        max_attempts: int = settings.JOBS_MAX_ATTEMPTS,
+        retry_delay: float = settings.JOBS_RETRY_DELAY,
+        retry_max_delay: float = settings.JOBS_RETRY_MAX_DELAY,
+        lock_timeout: float = settings.JOBS_LOCK_TIMEOUT,
+        retention: float = settings.JOBS_RETENTION,
+        shutdown_timeout: float = settings.JOBS_SHUTDOWN_TIMEOUT,
+    ):
+        self._session_maker = session_maker
+        self.enabled = enabled
+        self._concurrency = concurrency
+        self._process_workers = process_workers
+        self._poll_interval = poll_interval
+        self._max_attempts = max_attempts
+        self._retry_delay = retry_delay
+        self._retry_max_delay = retry_max_delay
+        self._lock_timeout = lock_timeout
+        self._retention = retention
+        self._shutdown_timeout = shutdown_timeout
+        self._worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._handlers: Dict[str, JobHandler] = {}
+        self._workers: List[asyncio.Task] = []
+        # Выполняемые обработчики: при остановке прерываются они, а не запись статуса в БД
+        self._runs: Set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+        self._pool: Optional[Executor] = None
+        self._wakeup = asyncio.Event()
+        self._running = 0
+        self._completed = 0
+        self._retried = 0
+        self._failed = 0
+
+    def register(
+        self,
+        kind: str,
+        run: Callable[[dict], Awaitable[None]],
+        on_failure: Optional[Callable[[dict, str], Awaitable[None]]] = None,
+    ) -> None:
+        self._handlers[kind] = JobHandler(run, on_failure)
+
+    async def enqueue(self, session: AsyncSession, kind: str, payloads: List[dict]) -> None:
+        """Ставит задачи в транзакции session; после коммита стоит вызвать notify()"""
+        await JobRepository(session).enqueue_many(kind, payloads, utcnow())
+
+    def notify(self) -> None:
+        """Будит воркеров процесса, не дожидаясь следующего опроса таблицы"""
+        self._wakeup.set()
+
+    async def run_cpu(self, func: Callable[..., T], *args) -> T:
+        """
+        Выполняет func в пуле процессов. func и аргументы передаются
+        через pickle: функция должна быть объявлена на уровне модуля
+        """
+        if self._pool is None:
+            return await asyncio.to_thread(func, *args)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._pool, partial(func, *args)
+            )
+        except BrokenProcessPool:
+            # Процесс пула упал (например, на поврежденном файле) — пул больше не
+            # принимает работу. Пересоздаем его, а задача уйдет на повтор
+            logger.error("Пул процессов фоновых задач пересоздан после падения процесса")
+            self._pool = self._create_pool()
+            raise
+
+    def _create_pool(self) -> Executor:
+        # spawn: дочерние процессы не наследуют потоки и соединения родителя
+        return ProcessPoolExecutor(
+            self._process_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    async def _claim(self) -> Optional[Job]:
+        async with self._session_maker() as session, session.begin():
+            return await JobRepository(session).claim(self._worker_id, utcnow())
+
+    async def _work_forever(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.clear()
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logger.error(f"Failed to claim job: {str(e)}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self._poll_interval)
+                except TimeoutError:
+                    pass
+                continue
+            self._running += 1
+            try:
+                await self._execute(job)
+            except Exception as e:
+                # Статус не записан: задача вернется в очередь через lock_timeout
+                logger.error(f"Failed to finish job {job.id}: {str(e)}")
+            finally:
+                self._running -= 1
+
+    async def _execute(self, job: Job) -> None:
+        handler = self._handlers.get(job.kind)
+        payload = json.loads(job.payload) if job.payload else {}
+        started = time.perf_counter()
+        run = None
+        try:
+            if handler is None:
+                raise PermanentJobError(f"Неизвестный тип задачи: {job.kind}")
+            run = asyncio.ensure_future(handler.run(payload))
+            self._runs.add(run)
+            try:
+                await run
+            finally:
+                self._runs.discard(run)
+        except asyncio.CancelledError:
+            if run is None or not (self._stopping.is_set() and run.cancelled()):
+                raise
+            # Прервана остановкой: close() вернет задачу в очередь без траты попытки
+            logger.bind(job_id=job.id, kind=job.kind).warning(
+                "Фоновая задача {} ({}) прервана остановкой приложения", job.id, job.kind
+            )
+            return
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if isinstance(e, PermanentJobError) or job.attempts >= self._max_attempts:
+                job_duration.observe(time.perf_counter() - started, (job.kind, "failed"))
+                logger.bind(job_id=job.id, kind=job.kind).error(
+                    "Фоновая задача {} ({}) завершилась ошибкой после {} попыток: {}",
+                    job.id, job.kind, job.attempts, error,
+                )
+                async with self._session_maker() as session, session.begin():
+                    owned = await JobRepository(session).fail(job, self._worker_id, error)
+                if not owned:
+                    self._log_lost(job)
+                    return
+                self._failed += 1
+                if handler is not None and handler.on_failure is not None:
+                    await handler.on_failure(payload, error)
+                return
+
+            delay = min(self._retry_delay * 2 ** (job.attempts - 1), self._retry_max_delay)
+            # Разброс, чтобы задачи, упавшие вместе (БД недоступна), не повторялись разом
+            delay *= random.uniform(0.5, 1.0)
+            job_duration.observe(time.perf_counter() - started, (job.kind, "retry"))
+            logger.bind(job_id=job.id, kind=job.kind).warning(
+                "Фоновая задача {} ({}), попытка {}: {}. Повтор через {:.0f} с",
+                job.id, job.kind, job.attempts, error, delay,
+            )
+            async with self._session_maker() as session, session.begin():
+                owned = await JobRepository(session).retry(
+                    job, self._worker_id, utcnow() + timedelta(seconds=delay), error
+                )
+            if owned:
+                self._retried += 1
+            else:
+                self._log_lost(job)
+            return
+
+        job_duration.observe(time.perf_counter() - started, (job.kind, "done"))
+        async with self._session_maker() as session, session.begin():
+            owned = await JobRepository(session).complete(job, self._worker_id)
+        if owned:
+            self._completed += 1
+        else:
+            self._log_lost(job)
+
+    @staticmethod
+    def _log_lost(job: Job) -> None:
+        logger.bind(job_id=job.id, kind=job.kind).warning(
+            "Фоновая задача {} ({}) выполнялась дольше JOBS_LOCK_TIMEOUT и была "
+            "возвращена в очередь: итог попытки {} не записан",
+            job.id, job.kind, job.attempts,
+        )
+
+    async def _maintain_forever(self) -> None:
+        """Возвращает в очередь задачи упавших процессов и удаляет старые завершенные"""
+        while not self._stopping.is_set():
+            try:
+                now = utcnow()
+                async with self._session_maker() as session, session.begin():
+                    repo = JobRepository(session)
+                    released = await repo.release_stale(now - timedelta(seconds=self._lock_timeout))
+                    await repo.delete_finished_before(now - timedelta(seconds=self._retention))
+                if released:
+                    logger.warning(f"Возвращено в очередь брошенных фоновых задач: {released}")
+                    self.notify()
+            except Exception as e:
+                logger.error(f"Failed to maintain job queue: {str(e)}")
+            try:
+                await asyncio.wait_for(
+                    self._stopping.wait(), max(self._lock_timeout / 4, self._poll_interval)
+                )
+            except TimeoutError:
+                pass
+
+    def start(self) -> None:
+        if not self.enabled or self._workers:
+            return
+        if self._process_workers > 0:
+            self._pool = self._create_pool()
+        self._stopping.clear()
+        self._workers = [
+            asyncio.create_task(self._work_forever()) for _ in range(self._concurrency)
+        ]
+        self._workers.append(asyncio.create_task(self._maintain_forever()))
+
+    async def close(self) -> None:
+        """
+        Останавливает воркеров: новые задачи не забираются, выполняемые
+        дорабатывают shutdown_timeout, после чего прерываются. Итог уже
+        завершенных попыток записывается; воркер не отменяется посреди
+        транзакции, иначе запись статуса обрывается с блокировкой БД
+        """
+        workers, self._workers = self._workers, []
+        self._stopping.set()
+        self.notify()
+        if workers:
+            _, pending = await asyncio.wait(workers, timeout=self._shutdown_timeout)
+            if pending:
+                for run in list(self._runs):
+                    run.cancel()
+                _, pending = await asyncio.wait(pending, timeout=self._shutdown_timeout)
+            for worker in pending:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            try:
+                # Прерванные задачи сразу доступны другим процессам
+                async with self._session_maker() as session, session.begin():
+                    await JobRepository(session).release_locked(self._worker_id)
+            except Exception as e:
+                logger.error(f"Failed to release jobs: {str(e)}")
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._workers),
+            "running": self._running,
+            "completed": self._completed,
+            "retried": self._retried,
+            "failed": self._failed,
+        }
+
+
+job_queue = JobQueue(async_session_maker)
@@ -0,0 +1,110 @@
+import json
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.jobs.models import Job
+
+
+class JobRepository:
+    """
+    Очередь фоновых задач в таблице job. Методы не коммитят сессию:
+    задачи ставятся в транзакции вызывающего кода
+    """
+
+    def __init__(self, session: AsyncSession):
+        self._session: AsyncSession = session
+
+    async def enqueue_many(self, kind: str, payloads: List[dict], run_after: datetime) -> None:
+        if not payloads:
+            return
+        await self._session.execute(
+            insert(Job),
+            [
+                {
+                    "kind": kind,
+                    "payload": json.dumps(payload, ensure_ascii=False),
+                    "status": "pending",
+                    "attempts": 0,
+                    "run_after": run_after,
+                }
+                for payload in payloads
+            ],
+        )
+
+    async def claim(self, worker: str, now: datetime) -> Optional[Job]:
+        """
+        Забирает самую раннюю готовую задачу и увеличивает счетчик попыток.
+        В PostgreSQL строки, заблокированные другими воркерами, пропускаются;
+        SQLite выполняет запись целиком под блокировкой БД
+        """
+        next_job = (
+            select(Job.id)
+            .where(Job.status == "pending", Job.run_after <= now)
+            .order_by(Job.run_after)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        stmt = (
+            update(Job)
+            .where(Job.id == next_job, Job.status == "pending")
+            .values(status="running", attempts=Job.attempts + 1, locked_by=worker, locked_at=now)
+            .returning(Job)
+        )
+        result = await self._session.scalars(stmt)
+        return result.one_or_none()
+
+    async def complete(self, job: Job, worker: str) -> bool:
+        return await self._finish(job, worker, status="done", last_error=None)
+
+    async def retry(self, job: Job, worker: str, run_after: datetime, error: str) -> bool:
+        return await self._finish(job, worker, status="pending", run_after=run_after, last_error=error)
+
+    async def fail(self, job: Job, worker: str, error: str) -> bool:
+        return await self._finish(job, worker, status="failed", last_error=error)
+
+    async def _finish(self, job: Job, worker: str, **values) -> bool:
+        """
+        Записывает итог попытки, только если задача все еще за ней: в работе,
+        у этого воркера и с тем же номером попытки (воркеры одного процесса
+        пишут одинаковый locked_by, а повторный захват увеличивает attempts).
+        False — задачу вернул в очередь release_stale и, возможно, уже забрал
+        другой воркер: итог этой попытки отбрасывается
+        """
+        result = await self._session.execute(
+            update(Job)
+            .where(
+                Job.id == job.id,
+                Job.status == "running",
+                Job.locked_by == worker,
+                Job.attempts == job.attempts,
+            )
+            .values(**values, locked_by=None)
+        )
+        return result.rowcount > 0
+
+    async def release_locked(self, worker: str) -> int:
+        """Возвращает в очередь задачи, прерванные остановкой воркера; попытка не засчитывается"""
+        result = await self._session.execute(
+            update(Job)
+            .where(Job.status == "running", Job.locked_by == worker)
+            .values(status="pending", attempts=Job.attempts - 1, locked_by=None)
+        )
+        return result.rowcount
+
+    async def release_stale(self, locked_before: datetime) -> int:
+        """Возвращает в очередь задачи упавших процессов; попытка засчитывается"""
+        result = await self._session.execute(
+            update(Job)
+            .where(Job.status == "running", Job.locked_at < locked_before)
+            .values(status="pending", locked_by=None, last_error="Задача прервана")
+        )
+        return result.rowcount
+
+    async def delete_finished_before(self, moment: datetime) -> None:
+        await self._session.execute(
+            delete(Job).where(Job.status.in_(("done", "failed")), Job.updated_at < moment)
+        )
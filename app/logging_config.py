@@ -1,17 +1,173 @@
+import json
+import queue
 import sys
+import threading
+import traceback
+from typing import Dict, Optional, TextIO
 
 from loguru import logger
 
+from app.config import settings
+
+# Цвета текстового формата (как у стандартных уровней loguru)
+_RESET = "\x1b[0m"
+_GREEN = "\x1b[32m"
+_CYAN = "\x1b[36m"
+_LEVEL_COLORS = {
+    "TRACE": "\x1b[36m\x1b[1m",
+    "DEBUG": "\x1b[34m\x1b[1m",
+    "INFO": "\x1b[1m",
+    "SUCCESS": "\x1b[32m\x1b[1m",
+    "WARNING": "\x1b[33m\x1b[1m",
+    "ERROR": "\x1b[31m\x1b[1m",
+    "CRITICAL": "\x1b[41m\x1b[1m",
+}
+
+
+class QueuedSink:
+    """
+    Приемник loguru, который не пишет в поток на event loop.
+
+    write() только кладет запись в очередь, а фоновый поток забирает все
+    накопившиеся записи (не больше batch_size) и пишет их одним вызовом.
+    Loguru передает сюда только сообщение, а строка вывода (цветной текст
+    или JSON) собирается из record в фоновом потоке. При переполнении
+    очереди новые записи отбрасываются и подсчитываются.
+
+    loguru(enqueue=True) переносит в свой поток только запись: формат
+    он применяет в вызывающем потоке, а очередь у него неограниченная
+    """
+
+    def __init__(self, stream: TextIO, serialize: bool, queue_size: int, batch_size: int):
+        self._stream = stream
+        self._serialize = serialize
+        self._batch_size = batch_size
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(queue_size)
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+        self.written = 0
+        self.dropped = 0
+        self._reported_dropped = 0
+
+    def write(self, message: str) -> None:
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self) -> None:
+        """Дописывает очередь и останавливает поток (вызывается loguru при remove)"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self) -> Dict[str, int]:
+        return {"written": self.written, "dropped": self.dropped, "queued": self._queue.qsize()}
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while batch[-1] is not None and len(batch) < self._batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = batch[-1] is None
+            messages = [message for message in batch if message is not None]
+            lines = [self._render(message) for message in messages]
+            if self.dropped != self._reported_dropped:
+                skipped = self.dropped - self._reported_dropped
+                lines.append(f"Очередь логов переполнена, пропущено записей: {skipped}\n")
+                self._reported_dropped = self.dropped
+            try:
+                self._stream.write("".join(lines))
+                self._stream.flush()
+            except Exception:
+                # Ошибка вывода не должна останавливать поток записи
+                pass
+            self.written += len(messages)
+            if stopping:
+                return
+
+    def _render(self, message) -> str:
+        record = message.record
+        if self._serialize:
+            return self._render_json(record)
+        return self._render_text(record)
+
+    @staticmethod
+    def _render_text(record) -> str:
+        level = record["level"].name
+        color = _LEVEL_COLORS.get(level, "")
+        line = (
+            f"{_GREEN}{record['time']:%Y-%m-%d %H:%M:%S}{_RESET} | "
+            f"{color}{level: <8}{_RESET} | "
+            f"{_CYAN}{record['name']}:{record['function']}:{record['line']}{_RESET} - "
+            f"{color}{record['message']}{_RESET}\n"
+        )
+        exception = _format_exception(record)
+        return line + exception if exception else line
+
+    @staticmethod
+    def _render_json(record) -> str:
+        entry = {
+            "time": record["time"].isoformat(),
+            "level": record["level"].name,
+            "logger": record["name"],
+            "function": record["function"],
+            "line": record["line"],
+            "message": record["message"],
+            **record["extra"],
+        }
+        exception = _format_exception(record)
+        if exception:
+            entry["exception"] = exception
+        return json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+
+
+def _format_exception(record) -> str:
+    if record["exception"] is None:
+        return ""
+    exc_type, exc_value, exc_traceback = record["exception"]
+    return "".join(traceback.format_exception(exc_type, exc_value, exc_traceback))
+
+
+_sink: Optional[QueuedSink] = None
+
 
 def setup_logging():
     """
-    Настраивает логгер loguru для вывода в консоль с кастомным форматом
+    Настраивает логгер loguru: вывод в stdout через фоновый поток, уровень
+    и формат (text — цветной текст, json — одна JSON-строка на запись) из настроек
     """
+    global _sink
     logger.remove()
-    logger.add(
+    serialize = settings.LOG_FORMAT == "json"
+    _sink = QueuedSink(
         sys.stdout,
-        colorize=True,
-        format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}:{function}:{line}</cyan> - <level>{message}</level>",
-        level="INFO",
+        serialize=serialize,
+        queue_size=settings.LOG_QUEUE_SIZE,
+        batch_size=settings.LOG_BATCH_SIZE,
+    )
+    # Формат применяет сам приемник в фоновом потоке. Трассировку исключения
+    # loguru все равно строит в вызывающем потоке — отключаем в ней дорогой разбор
+    logger.add(
+        _sink,
+        colorize=False,
+        format="{message}",
+        level=settings.LOG_LEVEL,
+        backtrace=False,
+        diagnose=False,
     )
     logger.info("Логгер настроен")
+
+
+def shutdown_logging():
+    """Дописывает очередь логов перед остановкой приложения; дальше логи идут в stderr"""
+    global _sink
+    logger.remove()
+    _sink = None
+    logger.add(sys.stderr, level=settings.LOG_LEVEL)
+
+
+def logging_stats() -> Optional[Dict[str, int]]:
+    return _sink.stats() if _sink is not None else None
@@ -11,11 +11,13 @@ from app.database import Base
 from app.config import settings
 from app.tasks.models import Task
 from app.files.models import File
+from app.events.models import TaskEvent
+from app.jobs.models import Job
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
-config.set_main_option("sqlalchemy.url", settings.POSTGRE_DATABASE_URL)
+config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
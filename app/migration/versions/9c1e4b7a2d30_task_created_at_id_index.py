@@ -0,0 +1,28 @@
+"""Task created_at id index
+
+Revision ID: 9c1e4b7a2d30
+Revises: 5da04095fc2e
+Create Date: 2026-10-17 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c1e4b7a2d30'
+down_revision: Union[str, Sequence[str], None] = '5da04095fc2e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_task_created_at_id', 'task', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_task_created_at_id', table_name='task')
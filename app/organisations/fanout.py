@@ -0,0 +1,194 @@
+import asyncio
+import heapq
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import Executable, Row
+
+from app.config import settings
+from app.organisations.registry import OrganisationEngineRegistry, organisation_engines
+
+_DONE = object()
+
+
+class DatabaseReport:
+    """Итог выполнения запроса в одной БД организации"""
+
+    def __init__(self, code: str):
+        self.code = code
+        self.rows = 0
+        self.elapsed: Optional[float] = None
+        self.error: Optional[str] = None
+        self.timed_out = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self) -> str:
+        return (
+            f"DatabaseReport(code={self.code!r}, rows={self.rows}, "
+            f"elapsed={self.elapsed}, error={self.error!r})"
+        )
+
+
+class _Reversed:
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __lt__(self, other: "_Reversed") -> bool:
+        return other.value < self.value
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Reversed) and other.value == self.value
+
+
+class FanOutStream:
+    """
+    Результат fan-out запроса: асинхронный итератор пар (код организации, строка),
+    слитых в порядке ключа сортировки. Каждая БД должна возвращать строки уже
+    упорядоченными по тому же ключу (ORDER BY created_at). Слияние ждет
+    очередную строку самой медленной БД — до ее таймаута. Без ключа (key=None)
+    строки выдаются по мере прихода из любой БД, и медленная БД не задерживает
+    остальные.
+
+    Отчет по каждой БД доступен в report по мере выполнения. БД, упавшая
+    по ошибке или таймауту, не останавливает выдачу остальных
+    """
+
+    def __init__(
+        self,
+        registry: OrganisationEngineRegistry,
+        statement: Executable,
+        codes: List[str],
+        concurrency: int,
+        timeout: float,
+        key: Optional[Callable[[Row], Any]],
+        descending: bool,
+    ):
+        self._registry = registry
+        self._statement = statement
+        self._codes = codes
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._timeout = timeout
+        self._key = key
+        self._descending = descending
+        # Очереди без ограничения: при concurrency < len(codes) часть БД ждет своей
+        # очереди, и ограниченные буферы остальных заблокировали бы слияние.
+        # Без слияния все БД пишут в одну очередь
+        if key is None:
+            self._queues: List[asyncio.Queue] = [asyncio.Queue()] * len(codes)
+        else:
+            self._queues = [asyncio.Queue() for _ in codes]
+        self.report: Dict[str, DatabaseReport] = {code: DatabaseReport(code) for code in codes}
+
+    async def _produce(self, index: int) -> None:
+        code = self._codes[index]
+        report = self.report[code]
+        queue = self._queues[index]
+        try:
+            async with self._semaphore:
+                started = time.monotonic()
+                try:
+                    async with asyncio.timeout(self._timeout):
+                        async with self._registry.session(code) as session:
+                            result = await session.stream(self._statement)
+                            async for row in result:
+                                report.rows += 1
+                                queue.put_nowait((index, row))
+                except TimeoutError:
+                    report.timed_out = True
+                    report.error = f"Превышено время ожидания ({self._timeout} с)"
+                except Exception as e:
+                    report.error = f"{type(e).__name__}: {e}"
+                finally:
+                    report.elapsed = time.monotonic() - started
+            if report.error:
+                logger.warning(f"Fan-out: БД {code} вернула ошибку: {report.error}")
+        finally:
+            queue.put_nowait((index, _DONE))
+
+    async def _push_next(self, index: int, heap: list) -> None:
+        _, row = await self._queues[index].get()
+        if row is _DONE:
+            return
+        sort_key = self._key(row)
+        if self._descending:
+            sort_key = _Reversed(sort_key)
+        heapq.heappush(heap, (sort_key, index, row))
+
+    async def __aiter__(self) -> AsyncIterator[Tuple[str, Row]]:
+        producers = [asyncio.create_task(self._produce(i)) for i in range(len(self._codes))]
+        heap: list = []
+        try:
+            if self._key is None:
+                running = len(self._codes)
+                while running:
+                    index, row = await self._queues[0].get()
+                    if row is _DONE:
+                        running -= 1
+                    else:
+                        yield self._codes[index], row
+                return
+            for index in range(len(self._codes)):
+                await self._push_next(index, heap)
+            while heap:
+                _, index, row = heapq.heappop(heap)
+                yield self._codes[index], row
+                await self._push_next(index, heap)
+        finally:
+            for producer in producers:
+                producer.cancel()
+            await asyncio.gather(*producers, return_exceptions=True)
+
+
+class OrganisationFanOut:
+    """Выполняет один и тот же запрос параллельно в нескольких БД организаций"""
+
+    def __init__(
+        self,
+        registry: OrganisationEngineRegistry,
+        concurrency: int = settings.ORG_FANOUT_CONCURRENCY,
+        timeout: float = settings.ORG_FANOUT_TIMEOUT,
+    ):
+        self._registry = registry
+        self._concurrency = concurrency
+        self._timeout = timeout
+
+    def stream(
+        self,
+        statement: Executable,
+        codes: Optional[Iterable[str]] = None,
+        concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        key: Optional[Callable[[Row], Any]] = lambda row: row.created_at,
+        descending: bool = False,
+    ) -> FanOutStream:
+        """
+        Возвращает поток строк, слитых по key (по умолчанию created_at);
+        key=None — в порядке прихода, без ожидания медленных БД
+        """
+        codes = self._registry.codes if codes is None else list(codes)
+        return FanOutStream(
+            self._registry,
+            statement,
+            [self._registry.resolve_code(code) for code in codes],
+            concurrency or self._concurrency,
+            timeout or self._timeout,
+            key,
+            descending,
+        )
+
+    async def collect(
+        self, statement: Executable, codes: Optional[Iterable[str]] = None, **kwargs
+    ) -> Tuple[List[Tuple[str, Row]], Dict[str, DatabaseReport]]:
+        """Собирает все строки в список; возвращает строки и отчет по каждой БД"""
+        stream = self.stream(statement, codes, **kwargs)
+        rows = [item async for item in stream]
+        return rows, stream.report
+
+
+organisation_fan_out = OrganisationFanOut(organisation_engines)
@@ -0,0 +1,178 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Mapping, Optional
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from app.config import settings
+from app.utils.metrics import TimedAsyncQueuePool
+from connections import CONNECTIONS
+
+
+class UnknownOrganisationError(KeyError):
+    """Для организации не задано подключение в connections.CONNECTIONS"""
+
+
+class _EngineEntry:
+    def __init__(self, engine: AsyncEngine):
+        self.engine = engine
+        self.session_maker = async_sessionmaker(engine, expire_on_commit=False)
+        self.last_used = time.monotonic()
+        self.in_use = 0
+
+
+class OrganisationEngineRegistry:
+    """
+    Ленивый реестр движков БД организаций.
+
+    Движок создается при первом обращении к организации. Одновременно открыто
+    не больше max_engines пулов: при превышении закрывается давно не
+    использовавшийся (LRU) движок без активных сессий, а если таких нет —
+    запрос ждет освобождения. Движки, простаивающие дольше idle_timeout,
+    закрываются фоновой задачей
+    """
+
+    def __init__(
+        self,
+        urls: Mapping[str, str],
+        names: Optional[Mapping[str, str]] = None,
+        max_engines: int = settings.ORG_DB_MAX_ENGINES,
+        idle_timeout: float = settings.ORG_DB_IDLE_TIMEOUT,
+        engine_options: Optional[dict] = None,
+    ):
+        self._urls = dict(urls)
+        # Task.organisation хранит название ("ГП 17"), а подключения — по коду ("p17")
+        self._codes_by_name = {name: code for code, name in (names or {}).items()}
+        self._max_engines = max_engines
+        self._idle_timeout = idle_timeout
+        self._engine_options = engine_options or {}
+        self._entries: "OrderedDict[str, _EngineEntry]" = OrderedDict()
+        self._condition = asyncio.Condition()
+        self._reaper: Optional[asyncio.Task] = None
+
+    @property
+    def codes(self) -> list[str]:
+        return list(self._urls)
+
+    def resolve_code(self, organisation: str) -> str:
+        """Возвращает код подключения по коду или названию организации"""
+        if organisation in self._urls:
+            return organisation
+        code = self._codes_by_name.get(organisation)
+        if code is None or code not in self._urls:
+            raise UnknownOrganisationError(organisation)
+        return code
+
+    @asynccontextmanager
+    async def session(self, organisation: str) -> AsyncIterator[AsyncSession]:
+        """Выдает сессию к БД организации (по Task.organisation или коду)"""
+        code = self.resolve_code(organisation)
+        entry = await self._acquire(code)
+        try:
+            async with entry.session_maker() as session:
+                yield session
+        finally:
+            await self._release(entry)
+
+    async def _acquire(self, code: str) -> _EngineEntry:
+        to_dispose = []
+        async with self._condition:
+            while True:
+                entry = self._entries.get(code)
+                if entry is not None:
+                    self._entries.move_to_end(code)
+                    break
+                if len(self._entries) < self._max_engines:
+                    entry = _EngineEntry(self._create_engine(code))
+                    self._entries[code] = entry
+                    break
+                evicted = self._pop_lru_idle()
+                if evicted is not None:
+                    to_dispose.append(evicted)
+                    continue
+                # Все пулы заняты активными сессиями — ждем освобождения
+                await self._condition.wait()
+            entry.in_use += 1
+            entry.last_used = time.monotonic()
+
+        for engine in to_dispose:
+            await engine.dispose()
+        return entry
+
+    async def _release(self, entry: _EngineEntry) -> None:
+        async with self._condition:
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+            self._condition.notify_all()
+
+    def _pop_lru_idle(self) -> Optional[AsyncEngine]:
+        for code, entry in self._entries.items():
+            if entry.in_use == 0:
+                del self._entries[code]
+                logger.info(f"Закрыт пул подключений организации {code} (LRU)")
+                return entry.engine
+        return None
+
+    def _create_engine(self, code: str) -> AsyncEngine:
+        logger.info(f"Создан пул подключений организации {code}")
+        return create_async_engine(self._urls[code], **self._engine_options)
+
+    async def evict_idle(self) -> None:
+        """Закрывает движки без активных сессий, простаивающие дольше idle_timeout"""
+        deadline = time.monotonic() - self._idle_timeout
+        async with self._condition:
+            expired = [
+                code
+                for code, entry in self._entries.items()
+                if entry.in_use == 0 and entry.last_used < deadline
+            ]
+            engines = [self._entries.pop(code).engine for code in expired]
+            if expired:
+                self._condition.notify_all()
+        for code, engine in zip(expired, engines):
+            logger.info(f"Закрыт простаивающий пул подключений организации {code}")
+            await engine.dispose()
+
+    async def _reap_forever(self) -> None:
+        while True:
+            await asyncio.sleep(max(self._idle_timeout / 2, 1))
+            await self.evict_idle()
+
+    def start(self) -> None:
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_forever())
+
+    async def close(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        async with self._condition:
+            engines = [entry.engine for entry in self._entries.values()]
+            self._entries.clear()
+        for engine in engines:
+            await engine.dispose()
+
+    def stats(self) -> Dict[str, int]:
+        return {code: entry.in_use for code, entry in self._entries.items()}
+
+
+organisation_engines = OrganisationEngineRegistry(
+    CONNECTIONS,
+    names=settings.ORGANISATION_MAP,
+    engine_options={
+        "pool_size": settings.ORG_DB_POOL_SIZE,
+        "max_overflow": settings.ORG_DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "poolclass": TimedAsyncQueuePool,
+        "connect_args": {"connect_timeout": settings.ORG_DB_CONNECT_TIMEOUT},
+    },
+)
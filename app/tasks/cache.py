@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from app.config import settings
+from app.tasks.schemas import TaskFilter, TaskProjection
+from app.tasks.search import TEXT_SEARCH_FIELDS, search_terms
+
+
+class TaskReadCache:
+    """
+    LRU-кэш с TTL для чтения задач.
+
+    Карточка задачи хранится с версией этой задачи, страница списка — с общим
+    поколением списков. Запись в задачу увеличивает ее версию и поколение
+    списков, поэтому устаревшие значения перестают находиться сразу, без обхода
+    кэша, и вытесняются по LRU. Версию читатель берет до запроса в БД: если
+    задача изменится, пока запрос идет, прочитанное значение не попадет в кэш.
+
+    Версии задач берутся из общего счетчика, поэтому таблицу версий можно
+    сбросить, не нарушая этого правила: задачи без записи получают версию
+    _version_floor — значение счетчика на момент сброса, не меньше любой
+    выданной ранее. Таблица сбрасывается, дорастая до размера кэша, поэтому
+    не растет с числом измененных задач
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.TASK_CACHE_MAX_ENTRIES,
+        ttl: float = settings.TASK_CACHE_TTL,
+        enabled: bool = settings.TASK_CACHE_ENABLED,
+    ):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._enabled = enabled
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._task_versions: Dict[int, int] = {}
+        self._version_clock = 0
+        self._version_floor = 0
+        self._list_generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # --- Токены версий: берутся до чтения из БД ---
+
+    def task_token(self, task_id: int) -> int:
+        return self._task_versions.get(task_id, self._version_floor)
+
+    def list_token(self) -> int:
+        return self._list_generation
+
+    # --- Чтение и запись ---
+
+    def get_task(self, task_id: int, variant: Hashable = None) -> Optional[Any]:
+        """variant — представление задачи (например, набор полей), None — полное"""
+        return self._get(("task", task_id, variant), self.task_token(task_id))
+
+    def set_task(self, task_id: int, value: Any, token: int, variant: Hashable = None) -> None:
+        self._set(("task", task_id, variant), value, token, self.task_token(task_id))
+
+    def get_list(self, key: Hashable) -> Optional[Any]:
+        return self._get(("list", key), self._list_generation)
+
+    def set_list(self, key: Hashable, value: Any, token: int) -> None:
+        self._set(("list", key), value, token, self._list_generation)
+
+    @staticmethod
+    def list_key(
+        filters: TaskFilter,
+        limit: int,
+        cursor: Optional[str],
+        projection: Optional[TaskProjection] = None,
+    ) -> Hashable:
+        """Нормализованный ключ списка: регистр и пунктуация поиска не влияют на ключ"""
+        normalized = []
+        for field, value in sorted(filters.model_dump(exclude_none=True).items()):
+            if field in TEXT_SEARCH_FIELDS:
+                value = tuple(term.lower() for term in search_terms(value))
+            normalized.append((field, value))
+        return tuple(normalized), limit, cursor, projection
+
+    # --- Инвалидация ---
+
+    def invalidate_task(self, task_id: int) -> None:
+        """Изменилась задача или ее файлы: сбрасываются ее карточка и все списки"""
+        with self._lock:
+            if len(self._task_versions) >= self._max_entries:
+                # Версия задач без записи не может вернуться к выданной раньше
+                self._version_floor = self._version_clock
+                self._task_versions.clear()
+            self._version_clock += 1
+            self._task_versions[task_id] = self._version_clock
+            # Прочие представления задачи не найдутся по устаревшей версии
+            self._entries.pop(("task", task_id, None), None)
+            self._list_generation += 1
+
+    def invalidate_tasks(self, task_ids) -> None:
+        for task_id in task_ids:
+            self.invalidate_task(task_id)
+
+    def invalidate_lists(self) -> None:
+        """Добавлена задача: карточки остаются актуальными, списки — нет"""
+        with self._lock:
+            self._list_generation += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._list_generation += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self._max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _get(self, key: Hashable, current_token: int) -> Optional[Any]:
+        if not self._enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, token, value = entry
+                if token == current_token and expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def _set(self, key: Hashable, value: Any, token: int, current_token: int) -> None:
+        if not self._enabled or token != current_token:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self._ttl, token, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+
+task_cache = TaskReadCache()
@@ -0,0 +1,190 @@
+import asyncio
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, insert, or_, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import async_session_maker
+from app.tasks.models import Status, Task, TaskCounter
+
+# (organisation, project, status, день создания)
+CounterKey = Tuple[str, str, Status, date]
+
+COUNTER_GROUP_FIELDS = ("status", "organisation", "project")
+
+
+def counter_key(organisation: str, project: str, status: Status, created_at: datetime) -> CounterKey:
+    return organisation, project, Status(status), created_at.date()
+
+
+def counter_deltas(added: Iterable[tuple] = (), removed: Iterable[tuple] = ()) -> Counter:
+    """
+    Изменения счетчиков по строкам задач (organisation, project, status, created_at):
+    added увеличивают счетчики, removed — уменьшают
+    """
+    deltas: Counter = Counter()
+    for row in added:
+        deltas[counter_key(*row)] += 1
+    for row in removed:
+        deltas[counter_key(*row)] -= 1
+    return deltas
+
+
+class TaskCounterRepository:
+    def __init__(self, session: AsyncSession):
+        self._session: AsyncSession = session
+
+    async def apply(self, deltas: Counter) -> None:
+        """
+        Применяет изменения счетчиков одним UPSERT без коммита —
+        вызывается внутри транзакции, изменяющей задачи
+        """
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        dialect_insert = {
+            "sqlite": sqlite.insert,
+            "postgresql": postgresql.insert,
+        }[self._session.bind.dialect.name]
+        stmt = dialect_insert(TaskCounter).values(
+            [
+                {
+                    "organisation": organisation,
+                    "project": project,
+                    "status": status,
+                    "day": day,
+                    "count": delta,
+                }
+                for (organisation, project, status, day), delta in deltas.items()
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[
+                TaskCounter.organisation,
+                TaskCounter.project,
+                TaskCounter.status,
+                TaskCounter.day,
+            ],
+            set_={"count": TaskCounter.count + stmt.excluded.count},
+        )
+        await self._session.execute(stmt)
+
+        # Обнулившиеся счетчики ищем только среди уменьшенных ключей — по уникальному индексу
+        decreased = [key for key, delta in deltas.items() if delta < 0]
+        if decreased:
+            await self._session.execute(
+                delete(TaskCounter).where(
+                    or_(
+                        *(
+                            and_(
+                                TaskCounter.organisation == organisation,
+                                TaskCounter.project == project,
+                                TaskCounter.status == status,
+                                TaskCounter.day == day,
+                            )
+                            for organisation, project, status, day in decreased
+                        )
+                    ),
+                    TaskCounter.count <= 0,
+                )
+            )
+
+    async def rebuild(self) -> int:
+        """
+        Пересчитывает счетчики по таблице task, возвращает число строк счетчиков.
+        Изменения задач ждут конца пересчета: в PostgreSQL таблица task
+        блокируется от записи (SHARE), в SQLite запись и так одна на всю БД.
+        Иначе дельта, примененная между DELETE и INSERT ... SELECT или после
+        чтения task, была бы потеряна или учтена дважды
+        """
+        if self._session.bind.dialect.name == "postgresql":
+            await self._session.execute(text(f"LOCK TABLE {Task.__tablename__} IN SHARE MODE"))
+        await self._session.execute(delete(TaskCounter))
+        columns = (Task.organisation, Task.project, Task.status, func.date(Task.created_at))
+        await self._session.execute(
+            insert(TaskCounter).from_select(
+                ["organisation", "project", "status", "day", "count"],
+                select(*columns, func.count(Task.id)).group_by(*columns),
+            )
+        )
+        await self._session.commit()
+        result = await self._session.execute(select(func.count(TaskCounter.id)))
+        return result.scalar_one()
+
+    async def aggregate(
+        self,
+        group_by: Tuple[str, ...],
+        bucket: Optional[str] = None,
+        organisation: Optional[str] = None,
+        project: Optional[str] = None,
+        status: Optional[Status] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+    ) -> List[dict]:
+        """
+        Суммы счетчиков по полям group_by и периоду bucket (day, week, month).
+        Стоимость зависит от числа групп и дней, а не от числа задач
+        """
+        conditions = []
+        if organisation is not None:
+            conditions.append(TaskCounter.organisation == organisation)
+        if project is not None:
+            conditions.append(TaskCounter.project == project)
+        if status is not None:
+            conditions.append(TaskCounter.status == status)
+        if date_from is not None:
+            conditions.append(TaskCounter.day >= date_from)
+        if date_to is not None:
+            conditions.append(TaskCounter.day <= date_to)
+
+        columns = [getattr(TaskCounter, field) for field in group_by]
+        if bucket is not None:
+            columns.append(TaskCounter.day)
+        stmt = select(*columns, func.sum(TaskCounter.count)).where(and_(*conditions))
+        if columns:
+            stmt = stmt.group_by(*columns)
+        result = await self._session.execute(stmt)
+
+        # Недели и месяцы собираются из дневных сумм: строк не больше, чем групп × дней
+        totals: Dict[tuple, int] = {}
+        for row in result.all():
+            *values, count = row
+            if bucket is not None:
+                values[-1] = _bucket_start(values[-1], bucket)
+            key = tuple(values)
+            totals[key] = totals.get(key, 0) + int(count or 0)
+
+        fields = group_by + (("bucket",) if bucket is not None else ())
+        return [
+            dict(zip(fields, key), count=count)
+            for key, count in sorted(totals.items(), key=lambda item: _sort_key(item[0]))
+        ]
+
+
+def _bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _sort_key(values: tuple) -> tuple:
+    return tuple(str(getattr(value, "value", value)) for value in values)
+
+
+async def _rebuild() -> None:
+    async with async_session_maker() as session:
+        rows = await TaskCounterRepository(session).rebuild()
+    print(f"Счетчики задач пересчитаны: {rows} строк")
+
+
+if __name__ == "__main__":
+    # python -m app.tasks.counters — исправляет расхождение счетчиков с таблицей task
+    from app.files.models import File  # noqa: F401 — нужна мапперу для Task.files
+
+    asyncio.run(_rebuild())
@@ -1,6 +1,7 @@
 import enum
+from datetime import date
 
-from sqlalchemy import Enum, Text
+from sqlalchemy import Date, Enum, Index, Integer, Text, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database import Base
@@ -20,7 +21,64 @@ class Task(Base):
     status: Mapped[Status] = mapped_column(
         Enum(Status), nullable=False, default=Status.NEW
     )
+    # Увеличивается при каждом изменении задачи или ее файлов (для ETag)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
 
     files: Mapped[list["File"]] = relationship(
         "File", back_populates="task", cascade="all, delete-orphan"
     )
+
+    __table_args__ = (
+        # Порядок выдачи списка и keyset-пагинация. updated_at последней колонкой
+        # в этом и индексах фильтров: ETag списка (count и max(updated_at) под
+        # фильтром) читается из индекса, без строк таблицы
+        Index("ix_task_created_at_id_updated_at", "created_at", "id", "updated_at"),
+        # Выборка изменений для синхронизации (GET /tasks/changes)
+        Index("ix_task_updated_at_id", "updated_at", "id"),
+        # Фильтры списка по равенству с той же сортировкой: индекс отдает строки
+        # уже упорядоченными, и LIMIT не требует сортировки всей выборки
+        Index("ix_task_status_created_at_id_updated_at", "status", "created_at", "id", "updated_at"),
+        Index(
+            "ix_task_organisation_created_at_id_updated_at",
+            "organisation",
+            "created_at",
+            "id",
+            "updated_at",
+        ),
+        Index("ix_task_project_created_at_id_updated_at", "project", "created_at", "id", "updated_at"),
+        # Доска организации: вкладки по статусам
+        Index(
+            "ix_task_organisation_status_created_at_id_updated_at",
+            "organisation",
+            "status",
+            "created_at",
+            "id",
+            "updated_at",
+        ),
+    )
+
+
+class TaskTombstone(Base):
+    """Отметка об удалении задачи для синхронизации клиентов; created_at — время удаления"""
+
+    task_id: Mapped[int] = mapped_column(Integer)
+    organisation: Mapped[str] = mapped_column(Text)
+
+    __table_args__ = (Index("ix_tasktombstone_created_at_id", "created_at", "id"),)
+
+
+class TaskCounter(Base):
+    """
+    Число задач по организации, проекту, статусу и дню создания.
+    Поддерживается методами записи TaskRepository в той же транзакции
+    """
+
+    organisation: Mapped[str] = mapped_column(Text)
+    project: Mapped[str] = mapped_column(Text)
+    status: Mapped[Status] = mapped_column(Enum(Status))
+    day: Mapped[date] = mapped_column(Date)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("organisation", "project", "status", "day", name="uq_taskcounter_key"),
+    )
@@ -1,41 +1,276 @@
-from typing import List, Optional
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 
-from sqlalchemy import and_, delete, insert, select
+from sqlalchemy import Select, and_, delete, func, insert, or_, select, type_coerce, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import load_only, raiseload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
-from app.tasks.models import Task
-from app.tasks.schemas import TaskCreate, TaskFilter, TaskUpdate
+from app.config import settings
+from app.database import TimestampType
+from app.files.repository import FileRepository
+from app.files.utils import remove_files
+from app.tasks.counters import COUNTER_GROUP_FIELDS, TaskCounterRepository, counter_deltas
+from app.tasks.models import Task, TaskTombstone
+from app.tasks.schemas import (
+    TASK_FIELDS,
+    TaskBatchUpdateItem,
+    TaskCreate,
+    TaskFilter,
+    TaskProjection,
+    TaskPublic,
+    TaskUpdate,
+)
+from app.tasks.search import TEXT_SEARCH_FIELDS, apply_text_search
+
+# Колонки задачи, от которых зависят счетчики TaskCounter
+COUNTED_COLUMNS = (Task.organisation, Task.project, Task.status, Task.created_at)
+# Изменение других полей не читает старые значения и не трогает счетчики
+COUNTED_FIELDS = frozenset(COUNTER_GROUP_FIELDS)
+
+# Колонки TaskPublic в порядке полей схемы: в этом порядке сериализуются ключи строк
+PUBLIC_FIELDS = tuple(name for name in TaskPublic.model_fields if name in TASK_FIELDS)
+
+
+def _counted_values(task: Task) -> tuple:
+    return task.organisation, task.project, task.status, task.created_at
 
 
 class TaskRepository:
     def __init__(self, session: AsyncSession):
         self._session: AsyncSession = session
 
-    async def create(self, task: TaskCreate) -> int:
+    async def create(self, task: TaskCreate) -> Task:
+        """Создает задачу одним INSERT ... RETURNING и возвращает ее целиком"""
         stmt = (
             insert(Task)
             .values(**task.model_dump(exclude_unset=True))
-            .returning(Task.id)
+            .returning(Task)
+        )
+        result = await self._session.scalars(stmt)
+        created_task = result.one()
+        # У новой задачи файлов нет — не запрашиваем их отдельно
+        set_committed_value(created_task, "files", [])
+        await TaskCounterRepository(self._session).apply(
+            counter_deltas(added=[_counted_values(created_task)])
         )
-        result = await self._session.execute(stmt)
         await self._session.commit()
+        return created_task
+
+    async def get_by_id(
+        self, task_id: int, projection: Optional[TaskProjection] = None
+    ) -> Task:
+        stmt = select(Task).options(*self._load_options(projection)).where(Task.id == task_id)
+        result = await self._session.execute(stmt)
         return result.scalar()
 
-    async def get_by_id(self, task_id: int) -> Task:
-        stmt = select(Task).options(selectinload(Task.files)).where(Task.id == task_id)
+    async def get_stamp(self, task_id: int) -> Optional[tuple]:
+        """Версия задачи для ETag: (updated_at, version) без загрузки строки и файлов"""
+        stmt = select(Task.updated_at, Task.version).where(Task.id == task_id)
+        result = await self._session.execute(stmt)
+        row = result.one_or_none()
+        return tuple(row) if row is not None else None
+
+    async def list_stamp(self, filters: TaskFilter = TaskFilter()) -> tuple:
+        """
+        Агрегат по задачам под фильтром для ETag списка: (количество,
+        max(updated_at), текущее время БД). Любая запись в задачу или ее
+        файлы обновляет updated_at, удаление меняет количество. Обе величины
+        читаются из индексов фильтров (updated_at в них последней колонкой),
+        без строк таблицы. В SQLite время хранится с точностью до секунды:
+        две записи за секунду дают одинаковый агрегат, поэтому вызывающий
+        сравнивает max(updated_at) с временем БД
+        """
+        stmt = select(func.count(), func.max(Task.updated_at), self._now()).where(
+            and_(*self._filter_conditions(filters))
+        )
+        stmt = apply_text_search(
+            stmt,
+            filters.model_dump(include=set(TEXT_SEARCH_FIELDS), exclude_none=True),
+            self._session.bind.dialect.name,
+        ).order_by(None)
+        result = await self._session.execute(stmt)
+        return tuple(result.one())
+
+    async def existing_ids(self, task_ids: List[int]) -> set:
+        stmt = select(Task.id).where(Task.id.in_(task_ids))
+        result = await self._session.scalars(stmt)
+        return set(result.all())
+
+    async def get_organisation(self, task_id: int) -> Optional[str]:
+        """Организация задачи или None, если задачи нет"""
+        stmt = select(Task.organisation).where(Task.id == task_id)
         result = await self._session.execute(stmt)
         return result.scalar()
 
-    async def list_all(self) -> List[Task]:
-        stmt = select(Task).options(selectinload(Task.files))
+    async def list_all_with_filtres(
+        self,
+        filters: TaskFilter = TaskFilter(),
+        limit: Optional[int] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+        offset: Optional[int] = None,
+        projection: Optional[TaskProjection] = None,
+    ) -> List[Task]:
+        """
+        Возвращает задачи от новых к старым, отсортированные по (created_at, id).
+        При поиске по title/description задачи сначала сортируются по релевантности.
+        after — позиция последней задачи предыдущей страницы (keyset-пагинация),
+        offset — смещение для выдачи по релевантности,
+        projection — загружаемые колонки и файлы (None — задача целиком)
+        """
+        stmt = self._list_statement(filters, limit, after, offset)
+        stmt = stmt.options(*self._load_options(projection, "created_at"))
         result = await self._session.execute(stmt)
         return result.scalars().all()
 
-    async def list_all_with_filtres(
-        self, filters: TaskFilter = TaskFilter()
+    async def list_rows(
+        self,
+        filters: TaskFilter = TaskFilter(),
+        limit: Optional[int] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+        offset: Optional[int] = None,
+        projection: Optional[TaskProjection] = None,
+    ) -> List[dict]:
+        """
+        Та же выборка, что list_all_with_filtres, но словарями колонок, без
+        ORM-объектов: для сериализации напрямую в JSON. У каждой строки есть
+        created_at (для курсора), а files — если файлы входят в проекцию.
+        Ключи идут в порядке полей схемы ответа, поэтому row_serializer дает
+        те же байты, что model_dump_json()
+        """
+        fields = PUBLIC_FIELDS if projection is None else projection.fields
+        columns = [getattr(Task, name) for name in dict.fromkeys(fields + ("created_at",))]
+        stmt = self._list_statement(filters, limit, after, offset).with_only_columns(
+            *columns, maintain_column_froms=True
+        )
+        result = await self._session.execute(stmt)
+        rows = [dict(row) for row in result.mappings()]
+
+        if rows and (projection is None or projection.files):
+            files = await FileRepository(self._session).get_rows_by_task_ids(
+                [row["id"] for row in rows]
+            )
+            for row in rows:
+                row["files"] = files.get(row["id"], [])
+        return rows
+
+    def _list_statement(
+        self,
+        filters: TaskFilter,
+        limit: Optional[int],
+        after: Optional[Tuple[datetime, int]],
+        offset: Optional[int],
+    ) -> Select:
+        conditions = self._filter_conditions(filters)
+        if after is not None:
+            created_at, task_id = after
+            # Первое условие избыточно, но, в отличие от OR, задает границу
+            # диапазона индекса: страница читается с позиции курсора, а не с начала
+            conditions.append(Task.created_at <= created_at)
+            conditions.append(
+                or_(
+                    Task.created_at < created_at,
+                    and_(Task.created_at == created_at, Task.id < task_id),
+                )
+            )
+
+        stmt = select(Task).where(and_(*conditions))
+        stmt = apply_text_search(
+            stmt,
+            filters.model_dump(include=set(TEXT_SEARCH_FIELDS), exclude_none=True),
+            self._session.bind.dialect.name,
+        )
+        stmt = stmt.order_by(Task.created_at.desc(), Task.id.desc())
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        if offset:
+            stmt = stmt.offset(offset)
+        return stmt
+
+    async def db_now(self) -> datetime:
+        """Текущее время БД в том же виде, в каком его пишут server_default"""
+        result = await self._session.execute(select(self._now()))
+        return result.scalar_one()
+
+    def _now(self):
+        if self._session.bind.dialect.name == "postgresql":
+            now = func.localtimestamp()
+        else:
+            now = func.now()
+        return type_coerce(now, TimestampType)
+
+    async def list_changed(
+        self, after: Optional[Tuple[datetime, int]], until: datetime, limit: int
     ) -> List[Task]:
-        filters_dict = filters.model_dump(exclude_unset=True, exclude_none=True)
+        """
+        Задачи, измененные после позиции after (updated_at, id) и не позже until,
+        в порядке изменения. Загрузка файлов задач меняет их updated_at,
+        поэтому файлы возвращаются вместе с задачами
+        """
+        conditions = [Task.updated_at <= until]
+        if after is not None:
+            updated_at, task_id = after
+            # Граница диапазона для индекса, см. _list_statement
+            conditions.append(Task.updated_at >= updated_at)
+            conditions.append(
+                or_(
+                    Task.updated_at > updated_at,
+                    and_(Task.updated_at == updated_at, Task.id > task_id),
+                )
+            )
+        stmt = (
+            select(Task)
+            .options(selectinload(Task.files))
+            .where(and_(*conditions))
+            .order_by(Task.updated_at, Task.id)
+            .limit(limit)
+        )
+        result = await self._session.scalars(stmt)
+        return result.all()
+
+    async def list_tombstones(
+        self, after: Tuple[datetime, int], until: datetime, limit: int
+    ) -> List[TaskTombstone]:
+        """Отметки об удалении после позиции after (created_at, id) и не позже until"""
+        deleted_at, tombstone_id = after
+        stmt = (
+            select(TaskTombstone)
+            .where(
+                TaskTombstone.created_at <= until,
+                TaskTombstone.created_at >= deleted_at,
+                or_(
+                    TaskTombstone.created_at > deleted_at,
+                    and_(
+                        TaskTombstone.created_at == deleted_at,
+                        TaskTombstone.id > tombstone_id,
+                    ),
+                ),
+            )
+            .order_by(TaskTombstone.created_at, TaskTombstone.id)
+            .limit(limit)
+        )
+        result = await self._session.scalars(stmt)
+        return result.all()
+
+    @staticmethod
+    def _load_options(projection: Optional[TaskProjection], *required: str) -> list:
+        """
+        Опции загрузки под проекцию: только нужные колонки,
+        файлы — отдельным запросом и только если они запрошены
+        """
+        if projection is None:
+            return [selectinload(Task.files)]
+        columns = dict.fromkeys(projection.fields + required)
+        options = [load_only(*(getattr(Task, column) for column in columns))]
+        options.append(selectinload(Task.files) if projection.files else raiseload(Task.files))
+        return options
+
+    @staticmethod
+    def _filter_conditions(filters: TaskFilter) -> list:
+        filters_dict = filters.model_dump(
+            exclude=set(TEXT_SEARCH_FIELDS), exclude_unset=True, exclude_none=True
+        )
         conditions = []
         for key in filters_dict:
             if key == "create_gt":
@@ -44,28 +279,148 @@ class TaskRepository:
                 conditions.append(Task.created_at < filters_dict[key])
             elif key in ["status", "project", "organisation"]:
                 conditions.append(getattr(Task, key) == filters_dict[key])
-            else:
-                conditions.append(getattr(Task, key).like(f"%{filters_dict[key]}%"))
-
-        stmt = select(Task).options(selectinload(Task.files)).where(and_(*conditions))
-        result = await self._session.execute(stmt)
-        return result.scalars().all()
+        return conditions
 
     async def update_by_id(
         self, task_id: int, update_fields: TaskUpdate
-    ) -> Optional[bool]:
-        user = await self._session.get(Task, task_id)
-        if not user:
-            return None
+    ) -> Optional[Task]:
+        """
+        Обновляет задачу одним UPDATE ... RETURNING.
+        Возвращает обновленную задачу с файлами или None, если задачи нет
+        """
         update_dict = update_fields.model_dump(exclude_unset=True, exclude_none=True)
-        for key, value in update_dict.items():
-            if hasattr(user, key):
-                setattr(user, key, value)
+        if not update_dict:
+            return await self.get_by_id(task_id)
+
+        old_rows = await self._lock_counted_rows([task_id], update_dict)
+        stmt = (
+            update(Task)
+            .where(Task.id == task_id)
+            .values(**update_dict, version=Task.version + 1)
+            .returning(Task)
+            .options(selectinload(Task.files))
+            .execution_options(populate_existing=True)
+        )
+        result = await self._session.scalars(stmt)
+        updated_task = result.one_or_none()
+        if updated_task is not None and old_rows:
+            await TaskCounterRepository(self._session).apply(
+                counter_deltas(added=[_counted_values(updated_task)], removed=old_rows.values())
+            )
         await self._session.commit()
-        return True
+        return updated_task
 
-    async def delete_by_id(self, task_id: int) -> bool:
-        stmt = delete(Task).where(Task.id == task_id)
-        operation_result = await self._session.execute(stmt)
+    async def delete_by_id(self, task_id: int) -> Optional[str]:
+        """Удаляет задачу, возвращает ее организацию или None, если задачи нет"""
+        deleted = await self.delete_many([task_id])
+        return deleted.get(task_id)
+
+    async def create_many(self, tasks: List[TaskCreate]) -> List[int]:
+        """Создает задачи одним пакетным INSERT и возвращает их ID в порядке входа"""
+        # PostgreSQL не обещает порядок RETURNING и ID при параллельных вставках
+        # (кэш последовательности), поэтому порядок входа просим явно. На SQLite
+        # sort_by_parameter_order вырождается в построчные INSERT, а
+        # автоинкрементные ID одного многострочного INSERT идут в порядке строк
+        ordered = self._session.bind.dialect.name == "postgresql"
+        stmt = insert(Task).returning(Task.id, *COUNTED_COLUMNS, sort_by_parameter_order=ordered)
+        result = await self._session.execute(
+            stmt, [task.model_dump() for task in tasks]
+        )
+        rows = result.all()
+        await TaskCounterRepository(self._session).apply(
+            counter_deltas(added=[tuple(row[1:]) for row in rows])
+        )
+        task_ids = [row.id for row in rows] if ordered else sorted(row.id for row in rows)
         await self._session.commit()
-        return operation_result.rowcount > 0
+        return task_ids
+
+    async def update_many(self, items: List[TaskBatchUpdateItem]) -> Dict[int, str]:
+        """
+        Обновляет задачи в одной транзакции. Элементы с одинаковым набором
+        изменений объединяются в один UPDATE ... WHERE id IN (...).
+        Возвращает {ID: организация} задач, которые были найдены и обновлены
+        """
+        groups: Dict[tuple, List[int]] = defaultdict(list)
+        for item in items:
+            update_dict = item.model_dump(exclude={"id"}, exclude_unset=True, exclude_none=True)
+            if update_dict:
+                groups[tuple(sorted(update_dict.items()))].append(item.id)
+
+        old_rows: Dict[int, tuple] = {}
+        for values, task_ids in groups.items():
+            old_rows.update(await self._lock_counted_rows(task_ids, dict(values)))
+
+        new_rows: Dict[int, tuple] = {}
+        for values, task_ids in groups.items():
+            stmt = (
+                update(Task)
+                .where(Task.id.in_(task_ids))
+                .values(**dict(values), version=Task.version + 1)
+                .returning(Task.id, *COUNTED_COLUMNS)
+            )
+            result = await self._session.execute(stmt)
+            new_rows.update((row[0], tuple(row[1:])) for row in result.all())
+
+        # Задача может входить в несколько групп: учитываем исходное и итоговое состояние
+        changed = [task_id for task_id in old_rows if task_id in new_rows]
+        await TaskCounterRepository(self._session).apply(
+            counter_deltas(
+                added=[new_rows[task_id] for task_id in changed],
+                removed=[old_rows[task_id] for task_id in changed],
+            )
+        )
+        await self._session.commit()
+        return {task_id: row[0] for task_id, row in new_rows.items()}
+
+    async def delete_many(self, task_ids: List[int]) -> Dict[int, str]:
+        """
+        Удаляет задачи вместе с файлами в одной транзакции,
+        возвращает {ID: организация} удаленных задач
+        """
+        released = await FileRepository(self._session).delete_by_task_ids(task_ids)
+        stmt = delete(Task).where(Task.id.in_(task_ids)).returning(Task.id, *COUNTED_COLUMNS)
+        result = await self._session.execute(stmt)
+        rows = result.all()
+        deleted = {row.id: row.organisation for row in rows}
+        if deleted:
+            await self._add_tombstones(deleted)
+            await TaskCounterRepository(self._session).apply(
+                counter_deltas(removed=[tuple(row[1:]) for row in rows])
+            )
+        await self._session.commit()
+        # Содержимое удаляем только после коммита, когда на него точно нет ссылок
+        remove_files(released)
+        return deleted
+
+    async def _lock_counted_rows(
+        self, task_ids: List[int], update_dict: dict
+    ) -> Dict[int, tuple]:
+        """
+        Значения счетчиков задач до изменения, если изменение их затрагивает.
+        Строки блокируются до конца транзакции (PostgreSQL), чтобы параллельное
+        изменение не сбило счетчики
+        """
+        if not COUNTED_FIELDS & update_dict.keys():
+            return {}
+        stmt = (
+            select(Task.id, *COUNTED_COLUMNS)
+            .where(Task.id.in_(task_ids))
+            .with_for_update()
+        )
+        result = await self._session.execute(stmt)
+        return {row[0]: tuple(row[1:]) for row in result.all()}
+
+    async def _add_tombstones(self, deleted: Dict[int, str]) -> None:
+        """Отмечает удаление для синхронизации и чистит отметки старше срока хранения"""
+        await self._session.execute(
+            insert(TaskTombstone),
+            [
+                {"task_id": task_id, "organisation": organisation}
+                for task_id, organisation in deleted.items()
+            ],
+        )
+        # created_at пишет часы БД, поэтому и срок считается по ним
+        expired = await self.db_now() - timedelta(seconds=settings.SYNC_TOMBSTONE_RETENTION)
+        await self._session.execute(
+            delete(TaskTombstone).where(TaskTombstone.created_at < expired)
+        )
@@ -1,17 +1,50 @@
-from typing import List
+from datetime import date, timedelta
+from typing import Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from loguru import logger
+from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.conditional import is_not_modified, not_modified_response
+from app.api.serialization import RawJSONResponse, row_serializer
+from app.config import settings
 from app.database import get_session
+from app.events.broker import event_broker
+from app.tasks.cache import task_cache
+from app.tasks.counters import COUNTER_GROUP_FIELDS, TaskCounterRepository
+from app.tasks.models import Status, Task
 from app.tasks.repository import TaskRepository
+from app.tasks.utils import (
+    decode_cursor,
+    decode_offset_cursor,
+    decode_sync_watermark,
+    encode_cursor,
+    encode_offset_cursor,
+    encode_sync_watermark,
+    make_etag,
+)
 from app.tasks.schemas import (
+    ETaskStatus,
+    TaskBatchCreate,
+    TaskBatchDelete,
+    TaskBatchItemResult,
+    TaskBatchResult,
+    TaskBatchStatusUpdate,
+    TaskBatchUpdate,
+    TaskBatchUpdateItem,
+    TaskChanges,
     TaskCreate,
     TaskFilter,
+    TaskPage,
+    TaskProjection,
     TaskPublic,
+    TaskStats,
     TaskStatusUpdate,
     TaskUpdate,
+    parse_task_projection,
+    task_slim_model,
+    task_slim_page_model,
 )
 
 router = APIRouter()
@@ -24,13 +57,14 @@ async def create_new_task(
     """Создает новую задачу"""
     task_repo = TaskRepository(session)
     try:
-        task_id = await task_repo.create(task_in)
-        task = await task_repo.get_by_id(task_id)
+        task = await task_repo.create(task_in)
         if not task:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Не удалось создать задачу",
             )
+        task_cache.invalidate_lists()
+        _publish_task("task.created", task)
         return task
     except ValueError as e:
         logger.error(f"Validation error creating task: {str(e)}")
@@ -46,16 +80,297 @@ async def create_new_task(
         )
 
 
+# Пакетные маршруты объявлены до /{task_id}, иначе "batch" будет принят за ID
+@router.post(
+    "/batch", response_model=TaskBatchResult, status_code=status.HTTP_201_CREATED
+)
+async def create_tasks_batch(
+    batch: TaskBatchCreate, session: AsyncSession = Depends(get_session)
+):
+    """Создает несколько задач одним запросом в одной транзакции"""
+    task_repo = TaskRepository(session)
+    task_ids = await task_repo.create_many(batch.items)
+    task_cache.invalidate_lists()
+    for task_id, item in zip(task_ids, batch.items):
+        event_broker.publish("task.created", task_id, item.organisation)
+    return TaskBatchResult(
+        items=[
+            TaskBatchItemResult(index=index, id=task_id, result="created")
+            for index, task_id in enumerate(task_ids)
+        ]
+    )
+
+
+@router.patch("/batch", response_model=TaskBatchResult)
+async def update_tasks_batch(
+    batch: TaskBatchUpdate, session: AsyncSession = Depends(get_session)
+):
+    """Обновляет несколько задач одним запросом в одной транзакции"""
+    task_repo = TaskRepository(session)
+    updated_ids = await task_repo.update_many(batch.items)
+    task_cache.invalidate_tasks(updated_ids)
+    for task_id, organisation in updated_ids.items():
+        event_broker.publish("task.updated", task_id, organisation)
+    return TaskBatchResult(
+        items=[
+            TaskBatchItemResult(
+                index=index,
+                id=item.id,
+                result=_batch_update_result(item, updated_ids),
+            )
+            for index, item in enumerate(batch.items)
+        ]
+    )
+
+
+@router.patch("/batch/status", response_model=TaskBatchResult)
+async def update_tasks_status_batch(
+    batch: TaskBatchStatusUpdate, session: AsyncSession = Depends(get_session)
+):
+    """Меняет статус нескольких задач одним UPDATE"""
+    task_repo = TaskRepository(session)
+    items = [TaskBatchUpdateItem(id=task_id, status=batch.status) for task_id in batch.ids]
+    updated_ids = await task_repo.update_many(items)
+    task_cache.invalidate_tasks(updated_ids)
+    for task_id, organisation in updated_ids.items():
+        event_broker.publish(
+            "task.status_changed", task_id, organisation, {"status": batch.status}
+        )
+    return TaskBatchResult(
+        items=[
+            TaskBatchItemResult(
+                index=index,
+                id=task_id,
+                result="updated" if task_id in updated_ids else "not_found",
+            )
+            for index, task_id in enumerate(batch.ids)
+        ]
+    )
+
+
+@router.post("/batch/delete", response_model=TaskBatchResult)
+async def delete_tasks_batch(
+    batch: TaskBatchDelete, session: AsyncSession = Depends(get_session)
+):
+    """Удаляет несколько задач одним запросом в одной транзакции"""
+    task_repo = TaskRepository(session)
+    deleted_ids = await task_repo.delete_many(batch.ids)
+    task_cache.invalidate_tasks(deleted_ids)
+    for task_id, organisation in deleted_ids.items():
+        event_broker.publish("task.deleted", task_id, organisation)
+    return TaskBatchResult(
+        items=[
+            TaskBatchItemResult(
+                index=index,
+                id=task_id,
+                result="deleted" if task_id in deleted_ids else "not_found",
+            )
+            for index, task_id in enumerate(batch.ids)
+        ]
+    )
+
+
+def _publish_task(event_type: str, task: Task) -> None:
+    event_broker.publish(
+        event_type,
+        task.id,
+        task.organisation,
+        TaskPublic.model_validate(task).model_dump(mode="json"),
+    )
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Счетчики кэша чтения задач"""
+    return task_cache.stats()
+
+
+@router.get("/changes", response_model=TaskChanges)
+async def get_task_changes(
+    session: AsyncSession = Depends(get_session),
+    since: Optional[str] = Query(
+        None, description="watermark из предыдущего ответа; без него — все задачи"
+    ),
+    limit: int = Query(1000, ge=1, le=settings.SYNC_MAX_LIMIT),
+):
+    """
+    Изменения задач для синхронизации клиентов: задачи (с файлами), измененные
+    после since, и ID удаленных задач. Стоимость запроса зависит от объема
+    изменений, а не от числа задач. Если отметки об удалениях с момента since
+    уже не хранятся, возвращается 410 — клиенту нужна полная синхронизация
+    """
+    task_repo = TaskRepository(session)
+    now = await task_repo.db_now()
+    until = now - timedelta(seconds=settings.SYNC_WATERMARK_LAG)
+
+    if since:
+        try:
+            tasks_after, deleted_after = decode_sync_watermark(since)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        if deleted_after[0] < now - timedelta(seconds=settings.SYNC_TOMBSTONE_RETENTION):
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="Изменения с этого момента уже не хранятся, нужна полная синхронизация",
+            )
+    else:
+        # Первая синхронизация получает все задачи, удалять на клиенте нечего
+        tasks_after, deleted_after = None, (until, 0)
+
+    # Запрашиваем на одну запись больше, чтобы узнать, есть ли продолжение
+    tasks = await task_repo.list_changed(tasks_after, until, limit + 1)
+    tombstones = await task_repo.list_tombstones(deleted_after, until, limit + 1)
+    has_more = len(tasks) > limit or len(tombstones) > limit
+
+    tasks = tasks[:limit]
+    if tasks:
+        tasks_after = (tasks[-1].updated_at, tasks[-1].id)
+    if len(tombstones) > limit:
+        tombstones = tombstones[:limit]
+        deleted_after = (tombstones[-1].created_at, tombstones[-1].id)
+    else:
+        # Все удаления до until выданы: позиция сдвигается, даже если их не было,
+        # чтобы регулярно синхронизирующийся клиент не получил 410
+        deleted_after = (until, 0)
+
+    # SQLite может выдать ID удаленной задачи новой — такую задачу не удаляем на клиенте
+    deleted_ids = list(dict.fromkeys(tombstone.task_id for tombstone in tombstones))
+    if deleted_ids:
+        alive = await task_repo.existing_ids(deleted_ids)
+        deleted_ids = [task_id for task_id in deleted_ids if task_id not in alive]
+
+    return TaskChanges.model_validate(
+        {
+            "items": tasks,
+            "deleted": deleted_ids,
+            "watermark": encode_sync_watermark(tasks_after, deleted_after),
+            "has_more": has_more,
+        }
+    )
+
+
+@router.get("/stats", response_model=TaskStats)
+async def get_task_stats(
+    session: AsyncSession = Depends(get_session),
+    group_by: str = Query(
+        "status", description="Поля группировки через запятую: status, organisation, project"
+    ),
+    bucket: Optional[Literal["day", "week", "month"]] = Query(
+        None, description="Дополнительная группировка по дате создания"
+    ),
+    organisation: Optional[str] = Query(None, description="Фильтр по организации (ЛПУ)"),
+    project: Optional[str] = Query(None, description="Фильтр по проекту"),
+    status_filter: Optional[ETaskStatus] = Query(
+        None, alias="status", description="Фильтр по статусу"
+    ),
+    date_from: Optional[date] = Query(None, description="Создана не раньше (день)"),
+    date_to: Optional[date] = Query(None, description="Создана не позже (день)"),
+):
+    """
+    Количество задач по статусу, организации и проекту, при необходимости по периодам.
+    Считается по таблице счетчиков, а не по задачам
+    """
+    fields = tuple(dict.fromkeys(field.strip() for field in group_by.split(",") if field.strip()))
+    unknown = set(fields) - set(COUNTER_GROUP_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Неизвестные поля группировки: {', '.join(sorted(unknown))}",
+        )
+
+    groups = await TaskCounterRepository(session).aggregate(
+        fields,
+        bucket=bucket,
+        organisation=organisation,
+        project=project,
+        status=Status[status_filter.name] if status_filter else None,
+        date_from=date_from,
+        date_to=date_to,
+    )
+    return TaskStats(total=sum(group["count"] for group in groups), groups=groups)
+
+
+def _batch_update_result(item: TaskBatchUpdateItem, updated_ids: set) -> str:
+    if not item.model_dump(exclude={"id"}, exclude_unset=True, exclude_none=True):
+        return "skipped"
+    return "updated" if item.id in updated_ids else "not_found"
+
+
+# Клиент всегда перепроверяет ответ, но при совпадении ETag получает пустой 304
+REVALIDATE = "private, no-cache"
+
+
+def get_projection(
+    fields: Optional[str] = Query(
+        None,
+        description="Поля задачи через запятую, например id,title,status. "
+        "Без параметра возвращаются все поля с файлами",
+    ),
+    include: Optional[str] = Query(
+        None, description="Связанные данные вместе с fields: files"
+    ),
+) -> Optional[TaskProjection]:
+    try:
+        return parse_task_projection(fields, include)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def _model_response(value: BaseModel, response: Response, headers: dict):
+    """
+    Полная схема отдается как обычно, а урезанная — готовым JSON,
+    иначе FastAPI проверил бы ее по response_model и потребовал бы все поля
+    """
+    if isinstance(value, (TaskPublic, TaskPage)):
+        response.headers.update(headers)
+        return value
+    return Response(value.model_dump_json(), media_type="application/json", headers=headers)
+
+
 @router.get("/{task_id}", response_model=TaskPublic)
-async def get_task_by_id(task_id: int, session: AsyncSession = Depends(get_session)):
-    """Получает задачу по ID"""
+async def get_task_by_id(
+    task_id: int,
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
+    projection: Optional[TaskProjection] = Depends(get_projection),
+):
+    """
+    Получает задачу по ID.
+    ETag строится по версии задачи; при совпадении If-None-Match возвращается 304.
+    fields/include сужают ответ и загружаемые из БД колонки
+    """
+    cached = task_cache.get_task(task_id, projection)
+    if cached is not None:
+        etag, task_public = cached
+        if is_not_modified(request, etag):
+            return not_modified_response({"etag": etag, "cache-control": REVALIDATE})
+        return _model_response(
+            task_public, response, {"etag": etag, "cache-control": REVALIDATE}
+        )
+
+    token = task_cache.task_token(task_id)
     task_repo = TaskRepository(session)
-    task = await task_repo.get_by_id(task_id)
+
+    # Сначала легкий запрос версии: при совпадении ETag задача и файлы не загружаются
+    stamp = await task_repo.get_stamp(task_id)
+    if stamp is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Задача не найдена"
+        )
+    etag = make_etag("task", task_id, projection, *stamp)
+    if is_not_modified(request, etag):
+        return not_modified_response({"etag": etag, "cache-control": REVALIDATE})
+
+    task = await task_repo.get_by_id(task_id, projection)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Задача не найдена"
         )
-    return task
+    model = TaskPublic if projection is None else task_slim_model(projection)
+    task_public = model.model_validate(task)
+    task_cache.set_task(task_id, (etag, task_public), token, projection)
+    return _model_response(task_public, response, {"etag": etag, "cache-control": REVALIDATE})
 
 
 @router.patch("/{task_id}", response_model=TaskPublic)
@@ -67,20 +382,13 @@ async def update_existing_task(
     """Обновляет существующую задачу"""
     task_repo = TaskRepository(session)
 
-    existing_task = await task_repo.get_by_id(task_id)
-    if not existing_task:
+    updated_task = await task_repo.update_by_id(task_id, task_update)
+    task_cache.invalidate_task(task_id)
+    if not updated_task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Задача не найдена"
         )
-
-    update_result = await task_repo.update_by_id(task_id, task_update)
-    if not update_result:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Не удалось обновить задачу",
-        )
-
-    updated_task = await task_repo.get_by_id(task_id)
+    _publish_task("task.updated", updated_task)
     return updated_task
 
 
@@ -93,22 +401,15 @@ async def update_task_status(
     """Обновляет только статус задачи"""
     task_repo = TaskRepository(session)
 
-    existing_task = await task_repo.get_by_id(task_id)
-    if not existing_task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Задача не найдена"
-        )
-
     task_update = TaskUpdate(status=status_update.status)
 
-    update_result = await task_repo.update_by_id(task_id, task_update)
-    if not update_result:
+    updated_task = await task_repo.update_by_id(task_id, task_update)
+    task_cache.invalidate_task(task_id)
+    if not updated_task:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Не удалось обновить статус задачи",
+            status_code=status.HTTP_404_NOT_FOUND, detail="Задача не найдена"
         )
-
-    updated_task = await task_repo.get_by_id(task_id)
+    _publish_task("task.status_changed", updated_task)
     return updated_task
 
 
@@ -118,29 +419,84 @@ async def delete_existing_task(
 ):
     """Удаляет задачу по ID"""
     task_repo = TaskRepository(session)
-    deleted = await task_repo.delete_by_id(task_id)
-    if not deleted:
+    organisation = await task_repo.delete_by_id(task_id)
+    task_cache.invalidate_task(task_id)
+    if organisation is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Задача не найдена"
         )
+    event_broker.publish("task.deleted", task_id, organisation)
     return
 
 
-@router.get("/", response_model=List[TaskPublic])
+@router.get("/", response_model=TaskPage)
 async def search_tasks(
+    request: Request,
     session: AsyncSession = Depends(get_session),
     filters: TaskFilter = Depends(),
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="Курсор из next_cursor предыдущей страницы"),
+    projection: Optional[TaskProjection] = Depends(get_projection),
 ):
-    """Возвращает список задач с возможностью фильтрации и поиска"""
+    """
+    Возвращает страницу задач с возможностью фильтрации и поиска.
+    ETag строится по агрегату задач под фильтром; при совпадении
+    If-None-Match возвращается 304 без загрузки строк.
+    fields/include сужают ответ и загружаемые из БД колонки; без include=files
+    файлы не запрашиваются.
+    Строки из БД сериализуются сразу в JSON, минуя ORM-объекты и валидацию
+    TaskPage; в кэше хранится готовое тело ответа
+    """
+    cache_key = task_cache.list_key(filters, limit, cursor, projection)
+    cached = task_cache.get_list(cache_key)
+    if cached is not None:
+        etag, body = cached
+        if is_not_modified(request, etag):
+            return not_modified_response({"etag": etag, "cache-control": REVALIDATE})
+        return RawJSONResponse(body, headers={"etag": etag, "cache-control": REVALIDATE})
+
+    token = task_cache.list_token()
     task_repo = TaskRepository(session)
 
-    if any(getattr(filters, field) is not None for field in filters.model_fields):
-        tasks = await task_repo.list_all_with_filtres(filters)
-    else:
-        tasks = await task_repo.list_all()
+    count, last_updated, now = await task_repo.list_stamp(filters)
+    # Запись в ту же секунду может не сдвинуть max(updated_at): пока последнее
+    # изменение моложе задержки водяного знака, ETag не выдается
+    settled = last_updated is None or now - last_updated >= timedelta(
+        seconds=settings.SYNC_WATERMARK_LAG
+    )
+    etag = make_etag("tasks", cache_key, count, last_updated) if settled else None
+    if etag is not None and is_not_modified(request, etag):
+        return not_modified_response({"etag": etag, "cache-control": REVALIDATE})
+
+    # Выдача по релевантности не упорядочена по (created_at, id),
+    # поэтому для поиска курсор хранит смещение, а не позицию
+    after = None
+    offset = 0
+    if cursor:
+        try:
+            if filters.is_text_search:
+                offset = decode_offset_cursor(cursor)
+            else:
+                after = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # Запрашиваем на одну задачу больше, чтобы узнать, есть ли следующая страница
+    tasks = await task_repo.list_rows(
+        filters, limit=limit + 1, after=after, offset=offset, projection=projection
+    )
 
-    if limit and len(tasks) > limit:
+    next_cursor = None
+    if len(tasks) > limit:
         tasks = tasks[:limit]
+        if filters.is_text_search:
+            next_cursor = encode_offset_cursor(offset + limit)
+        else:
+            next_cursor = encode_cursor(tasks[-1]["created_at"], tasks[-1]["id"])
 
-    return tasks
+    page_model = TaskPage if projection is None else task_slim_page_model(projection)
+    body = row_serializer(page_model).dump_json({"items": tasks, "next_cursor": next_cursor})
+    if etag is None:
+        return RawJSONResponse(body, headers={"cache-control": REVALIDATE})
+    task_cache.set_list(cache_key, (etag, body), token)
+    return RawJSONResponse(body, headers={"etag": etag, "cache-control": REVALIDATE})
@@ -1,9 +1,11 @@
-from datetime import datetime
+from datetime import date, datetime
 from enum import StrEnum
-from typing import Optional
+from functools import lru_cache
+from typing import Literal, NamedTuple, Optional
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, create_model
 
+from app.config import settings
 from app.files.schemas import FilePublic
 
 
@@ -54,10 +56,10 @@ class TaskStatusUpdate(BaseModel):
 
 class TaskFilter(BaseModel):
     title: Optional[str] = Field(
-        None, max_length=200, description="Поиск по части заголовка"
+        None, max_length=200, description="Полнотекстовый поиск по заголовку (по началу слов)"
     )
     description: Optional[str] = Field(
-        None, max_length=2000, description="Поиск по части описания"
+        None, max_length=2000, description="Полнотекстовый поиск по описанию (по началу слов)"
     )
     project: Optional[str] = Field(None, description="Фильтр по проекту")
     organisation: Optional[str] = Field(
@@ -68,6 +70,10 @@ class TaskFilter(BaseModel):
     create_gt: datetime | None = Field(description="позже чем", default=None)
     create_lt: datetime | None = Field(description="раньше чем", default=None)
 
+    @property
+    def is_text_search(self) -> bool:
+        return bool(self.title or self.description)
+
 
 class TaskPublic(TaskBase):
     id: int
@@ -78,3 +84,134 @@ class TaskPublic(TaskBase):
     files: list[FilePublic] = []
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class TaskPage(BaseModel):
+    items: list[TaskPublic]
+    next_cursor: Optional[str] = Field(
+        None, description="Курсор следующей страницы, null если страница последняя"
+    )
+
+
+# Поля задачи, которые можно запросить через fields=
+TASK_FIELDS = (
+    "id",
+    "title",
+    "description",
+    "project",
+    "organisation",
+    "status",
+    "created_at",
+    "updated_at",
+)
+
+
+class TaskProjection(NamedTuple):
+    """Набор полей задачи в ответе: fields — колонки, files — нужны ли файлы"""
+
+    fields: tuple[str, ...]
+    files: bool
+
+
+def parse_task_projection(
+    fields: Optional[str], include: Optional[str]
+) -> Optional[TaskProjection]:
+    """
+    Разбирает параметры fields и include. None — полный TaskPublic.
+    При некорректном значении бросает ValueError
+    """
+    includes = {value.strip() for value in (include or "").split(",") if value.strip()}
+    unknown = includes - {"files"}
+    if unknown:
+        raise ValueError(f"Неизвестные значения include: {', '.join(sorted(unknown))}")
+    if fields is None:
+        return None
+
+    requested = {value.strip() for value in fields.split(",") if value.strip()}
+    unknown = requested - set(TASK_FIELDS)
+    if unknown:
+        raise ValueError(f"Неизвестные поля задачи: {', '.join(sorted(unknown))}")
+    # id нужен всегда: по нему клиент запрашивает задачу целиком
+    requested.add("id")
+    return TaskProjection(
+        fields=tuple(field for field in TASK_FIELDS if field in requested),
+        files="files" in includes,
+    )
+
+
+@lru_cache()
+def task_slim_model(projection: TaskProjection) -> type[BaseModel]:
+    """Схема задачи только с запрошенными полями"""
+    selected = projection.fields + (("files",) if projection.files else ())
+    return create_model(
+        "TaskSlim",
+        __config__=ConfigDict(from_attributes=True),
+        **{
+            name: (TaskPublic.model_fields[name].annotation, TaskPublic.model_fields[name])
+            for name in selected
+        },
+    )
+
+
+@lru_cache()
+def task_slim_page_model(projection: TaskProjection) -> type[BaseModel]:
+    return create_model(
+        "TaskSlimPage",
+        items=(list[task_slim_model(projection)], ...),
+        next_cursor=(Optional[str], TaskPage.model_fields["next_cursor"]),
+    )
+
+
+class TaskChanges(BaseModel):
+    items: list[TaskPublic] = Field(description="Созданные и измененные задачи с файлами")
+    deleted: list[int] = Field(description="ID удаленных задач")
+    watermark: str = Field(description="Передайте в since следующего запроса")
+    has_more: bool = Field(description="Изменения не уместились в limit, запросите еще")
+
+
+class TaskStatsGroup(BaseModel):
+    status: Optional[ETaskStatus] = None
+    organisation: Optional[str] = None
+    project: Optional[str] = None
+    bucket: Optional[date] = Field(
+        None, description="Начало периода: день, понедельник недели или первое число месяца"
+    )
+    count: int
+
+
+class TaskStats(BaseModel):
+    total: int
+    groups: list[TaskStatsGroup]
+
+
+class TaskBatchUpdateItem(TaskUpdate):
+    id: int
+
+
+class TaskBatchCreate(BaseModel):
+    items: list[TaskCreate] = Field(min_length=1, max_length=settings.TASK_BATCH_MAX_SIZE)
+
+
+class TaskBatchUpdate(BaseModel):
+    items: list[TaskBatchUpdateItem] = Field(
+        min_length=1, max_length=settings.TASK_BATCH_MAX_SIZE
+    )
+
+
+class TaskBatchStatusUpdate(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=settings.TASK_BATCH_MAX_SIZE)
+    status: ETaskStatus
+
+
+class TaskBatchDelete(BaseModel):
+    ids: list[int] = Field(min_length=1, max_length=settings.TASK_BATCH_MAX_SIZE)
+
+
+class TaskBatchItemResult(BaseModel):
+    index: int = Field(description="Позиция элемента в запросе")
+    id: Optional[int] = None
+    result: Literal["created", "updated", "deleted", "not_found", "skipped"]
+
+
+class TaskBatchResult(BaseModel):
+    items: list[TaskBatchItemResult]
@@ -0,0 +1,99 @@
+import re
+from typing import Optional
+
+from sqlalchemy import DDL, Select, and_, column, event, func, literal_column, table
+
+from app.tasks.models import Task
+
+TEXT_SEARCH_FIELDS = ("title", "description")
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Внешний FTS5-индекс поверх таблицы task (SQLite).
+# Синхронизируется триггерами, поэтому любые INSERT/UPDATE/DELETE по task,
+# включая массовые, сразу отражаются в индексе
+SQLITE_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5("
+    "title, description, content='task', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS task_fts_ai AFTER INSERT ON task BEGIN "
+    "INSERT INTO task_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS task_fts_ad AFTER DELETE ON task BEGIN "
+    "INSERT INTO task_fts(task_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS task_fts_au AFTER UPDATE OF title, description ON task BEGIN "
+    "INSERT INTO task_fts(task_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO task_fts(rowid, title, description) "
+    "VALUES (new.id, new.title, new.description); END",
+)
+
+# GIN-индексы по выражению (PostgreSQL). Выражение в запросе должно
+# совпадать с индексным символ в символ, поэтому конфигурация вшита литералом
+PG_TS_CONFIG = "'simple'::regconfig"
+PG_FTS_DDL = tuple(
+    f"CREATE INDEX IF NOT EXISTS ix_task_{field}_fts ON task "
+    f"USING GIN (to_tsvector({PG_TS_CONFIG}, {field}))"
+    for field in TEXT_SEARCH_FIELDS
+)
+
+for _statement in SQLITE_FTS_DDL:
+    event.listen(Task.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+for _statement in PG_FTS_DDL:
+    event.listen(Task.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+
+_task_fts = table("task_fts", column("rowid"), column("task_fts"))
+
+
+def search_terms(query: Optional[str]) -> list[str]:
+    """Разбивает поисковую строку на слова, отбрасывая служебные символы"""
+    return _WORD_RE.findall(query or "")
+
+
+def apply_text_search(stmt: Select, text_filters: dict, dialect_name: str) -> Select:
+    """
+    Добавляет к запросу полнотекстовый поиск по title/description
+    с префиксным совпадением и сортировкой по релевантности.
+
+    text_filters — {поле: строка поиска}; поля без слов игнорируются
+    """
+    terms = {field: search_terms(value) for field, value in text_filters.items()}
+    terms = {field: words for field, words in terms.items() if words}
+    if not terms:
+        return stmt
+
+    if dialect_name == "sqlite":
+        # "слово"* — префиксный поиск, кавычки экранируют синтаксис FTS5
+        match = " AND ".join(
+            "{} : ({})".format(field, " AND ".join(f'"{term}"*' for term in words))
+            for field, words in terms.items()
+        )
+        return (
+            stmt.join(_task_fts, _task_fts.c.rowid == Task.id)
+            .where(_task_fts.c.task_fts.op("MATCH")(match))
+            .order_by(func.bm25(literal_column("task_fts")))
+        )
+
+    if dialect_name == "postgresql":
+        conditions = []
+        rank = None
+        for field, words in terms.items():
+            vector = func.to_tsvector(literal_column(PG_TS_CONFIG), getattr(Task, field))
+            query = func.to_tsquery(
+                literal_column(PG_TS_CONFIG), " & ".join(f"{term}:*" for term in words)
+            )
+            conditions.append(vector.op("@@")(query))
+            field_rank = func.ts_rank(vector, query)
+            rank = field_rank if rank is None else rank + field_rank
+        return stmt.where(and_(*conditions)).order_by(rank.desc())
+
+    # Прочие СУБД без полнотекстового индекса — поиск подстрокой
+    return stmt.where(
+        and_(
+            *(
+                and_(*(getattr(Task, field).ilike(f"%{term}%") for term in words))
+                for field, words in terms.items()
+            )
+        )
+    )
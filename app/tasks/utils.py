@@ -0,0 +1,79 @@
+import base64
+import hashlib
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+
+def encode_cursor(created_at: datetime, task_id: int) -> str:
+    """Упаковывает позицию (created_at, id) в непрозрачный курсор"""
+    raw = json.dumps([created_at.isoformat(), task_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Распаковывает курсор, при некорректном значении бросает ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, task_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(task_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Некорректный курсор") from e
+
+
+def encode_offset_cursor(offset: int) -> str:
+    """Курсор для выдачи, отсортированной по релевантности"""
+    raw = json.dumps({"offset": offset}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_offset_cursor(cursor: str) -> int:
+    """Распаковывает курсор со смещением, при некорректном значении бросает ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = int(json.loads(base64.urlsafe_b64decode(padded.encode()))["offset"])
+    except (KeyError, TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Некорректный курсор") from e
+    if offset < 0:
+        raise ValueError("Некорректный курсор")
+    return offset
+
+
+def make_etag(*parts) -> str:
+    """Сильный ETag из произвольного набора значений (версий, агрегатов, фильтров)"""
+    raw = json.dumps(parts, default=str, separators=(",", ":"), ensure_ascii=False)
+    return f'"{hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()}"'
+
+
+SyncPosition = Tuple[datetime, int]
+
+
+def encode_sync_watermark(
+    tasks_after: Optional[SyncPosition], deleted_after: SyncPosition
+) -> str:
+    """Упаковывает позиции в потоке изменений задач и в потоке удалений"""
+    raw = json.dumps(
+        {
+            "tasks": [tasks_after[0].isoformat(), tasks_after[1]] if tasks_after else None,
+            "deleted": [deleted_after[0].isoformat(), deleted_after[1]],
+        },
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_sync_watermark(watermark: str) -> Tuple[Optional[SyncPosition], SyncPosition]:
+    """Распаковывает watermark, при некорректном значении бросает ValueError"""
+    try:
+        padded = watermark + "=" * (-len(watermark) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        tasks_after = raw["tasks"]
+        deleted_at, deleted_id = raw["deleted"]
+        return (
+            (datetime.fromisoformat(tasks_after[0]), int(tasks_after[1]))
+            if tasks_after is not None
+            else None,
+            (datetime.fromisoformat(deleted_at), int(deleted_id)),
+        )
+    except (KeyError, TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Некорректный watermark") from e
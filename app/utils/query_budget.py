@@ -0,0 +1,64 @@
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.database import async_engine
+
+
+class QueryCounter:
+    """Считает SQL-запросы и коммиты, выполненные через движок"""
+
+    def __init__(self, engine: AsyncEngine = async_engine):
+        self._engine = engine.sync_engine
+        self.statements: List[str] = []
+        self.commits = 0
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.statements.append(statement)
+
+    def _on_commit(self, conn) -> None:
+        self.commits += 1
+
+    def __enter__(self) -> "QueryCounter":
+        event.listen(self._engine, "before_cursor_execute", self._on_execute)
+        event.listen(self._engine, "commit", self._on_commit)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        event.remove(self._engine, "before_cursor_execute", self._on_execute)
+        event.remove(self._engine, "commit", self._on_commit)
+
+
+@contextmanager
+def assert_query_budget(
+    max_queries: int,
+    max_commits: Optional[int] = None,
+    engine: AsyncEngine = async_engine,
+) -> Iterator[QueryCounter]:
+    """
+    Проверяет, что код внутри блока укладывается в бюджет запросов к БД.
+    Бюджеты эндпоинтов закреплены в app.utils.query_plans.QUERY_BUDGETS:
+
+        with assert_query_budget(6, max_commits=1):
+            await client.patch(f"/api/v1/tasks/{task_id}/status", json={"status": "done"})
+
+    Здесь 6 запросов: чтение групп счетчиков, UPDATE ... RETURNING, файлы
+    задачи, UPSERT и DELETE счетчиков, ревизия списков
+    """
+    with QueryCounter(engine) as counter:
+        yield counter
+
+    errors = []
+    if counter.count > max_queries:
+        errors.append(f"запросов {counter.count} при бюджете {max_queries}")
+    if max_commits is not None and counter.commits > max_commits:
+        errors.append(f"коммитов {counter.commits} при бюджете {max_commits}")
+    if errors:
+        statements = "\n".join(f"  {statement}" for statement in counter.statements)
+        raise AssertionError(f"Превышен бюджет БД: {', '.join(errors)}\n{statements}")
@@ -0,0 +1,428 @@
+import asyncio
+import json
+import re
+import sys
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+from uuid import uuid4
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+_EXPLAINED = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+# SCAN <таблица> в EXPLAIN QUERY PLAN SQLite — обход всей таблицы или всего индекса;
+# поиск по индексу выглядит как SEARCH, а виртуальная таблица FTS5 ищет по своему индексу
+_SQLITE_SCAN_RE = re.compile(r"^SCAN (?!(?:\d+ )?CONSTANT ROW)(\w+)(?!.*VIRTUAL TABLE)")
+
+
+@dataclass
+class ExplainedQuery:
+    step: str
+    statement: str
+    parameters: tuple
+    allow_scan: frozenset
+    plan: List[str] = field(default_factory=list)
+    full_scans: set = field(default_factory=set)
+
+    @property
+    def violations(self) -> set:
+        return self.full_scans - self.allow_scan
+
+
+class QueryPlanCollector:
+    """
+    Запоминает SQL-запросы, выполненные через движок, вместе с параметрами
+    и шагом сценария, чтобы потом получить их планы выполнения
+    """
+
+    def __init__(self, engine: AsyncEngine):
+        self._engine = engine.sync_engine
+        self.queries: List[ExplainedQuery] = []
+        self._step = "-"
+        self._allow_scan: frozenset = frozenset()
+
+    @contextmanager
+    def step(self, name: str, allow_scan: Iterable[str] = ()) -> Iterator[None]:
+        """
+        Шаг сценария. allow_scan — таблицы, полный обход которых здесь ожидаем:
+        например, первая страница списка без фильтров читает индекс по порядку
+        """
+        self._step, self._allow_scan = name, frozenset(allow_scan)
+        try:
+            yield
+        finally:
+            self._step, self._allow_scan = "-", frozenset()
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if executemany or not statement.lstrip().upper().startswith(_EXPLAINED):
+            return
+        self.queries.append(
+            ExplainedQuery(self._step, statement, tuple(parameters or ()), self._allow_scan)
+        )
+
+    def __enter__(self) -> "QueryPlanCollector":
+        event.listen(self._engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        event.remove(self._engine, "before_cursor_execute", self._on_execute)
+
+
+async def explain(engine: AsyncEngine, queries: List[ExplainedQuery]) -> None:
+    """
+    Заполняет plan и full_scans запросов. На PostgreSQL последовательное
+    чтение запрещается (enable_seqscan = off): на маленькой тестовой таблице
+    планировщик и так выбрал бы Seq Scan, а здесь он остается в плане только
+    если подходящего индекса нет
+    """
+    dialect = engine.dialect.name
+    async with engine.connect() as connection:
+        if dialect == "postgresql":
+            await connection.exec_driver_sql("SET enable_seqscan = off")
+        for query in queries:
+            if dialect == "sqlite":
+                result = await connection.exec_driver_sql(
+                    f"EXPLAIN QUERY PLAN {query.statement}", query.parameters
+                )
+                query.plan = [row[-1] for row in result.all()]
+                query.full_scans = {
+                    match.group(1)
+                    for match in map(_SQLITE_SCAN_RE.match, query.plan)
+                    if match is not None
+                }
+            elif dialect == "postgresql":
+                result = await connection.exec_driver_sql(
+                    f"EXPLAIN (FORMAT JSON) {query.statement}", query.parameters
+                )
+                plan = result.scalar_one()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                nodes = list(_pg_nodes(plan[0]["Plan"]))
+                query.plan = [
+                    " ".join(
+                        filter(None, (node["Node Type"], node.get("Relation Name"), node.get("Index Name")))
+                    )
+                    for node in nodes
+                ]
+                query.full_scans = {
+                    node["Relation Name"] for node in nodes if node["Node Type"] == "Seq Scan"
+                }
+            else:
+                raise ValueError(f"EXPLAIN для {dialect} не поддерживается")
+
+
+def _pg_nodes(node: dict) -> Iterator[dict]:
+    yield node
+    for child in node.get("Plans", ()):
+        yield from _pg_nodes(child)
+
+
+# Бюджеты запросов эндпоинтов: (метод, путь, тело, запросов, коммитов).
+# Запись события в taskevent сюда не входит: ее пачками коммитит фоновая
+# задача брокера событий, отдельно от запроса
+_NEW_TASK = {"title": "Задача", "description": "Описание", "project": "issue", "organisation": "org-1"}
+QUERY_BUDGETS = (
+    ("POST", "/api/v1/tasks/", _NEW_TASK, 3, 1),
+    ("POST", "/api/v1/tasks/batch", {"items": [_NEW_TASK] * 3}, 3, 1),
+    ("GET", "/api/v1/tasks/{task_id}", None, 3, 1),
+    ("GET", "/api/v1/tasks/", None, 3, 1),
+    ("PATCH", "/api/v1/tasks/{task_id}", {"title": "Готово"}, 3, 1),
+    # Изменение статуса или группы задачи дополнительно перечитывает строку и правит счетчики
+    ("PATCH", "/api/v1/tasks/{task_id}", {"project": "feature"}, 6, 1),
+    ("PATCH", "/api/v1/tasks/{task_id}/status", {"status": "done"}, 6, 1),
+    ("DELETE", "/api/v1/tasks/{task_id}", None, 7, 1),
+)
+
+
+async def _create_schema(engine: AsyncEngine) -> None:
+    from app.database import Base
+    from app.events.models import TaskEvent  # noqa: F401 — таблица для create_all
+    from app.files.models import File  # noqa: F401
+    from app.jobs.models import Job  # noqa: F401
+    from app.tasks import search  # noqa: F401 — FTS-индексы вешаются на create_all
+
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+
+async def collect_query_plans(engine: AsyncEngine) -> List[ExplainedQuery]:
+    """
+    Выполняет запросы репозиториев на пустой схеме engine и возвращает их планы.
+    Схема создается заново, поэтому engine должен указывать на одноразовую БД
+    """
+    await _create_schema(engine)
+
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    with QueryPlanCollector(engine) as collector:
+        await _scenario(session_maker, collector)
+    await explain(engine, collector.queries)
+    return collector.queries
+
+
+async def _scenario(session_maker: async_sessionmaker, collector: QueryPlanCollector) -> None:
+    """Вызывает каждый читающий и изменяющий метод репозиториев хотя бы раз"""
+    from app.events.repository import EventRepository
+    from app.events.schemas import TaskEventPublic
+    from app.files.repository import BlobRepository, FileRepository
+    from app.jobs.repository import JobRepository
+    from app.tasks.counters import TaskCounterRepository
+    from app.tasks.repository import TaskRepository
+    from app.tasks.schemas import (
+        TaskBatchUpdateItem,
+        TaskCreate,
+        TaskFilter,
+        TaskUpdate,
+        parse_task_projection,
+    )
+
+    now = datetime.now()
+    by_status = TaskFilter(status="in_progress")
+    by_organisation = TaskFilter(organisation="org-1")
+    by_project = TaskFilter(project="feature")
+    by_board = TaskFilter(organisation="org-1", status="new")
+    by_text = TaskFilter(title="задача")
+    by_period = TaskFilter(create_gt=now - timedelta(days=1), create_lt=now + timedelta(days=1))
+    projection = parse_task_projection("id,title,status", None)
+
+    async with session_maker() as session:
+        tasks = TaskRepository(session)
+        files = FileRepository(session)
+        blobs = BlobRepository(session)
+        counters = TaskCounterRepository(session)
+        events = EventRepository(session)
+        jobs = JobRepository(session)
+
+        with collector.step("создание задач"):
+            task = await tasks.create(
+                TaskCreate(title="Задача", description="Описание", project="issue", organisation="org-1")
+            )
+            task_ids = await tasks.create_many(
+                [
+                    TaskCreate(
+                        title=f"Задача {index}",
+                        description="Описание",
+                        project=("issue", "feature")[index % 2],
+                        organisation=f"org-{index % 3}",
+                        status=("new", "in_progress", "done")[index % 3],
+                    )
+                    for index in range(10)
+                ]
+            )
+
+        with collector.step("файлы"):
+            await blobs.get_filepaths(["a" * 64])
+            await blobs.acquire_many([("a" * 64, "/nonexistent/blob", 1)])
+            file = await files.create(
+                {"filename": "a.txt", "filepath": "/nonexistent/blob", "task_id": task.id, "checksum": "a" * 64}
+            )
+            other_files = await files.create_many(
+                [
+                    {
+                        "filename": "b.txt",
+                        "filepath": "/nonexistent/other",
+                        "task_id": task_ids[0],
+                        "processing_status": "pending",
+                    }
+                ]
+            )
+            await files.update_processing(other_files[0].id, {"processing_status": "ready"})
+            await files.get_by_id(file.id)
+            await files.get_files_by_task_id(task.id)
+            await files.get_rows_by_task_ids(task_ids)
+            await files.delete_by_id(file.id)
+
+        with collector.step("чтение задачи"):
+            await tasks.get_by_id(task.id)
+            await tasks.get_by_id(task.id, projection)
+            await tasks.get_stamp(task.id)
+            await tasks.get_organisation(task.id)
+            await tasks.existing_ids(task_ids)
+
+        # Первая страница без фильтров читает ix_task_created_at_id_updated_at по порядку
+        # до LIMIT, а ETag без фильтров считает все задачи — по индексу, без строк таблицы
+        with collector.step("список без фильтров", allow_scan={"task"}):
+            await tasks.list_all_with_filtres(limit=20)
+            await tasks.list_rows(limit=20)
+            await tasks.list_stamp()
+
+        with collector.step("список с фильтрами"):
+            for filters in (by_status, by_organisation, by_project, by_board, by_text, by_period):
+                await tasks.list_stamp(filters)
+                page = await tasks.list_all_with_filtres(filters, limit=5)
+                after = (page[-1].created_at, page[-1].id) if page else (now, 0)
+                await tasks.list_all_with_filtres(filters, limit=5, after=after)
+                await tasks.list_rows(filters, limit=5, after=after, projection=projection)
+            await tasks.list_all_with_filtres(limit=5, after=(now, task.id))
+
+        with collector.step("синхронизация"):
+            until = await tasks.db_now()
+            await tasks.list_changed(None, until, 100)
+            await tasks.list_changed((now - timedelta(days=1), 0), until, 100)
+            await tasks.list_tombstones((now - timedelta(days=1), 0), until, 100)
+
+        with collector.step("изменение задач"):
+            await tasks.update_by_id(task.id, TaskUpdate(status="done", title="Готово"))
+            await tasks.update_many(
+                [
+                    TaskBatchUpdateItem(id=task_ids[0], status="done"),
+                    TaskBatchUpdateItem(id=task_ids[1], project="question"),
+                ]
+            )
+
+        with collector.step("удаление задач"):
+            await tasks.delete_by_id(task_ids[-1])
+            await tasks.delete_many(task_ids[:2])
+
+        # Счетчики пересчитываются по всей таблице task, а сводка без фильтров
+        # или только с периодом суммирует все счетчики — это строки групп, не задач
+        with collector.step("статистика", allow_scan={"task", "taskcounter"}):
+            await counters.rebuild()
+            await counters.aggregate(("status",))
+            await counters.aggregate(("project",), bucket="week", date_from=date.today())
+
+        with collector.step("статистика с фильтрами"):
+            await counters.aggregate(("status",), organisation="org-1")
+            await counters.aggregate(("status",), organisation="org-1", project="issue")
+
+        with collector.step("события"):
+            await events.create_many(
+                [TaskEventPublic(type="task.created", task_id=task.id, organisation="org-1")],
+                "query-plans",
+            )
+            last_id = await events.last_id()
+            await events.list_after(last_id - 1, "other", 100, [last_id - 3, last_id - 2])
+            await events.delete_older_than(now - timedelta(days=1))
+
+        with collector.step("фоновые задачи"):
+            await jobs.enqueue_many("query-plans", [{"id": 1}, {"id": 2}], now)
+            job = await jobs.claim("query-plans", now)
+            await jobs.retry(job, "query-plans", now, "Ошибка")
+            await jobs.complete(job, "query-plans")
+            await jobs.fail(job, "query-plans", "Ошибка")
+            await jobs.release_locked("query-plans")
+            await jobs.release_stale(now - timedelta(minutes=10))
+            await jobs.delete_finished_before(now - timedelta(days=1))
+            await session.commit()
+
+
+async def _engine_for(url: Optional[str]) -> Tuple[AsyncEngine, Optional[str]]:
+    """
+    Одноразовая БД: временный файл SQLite или отдельная схема в PostgreSQL,
+    которая удаляется после проверки
+    """
+    if url is None:
+        path = Path(tempfile.mkdtemp()) / "query_plans.db"
+        return create_async_engine(f"sqlite+aiosqlite:///{path}"), None
+
+    engine = create_async_engine(url)
+    if engine.dialect.name != "postgresql":
+        return engine, None
+    schema = f"query_plans_{uuid4().hex[:8]}"
+    async with engine.begin() as connection:
+        await connection.execute(text(f'CREATE SCHEMA "{schema}"'))
+    await engine.dispose()
+    engine = create_async_engine(
+        url, connect_args={"server_settings": {"search_path": schema}}
+    )
+    return engine, schema
+
+
+async def check_query_plans(url: Optional[str] = None) -> List[ExplainedQuery]:
+    """Запросы репозиториев, план которых содержит непредусмотренный полный обход таблицы"""
+    engine, schema = await _engine_for(url)
+    try:
+        queries = await collect_query_plans(engine)
+    finally:
+        if schema is not None:
+            async with engine.begin() as connection:
+                await connection.execute(text(f'DROP SCHEMA "{schema}" CASCADE'))
+        await engine.dispose()
+    return [query for query in queries if query.violations]
+
+
+async def check_query_budgets(url: Optional[str] = None) -> List[str]:
+    """
+    Выполняет запросы QUERY_BUDGETS через приложение на одноразовой БД и
+    возвращает описания превышенных бюджетов. Кэш чтения очищается перед
+    каждым запросом, чтобы бюджет считался для чтения из БД
+    """
+    from httpx import ASGITransport, AsyncClient
+
+    from app.database import get_session
+    from app.tasks.cache import task_cache
+    from app.utils.query_budget import assert_query_budget
+    from main import app
+
+    engine, schema = await _engine_for(url)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def get_test_session():
+        async with session_maker() as session:
+            try:
+                yield session
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+
+    errors = []
+    app.dependency_overrides[get_session] = get_test_session
+    try:
+        await _create_schema(engine)
+        transport = ASGITransport(app=app)
+        async with AsyncClient(transport=transport, base_url="http://query-budgets") as client:
+            task_id = None
+            for method, path, body, max_queries, max_commits in QUERY_BUDGETS:
+                path = path.format(task_id=task_id)
+                task_cache.clear()
+                try:
+                    with assert_query_budget(max_queries, max_commits, engine):
+                        response = await client.request(method, path, json=body)
+                except AssertionError as e:
+                    errors.append(f"{method} {path}: {e}")
+                    continue
+                if response.status_code >= 400:
+                    errors.append(f"{method} {path}: ответ {response.status_code}")
+                elif task_id is None and method == "POST":
+                    task_id = response.json()["id"]
+    finally:
+        app.dependency_overrides.pop(get_session, None)
+        if schema is not None:
+            async with engine.begin() as connection:
+                await connection.execute(text(f'DROP SCHEMA "{schema}" CASCADE'))
+        await engine.dispose()
+    return errors
+
+
+async def _main(url: Optional[str]) -> int:
+    over_budget = await check_query_budgets(url)
+    for error in over_budget:
+        print(error)
+    failed = await check_query_plans(url)
+    for query in failed:
+        print(f"[{query.step}] полный обход: {', '.join(sorted(query.violations))}")
+        print(f"  {' '.join(query.statement.split())}")
+        for line in query.plan:
+            print(f"    {line}")
+    if failed:
+        print(f"Запросов с полным обходом таблиц: {len(failed)}")
+    else:
+        print("Полных обходов таблиц не найдено")
+    if over_budget:
+        print(f"Эндпоинтов сверх бюджета запросов: {len(over_budget)}")
+    else:
+        print("Бюджеты запросов эндпоинтов соблюдены")
+    return 1 if failed or over_budget else 0
+
+
+if __name__ == "__main__":
+    # python -m app.utils.query_plans [DATABASE_URL]
+    # Проверяет планы запросов репозиториев и бюджеты запросов эндпоинтов.
+    # Без аргумента проверяется временная SQLite. Для PostgreSQL передайте URL
+    # базы, где можно создать схему: проверка создает и удаляет свою схему
+    sys.exit(asyncio.run(_main(sys.argv[1] if len(sys.argv) > 1 else None)))
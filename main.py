@@ -5,14 +5,20 @@ from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from fastapi.routing import APIRoute
-from fastapi.staticfiles import StaticFiles
 from loguru import logger
 from starlette.middleware.cors import CORSMiddleware
 
+from app.api.body_limit import MULTIPART_OVERHEAD, BodySizeLimitMiddleware
+from app.api.compression import CompressionMiddleware
 from app.api.main_router import router as api_router
-from app.api.middleware import logging_middleware
+from app.api.metrics import router as metrics_router
+from app.api.middleware import logging_middleware, metrics_middleware
+from app.api.static_assets import router as static_router, static_bundle
 from app.config import settings
-from app.logging_config import setup_logging
+from app.events.broker import event_broker
+from app.jobs.queue import job_queue
+from app.logging_config import setup_logging, shutdown_logging
+from app.organisations.registry import organisation_engines
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -22,10 +28,19 @@ def custom_generate_unique_id(route: APIRoute) -> str:
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     setup_logging()
+    static_bundle.build()
+    organisation_engines.start()
+    event_broker.start()
+    job_queue.start()
 
     yield
 
     logger.info("Завершение работы приложения...")
+    # Первыми: обработчики задач публикуют события и пишут в БД
+    await job_queue.close()
+    await event_broker.close()
+    await organisation_engines.close()
+    shutdown_logging()
 
 
 if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
@@ -41,14 +56,17 @@ app = FastAPI(
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    logger.error(f"Content-Type: {request.headers.get('content-type')}")
-    logger.error(f"Method: {request.method}")
-    logger.error(f"URL: {request.url}")
-
-    logger.error(f"Validation error on {request.method} {request.url}: {exc.errors()}")
+    errors = exc.errors()
+    logger.bind(method=request.method, path=request.url.path).error(
+        "Validation error on {} {} (Content-Type: {}): {}",
+        request.method,
+        request.url,
+        request.headers.get("content-type"),
+        errors,
+    )
     return JSONResponse(
         status_code=422,
-        content={"detail": "Ошибка валидации данных", "errors": exc.errors()},
+        content={"detail": "Ошибка валидации данных", "errors": errors},
     )
 
 
@@ -60,13 +78,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        levels={
+            "zstd": settings.COMPRESSION_LEVEL_ZSTD,
+            "br": settings.COMPRESSION_LEVEL_BROTLI,
+            "gzip": settings.COMPRESSION_LEVEL_GZIP,
+        },
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        content_types=settings.COMPRESSION_CONTENT_TYPES,
+    )
+
+# Загрузки отклоняются до того, как FastAPI примет весь multipart
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    limits=[
+        (rf"^{settings.API_V1_STR}/files/\d+/batch$", settings.UPLOAD_MAX_REQUEST_SIZE),
+        (rf"^{settings.API_V1_STR}/files/\d+$", settings.UPLOAD_MAX_SIZE + MULTIPART_OVERHEAD),
+    ],
+)
+
 app.middleware("http")(logging_middleware)
+# Внешний слой: время запроса включает остальные middleware
+app.middleware("http")(metrics_middleware)
 
-# Подключение статических файлов
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Статические файлы (собираются в памяти, см. app/api/static_assets.py)
+app.include_router(static_router, prefix="/static")
 
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
+app.include_router(metrics_router)
 
 
 if __name__ == "__main__":
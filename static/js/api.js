@@ -1,5 +1,8 @@
 const API_BASE_URL = '/api/v1';
 
+// Поля задачи, которые нужны для отображения списка
+const LIST_FIELDS = 'id,title,project,status,updated_at';
+
 const TaskStatus = {
     NEW: 'new',
     IN_PROGRESS: 'in_progress',
@@ -65,31 +68,28 @@ const api = {
     async uploadFilesForTask(taskId, files) {
         if (files.length === 0) return [];
 
-        // Загружаем файлы по одному, так как API принимает один файл за раз
-        const uploadedFiles = [];
+        // Все файлы отправляются одним запросом
+        const formData = new FormData();
         for (const file of files) {
-            const formData = new FormData();
-            formData.append('file', file, file.name); // Изменили с 'files' на 'file'
+            formData.append('files', file, file.name);
+        }
 
-            try {
-                const response = await fetch(`${API_BASE_URL}/files/${taskId}`, {
-                    method: 'POST',
-                    body: formData,
-                });
+        try {
+            const response = await fetch(`${API_BASE_URL}/files/${taskId}/batch`, {
+                method: 'POST',
+                body: formData,
+            });
 
-                if (!response.ok) {
-                    const errorData = await response.json();
-                    throw new Error(errorData.detail || 'Не удалось загрузить файл');
-                }
-                const data = await response.json();
-                uploadedFiles.push(new FileModel(data));
-            } catch (error) {
-                console.error(`Ошибка при загрузке файла ${file.name} для задачи ${taskId}:`, error);
-                throw error;
+            if (!response.ok) {
+                const errorData = await response.json();
+                throw new Error(errorData.detail || 'Не удалось загрузить файлы');
             }
+            const data = await response.json();
+            return data.map(file => new FileModel(file));
+        } catch (error) {
+            console.error(`Ошибка при загрузке файлов для задачи ${taskId}:`, error);
+            throw error;
         }
-        
-        return uploadedFiles;
     },
 
     /**
@@ -115,14 +115,15 @@ const api = {
     /**
      * Получает список открытых задач (статусы: NEW и IN_PROGRESS).
      * @param {string} searchQuery - Поисковый запрос (опционально).
+     * @param {string} organisation - Организация задач (опционально).
      * @returns {Promise<TaskModel[]>}
      */
-    async getOpenTasks(searchQuery = '') {
+    async getOpenTasks(searchQuery = '', organisation = '') {
         try {
             // Делаем два отдельных запроса для разных статусов
             const [newTasks, inProgressTasks] = await Promise.all([
-                this.getTasksByStatus(TaskStatus.NEW, searchQuery),
-                this.getTasksByStatus(TaskStatus.IN_PROGRESS, searchQuery)
+                this.getTasksByStatus(TaskStatus.NEW, searchQuery, organisation),
+                this.getTasksByStatus(TaskStatus.IN_PROGRESS, searchQuery, organisation)
             ]);
             
             // Объединяем результаты и сортируем по дате обновления (новые сверху)
@@ -137,11 +138,12 @@ const api = {
     /**
      * Получает список закрытых задач.
      * @param {string} searchQuery - Поисковый запрос (опционально).
+     * @param {string} organisation - Организация задач (опционально).
      * @returns {Promise<TaskModel[]>}
      */
-    async getClosedTasks(searchQuery = '') {
+    async getClosedTasks(searchQuery = '', organisation = '') {
         try {
-            return await this.getTasksByStatus(TaskStatus.DONE, searchQuery);
+            return await this.getTasksByStatus(TaskStatus.DONE, searchQuery, organisation);
         } catch (error) {
             console.error('Ошибка при получении закрытых задач:', error);
             throw error;
@@ -152,27 +154,59 @@ const api = {
      * Получает задачи по статусу с опциональным поиском.
      * @param {string} status - Статус задач.
      * @param {string} searchQuery - Поисковый запрос (опционально).
+     * @param {string} organisation - Организация задач (опционально).
      * @returns {Promise<TaskModel[]>}
      */
-    async getTasksByStatus(status, searchQuery = '') {
+    async getTasksByStatus(status, searchQuery = '', organisation = '') {
         try {
-            let url = `${API_BASE_URL}/tasks/?status=${status}`;
+            // Для списка достаточно краткой формы: описание и файлы загружаются при выборе задачи
+            let url = `${API_BASE_URL}/tasks/?status=${status}&fields=${LIST_FIELDS}`;
             if (searchQuery.trim()) {
                 // Ищем по заголовку (title)
                 url += `&title=${encodeURIComponent(searchQuery.trim())}`;
             }
+            if (organisation) {
+                url += `&organisation=${encodeURIComponent(organisation)}`;
+            }
             const response = await fetch(url);
             if (!response.ok) {
                 const errorData = await response.json();
                 throw new Error(errorData.detail || `Не удалось получить задачи со статусом ${status}`);
             }
             const data = await response.json();
-            return data.map(task => new TaskModel(task));
+            return data.items.map(task => new TaskModel(task));
         } catch (error) {
             console.error(`Ошибка при получении задач со статусом ${status}:`, error);
             throw error;
         }
     },
+
+    /**
+     * Подписывается на поток событий задач и файлов (Server-Sent Events).
+     * Браузер сам переподключается при обрыве соединения; события, пропущенные
+     * за время обрыва, не повторяются — вместо них приходит событие gap.
+     * @param {(event: {type: string, task_id: number, organisation: string | null, data: object | null}) => void} onEvent - Обработчик события.
+     * @param {string} organisation - Получать события только этой организации (опционально).
+     * @returns {EventSource} - Источник событий; для отписки вызовите close().
+     */
+    subscribeToEvents(onEvent, organisation = '') {
+        const query = organisation ? `?organisation=${encodeURIComponent(organisation)}` : '';
+        const source = new EventSource(`${API_BASE_URL}/events/${query}`);
+        const eventTypes = ['task.created', 'task.updated', 'task.status_changed', 'task.deleted', 'file.attached', 'file.processed'];
+        eventTypes.forEach(type => {
+            source.addEventListener(type, (message) => onEvent(JSON.parse(message.data)));
+        });
+        const gap = () => onEvent({ type: 'gap', task_id: null, organisation: null, data: null });
+        // Сервер отключил нас как медленного клиента — данные могли устареть
+        source.addEventListener('dropped', gap);
+        // Повторное подключение после обрыва: события за время обрыва потеряны
+        let connected = false;
+        source.addEventListener('open', () => {
+            if (connected) gap();
+            connected = true;
+        });
+        return source;
+    },
 };
 
 export { api, TaskModel, FileModel, TaskStatus };
\ No newline at end of file
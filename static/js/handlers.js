@@ -1,4 +1,4 @@
-import { api, TaskStatus } from './api.js';
+import { api, FileModel, TaskModel, TaskStatus } from './api.js';
 import { toast } from './toast.js';
 
 const newTabButton = document.getElementById('newTab');
@@ -16,12 +16,20 @@ const newTaskForm = document.querySelector('.new-task-form');
 
 const searchInput = document.getElementById('searchInput');
 const searchInputClosed = document.getElementById('searchInputClosed');
+const lpuInput = document.getElementById('lpu');
 
 // --- Внутреннее состояние ---
 let openTasksCache = [];
 let closedTasksCache = [];
 let selectedFiles = []; // Хранит выбранные для загрузки файлы
 let searchTimeout = null;
+let liveRefreshTimeout = null;
+let liveReloadNeeded = false; // Событие не удалось применить к кэшу — список нужно перечитать
+let selectedTask = null; // Полная форма задачи, показанная в правой панели
+
+// Списки и поток событий ограничены организацией пользователя
+const fetchOpenTasks = (search) => api.getOpenTasks(search, lpuInput.value);
+const fetchClosedTasks = (search) => api.getClosedTasks(search, lpuInput.value);
 
 /**
  * Переключает активную вкладку.
@@ -37,11 +45,11 @@ function switchTab(activeTab) {
     } else if (activeTab === 'open') {
         openTabButton.classList.add('active');
         openContent.classList.remove('hidden');
-        loadTasks(openContent, (search) => api.getOpenTasks(search), openTasksCache, 'open');
+        loadTasks(openContent, fetchOpenTasks, openTasksCache, 'open');
     } else if (activeTab === 'closed') {
         closedTabButton.classList.add('active');
         closedContent.classList.remove('hidden');
-        loadTasks(closedContent, (search) => api.getClosedTasks(search), closedTasksCache, 'closed');
+        loadTasks(closedContent, fetchClosedTasks, closedTasksCache, 'closed');
     }
 }
 
@@ -51,8 +59,9 @@ function switchTab(activeTab) {
  * @param {(search: string) => Promise<import('./api.js').TaskModel[]>} fetchApiCall - Функция API для получения задач.
  * @param {import('./api.js').TaskModel[]} cacheArray - Массив для кэширования задач.
  * @param {string} tabType - Тип вкладки ('open' или 'closed').
+ * @param {number | null} [selectedTaskId=null] - Задача, которую нужно оставить выбранной.
  */
-async function loadTasks(contentElement, fetchApiCall, cacheArray, tabType) {
+async function loadTasks(contentElement, fetchApiCall, cacheArray, tabType, selectedTaskId = null) {
     const listItemsContainer = contentElement.querySelector('.tasks-list');
     const rightPanelContainer = contentElement.querySelector('.right-panel');
     const searchInput = contentElement.querySelector('.search-input');
@@ -61,39 +70,7 @@ async function loadTasks(contentElement, fetchApiCall, cacheArray, tabType) {
     try {
         const tasks = await fetchApiCall(searchQuery);
         cacheArray.splice(0, cacheArray.length, ...tasks); // Очищаем и заполняем кэш
-
-        listItemsContainer.innerHTML = '';
-        if (tasks.length === 0) {
-            const emptyMessage = searchQuery 
-                ? 'По вашему запросу ничего не найдено.' 
-                : 'Задач нет.';
-            listItemsContainer.innerHTML = `<div style="padding: var(--padding-base); text-align: center; color: var(--light-text-color);">${emptyMessage}</div>`;
-            clearRightPanel(rightPanelContainer);
-            return;
-        }
-
-        tasks.forEach(task => {
-            const listItem = document.createElement('div');
-            listItem.className = 'list-item';
-            listItem.dataset.itemId = task.id;
-            
-            // Добавляем бейдж статуса для открытых задач
-            const statusBadge = tabType === 'open' ? getStatusBadge(task.status) : '';
-            
-            listItem.innerHTML = `
-                <div class="item-id">${task.project}-${task.id}${statusBadge}</div>
-                <div class="item-desc">${task.title}</div>`;
-            listItem.addEventListener('click', () => handleListItemClick(task.id, contentElement));
-            listItemsContainer.appendChild(listItem);
-        });
-
-        // Автоматически выбираем первый элемент
-        if (listItemsContainer.firstElementChild && !listItemsContainer.firstElementChild.textContent.includes('По вашему запросу')) {
-            listItemsContainer.firstElementChild.click();
-        } else {
-            clearRightPanel(rightPanelContainer);
-        }
-
+        renderTasks(contentElement, cacheArray, tabType, selectedTaskId);
     } catch (error) {
         console.error('Не удалось загрузить задачи:', error);
         toast.error(`Ошибка загрузки задач: ${error.message}`);
@@ -102,6 +79,60 @@ async function loadTasks(contentElement, fetchApiCall, cacheArray, tabType) {
     }
 }
 
+/**
+ * Отображает список задач вкладки.
+ * @param {HTMLElement} contentElement - Элемент контента вкладки (`openContent` или `closedContent`).
+ * @param {import('./api.js').TaskModel[]} tasks - Задачи для отображения.
+ * @param {string} tabType - Тип вкладки ('open' или 'closed').
+ * @param {number | null} [selectedTaskId=null] - Задача, которую нужно оставить выбранной.
+ * @param {boolean} [reloadSelected=true] - Заново загрузить детали выбранной задачи.
+ */
+function renderTasks(contentElement, tasks, tabType, selectedTaskId = null, reloadSelected = true) {
+    const listItemsContainer = contentElement.querySelector('.tasks-list');
+    const rightPanelContainer = contentElement.querySelector('.right-panel');
+    const searchInput = contentElement.querySelector('.search-input');
+    const searchQuery = searchInput ? searchInput.value : '';
+
+    listItemsContainer.innerHTML = '';
+    if (tasks.length === 0) {
+        const emptyMessage = searchQuery 
+            ? 'По вашему запросу ничего не найдено.' 
+            : 'Задач нет.';
+        listItemsContainer.innerHTML = `<div style="padding: var(--padding-base); text-align: center; color: var(--light-text-color);">${emptyMessage}</div>`;
+        clearRightPanel(rightPanelContainer);
+        return;
+    }
+
+    tasks.forEach(task => {
+        const listItem = document.createElement('div');
+        listItem.className = 'list-item';
+        listItem.dataset.itemId = task.id;
+        
+        // Добавляем бейдж статуса для открытых задач
+        const statusBadge = tabType === 'open' ? getStatusBadge(task.status) : '';
+        
+        listItem.innerHTML = `
+            <div class="item-id">${task.project}-${task.id}${statusBadge}</div>
+            <div class="item-desc">${task.title}</div>`;
+        listItem.addEventListener('click', () => handleListItemClick(task.id, contentElement));
+        listItemsContainer.appendChild(listItem);
+    });
+
+    // Сохраняем выбранную задачу при обновлении списка, иначе выбираем первую
+    const selectedItem = selectedTaskId !== null
+        ? listItemsContainer.querySelector(`.list-item[data-item-id="${selectedTaskId}"]`)
+        : null;
+    if (selectedItem && !reloadSelected) {
+        selectedItem.classList.add('active');
+    } else if (selectedItem) {
+        selectedItem.click();
+    } else if (listItemsContainer.firstElementChild && !listItemsContainer.firstElementChild.textContent.includes('По вашему запросу')) {
+        listItemsContainer.firstElementChild.click();
+    } else {
+        clearRightPanel(rightPanelContainer);
+    }
+}
+
 /**
  * Возвращает HTML для бейджа статуса задачи.
  * @param {string} status - Статус задачи.
@@ -125,6 +156,7 @@ function getStatusBadge(status) {
  * @param {HTMLElement} rightPanelContainer - Элемент правой панели.
  */
 function clearRightPanel(rightPanelContainer) {
+    selectedTask = null;
     rightPanelContainer.querySelector('.right-panel-title').textContent = 'Выберите задачу';
     rightPanelContainer.querySelector('.right-panel .details').innerHTML = '';
     rightPanelContainer.querySelector('.right-panel-description').textContent = '';
@@ -338,7 +370,6 @@ function downloadFile(file) {
  */
 async function handleListItemClick(taskId, currentContentElement) {
     const rightPanelContainer = currentContentElement.querySelector('.right-panel');
-    const cache = (currentContentElement === openContent) ? openTasksCache : closedTasksCache;
 
     // Снимаем выделение со старого элемента и выделяем новый
     const currentActive = currentContentElement.querySelector('.list-item.active');
@@ -346,8 +377,9 @@ async function handleListItemClick(taskId, currentContentElement) {
     currentContentElement.querySelector(`.list-item[data-item-id="${taskId}"]`).classList.add('active');
 
     try {
-        let task = cache.find(t => t.id === taskId);
-        if (!task) task = await api.getTaskById(taskId); // Если в кэше нет, загружаем
+        // В списке только краткая форма задачи, полную загружаем отдельно
+        const task = await api.getTaskById(taskId);
+        selectedTask = task;
         displayTaskDetails(task, rightPanelContainer);
     } catch (error) {
         console.error(`Ошибка при получении деталей задачи ${taskId}:`, error);
@@ -421,6 +453,138 @@ function handleSearch(contentElement, fetchApiCall, cacheArray, tabType) {
     }, 300); // 300мс задержка
 }
 
+/**
+ * Возвращает видимую вкладку со списком задач или null на вкладке "Новая".
+ * @returns {HTMLElement | null}
+ */
+function visibleListContent() {
+    return [openContent, closedContent].find(content => !content.classList.contains('hidden')) || null;
+}
+
+/**
+ * Находит задачу в кэшах списков.
+ * @param {number} taskId - ID задачи.
+ * @returns {import('./api.js').TaskModel | undefined}
+ */
+function findCachedTask(taskId) {
+    return openTasksCache.find(task => task.id === taskId) || closedTasksCache.find(task => task.id === taskId);
+}
+
+/**
+ * Удаляет задачу из кэшей списков.
+ * @param {number} taskId - ID задачи.
+ */
+function removeCachedTask(taskId) {
+    [openTasksCache, closedTasksCache].forEach(cache => {
+        const index = cache.findIndex(task => task.id === taskId);
+        if (index !== -1) cache.splice(index, 1);
+    });
+}
+
+/**
+ * Кладет задачу в кэш списка по ее статусу, сохраняя порядок сервера:
+ * открытые — по дате обновления, закрытые — от новых к старым.
+ * @param {import('./api.js').TaskModel} task - Задача.
+ */
+function putCachedTask(task) {
+    removeCachedTask(task.id);
+    if (task.status === TaskStatus.DONE) {
+        closedTasksCache.push(task);
+        closedTasksCache.sort((a, b) => b.id - a.id);
+    } else {
+        openTasksCache.push(task);
+        openTasksCache.sort((a, b) => b.updated_at - a.updated_at);
+    }
+}
+
+/**
+ * Применяет событие сервера к кэшам списков и правой панели.
+ * @param {{type: string, task_id: number, data: object | null}} event - Событие.
+ * @returns {boolean} false, если событие нельзя применить и список нужно перечитать.
+ */
+function applyServerEvent(event) {
+    const rightPanelContainer = visibleListContent()?.querySelector('.right-panel');
+
+    switch (event.type) {
+        case 'task.created':
+        case 'task.updated':
+        case 'task.status_changed': {
+            // Пакетные изменения приходят без состояния задачи
+            if (!event.data) return false;
+            // Совпадение с поиском проверяет только сервер
+            if (searchInput?.value.trim() || searchInputClosed?.value.trim()) return false;
+            let task;
+            if (event.data.title !== undefined) {
+                task = new TaskModel(event.data);
+                if (selectedTask && selectedTask.id === task.id && rightPanelContainer) {
+                    selectedTask = task;
+                    displayTaskDetails(task, rightPanelContainer);
+                }
+            } else {
+                task = findCachedTask(event.task_id);
+                if (!task) return false;
+                task.status = event.data.status;
+            }
+            putCachedTask(task);
+            return true;
+        }
+        case 'task.deleted':
+            removeCachedTask(event.task_id);
+            return true;
+        case 'file.attached':
+        case 'file.processed':
+            // В списке файлы не показываются — обновляем только открытую задачу
+            if (selectedTask && selectedTask.id === event.task_id && rightPanelContainer) {
+                event.data.files.forEach(file => {
+                    const index = selectedTask.files.findIndex(existing => existing.id === file.id);
+                    if (index === -1) {
+                        selectedTask.files.push(new FileModel(file));
+                    } else {
+                        selectedTask.files[index] = new FileModel(file);
+                    }
+                });
+                displayTaskFiles(selectedTask.files, rightPanelContainer);
+            }
+            return true;
+        default:
+            // Пропуск событий (gap) или неизвестное событие
+            return false;
+    }
+}
+
+/**
+ * Применяет событие сервера к открытой вкладке со списком задач.
+ * События приходят пачками, поэтому перерисовка выполняется с дебаунсом;
+ * список перечитывается целиком, только если событие не удалось применить к кэшу.
+ * @param {{type: string, task_id: number, data: object | null}} event - Событие.
+ */
+function handleServerEvent(event) {
+    if (!applyServerEvent(event)) {
+        liveReloadNeeded = true;
+    }
+    if (liveRefreshTimeout) {
+        clearTimeout(liveRefreshTimeout);
+    }
+
+    liveRefreshTimeout = setTimeout(() => {
+        const reload = liveReloadNeeded;
+        liveReloadNeeded = false;
+        const contentElement = visibleListContent();
+        if (!contentElement) return; // На вкладке "Новая" списка нет; при переключении списки загрузятся заново
+
+        const activeItem = contentElement.querySelector('.list-item.active');
+        const selectedTaskId = activeItem ? Number(activeItem.dataset.itemId) : null;
+        const isOpen = contentElement === openContent;
+        const cacheArray = isOpen ? openTasksCache : closedTasksCache;
+        const tabType = isOpen ? 'open' : 'closed';
+        if (reload) {
+            loadTasks(contentElement, isOpen ? fetchOpenTasks : fetchClosedTasks, cacheArray, tabType, selectedTaskId);
+        } else {
+            renderTasks(contentElement, cacheArray, tabType, selectedTaskId, false);
+        }
+    }, 500);
+}
+
 /** Инициализация обработчиков событий */
 export function setupEventListeners() {
     // Переключение вкладок
@@ -431,13 +595,13 @@ export function setupEventListeners() {
     // Поиск задач
     if (searchInput) {
         searchInput.addEventListener('input', () => {
-            handleSearch(openContent, (search) => api.getOpenTasks(search), openTasksCache, 'open');
+            handleSearch(openContent, fetchOpenTasks, openTasksCache, 'open');
         });
     }
     
     if (searchInputClosed) {
         searchInputClosed.addEventListener('input', () => {
-            handleSearch(closedContent, (search) => api.getClosedTasks(search), closedTasksCache, 'closed');
+            handleSearch(closedContent, fetchClosedTasks, closedTasksCache, 'closed');
         });
     }
 
@@ -463,7 +627,6 @@ export function setupEventListeners() {
     // --- Логика для формы создания задачи ---
     newTaskForm.addEventListener('submit', async (event) => {
         event.preventDefault();
-        const lpuInput = document.getElementById('lpu');
 
         const taskData = {
             title: document.getElementById('subject').value,
@@ -521,4 +684,9 @@ export function setupEventListeners() {
             }
         }
     });
+
+    // Изменения других пользователей приходят потоком событий вместо периодической перезагрузки
+    if (window.EventSource) {
+        api.subscribeToEvents(handleServerEvent, lpuInput.value);
+    }
 }
\ No newline at end of file